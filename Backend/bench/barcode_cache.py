@@ -0,0 +1,122 @@
+"""
+📊 latency ของการสแกนบาร์โค้ด (GET /api/goods/barcode/{barcode}) ไม่มี cache vs utils/goods_cache
+
+รันจากโฟลเดอร์ Backend (ต้องต่อ Mongo ได้: ใช้ DB_NAME=TUKJAISHOP_BENCH ถ้าไม่ได้ตั้งไว้ ลบข้อมูลทดสอบเองตอนจบ):
+    python -m bench.barcode_cache --goods 2000 --scans 5000 --tills 3
+    MONGO_URL=mongodb://192.168.1.118:27017 python -m bench.barcode_cache   # วัดกับ DB จริงในร้าน (ข้ามเครือข่าย)
+
+- สแกนแบบร้านจริง: สินค้าขายดีส่วนน้อยถูกสแกนบ่อย (Zipf) + สแกนผิด / ไม่มีในระบบ --unknown %
+- ทุก --restock-every ครั้งมีการเติมสต๊อก 1 รายการ (write-through invalidate) ตรวจว่าสแกนถัดไปเห็นยอดใหม่
+- รายงาน p50 / p95 / p99 ต่อการสแกน, จำนวนครั้งที่อ่าน DB และ hit ratio
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("DB_NAME", "TUKJAISHOP_BENCH")
+
+from database import db  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from routes.goods_routes import get_goods_by_barcode, restock_goods  # noqa: E402
+from utils import goods_cache  # noqa: E402
+
+PREFIX = "bench-scan-"
+
+
+async def _seed(count):
+    await _cleanup()
+    await db.goods.insert_many([{
+        "barcode": f"{PREFIX}{i:05d}", "name": f"สินค้าทดสอบ {i}", "type": None,
+        "cost": 10.0, "price": 15.0, "stock": 100, "imageBase64": "A" * 2048,
+    } for i in range(count)])
+
+
+async def _cleanup():
+    await db.goods.delete_many({"barcode": {"$regex": f"^{PREFIX}"}})
+    await db.stock_movements.delete_many({"barcode": {"$regex": f"^{PREFIX}"}})
+
+
+def _plan(goods, scans, unknown_pct, seed=7):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(goods)]
+    codes = rng.choices(range(goods), weights=weights, k=scans)
+    return [f"{PREFIX}x{i}" if rng.random() * 100 < unknown_pct else f"{PREFIX}{c:05d}"
+            for i, c in enumerate(codes)]
+
+
+async def run(name, plan, tills, restock_every):
+    goods_cache.clear()
+    latencies, stale = [], 0
+    queue = list(enumerate(plan))
+    queue.reverse()
+
+    async def till():
+        nonlocal stale
+        while queue:
+            i, code = queue.pop()
+            if restock_every and i % restock_every == 0 and not code.startswith(f"{PREFIX}x"):
+                await restock_goods(code, {"qty": 1})
+                expected = (await db.goods.find_one({"barcode": code}, {"stock": 1}))["stock"]
+                seen = (await get_goods_by_barcode(code))["stock"]
+                stale += seen != expected
+                continue
+            t0 = time.perf_counter()
+            try:
+                await get_goods_by_barcode(code)
+            except HTTPException:
+                pass
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    before = goods_cache.stats()["misses"]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(till() for _ in range(tills)))
+    wall = time.perf_counter() - t0
+    stats = goods_cache.stats()
+    latencies.sort()
+    result = {
+        "mode": name,
+        "scans": len(latencies),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 3),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3),
+        "scans_per_sec": round(len(latencies) / wall),
+        "db_reads": stats["misses"] - before if goods_cache._enabled() else len(latencies),
+        "hit_ratio": stats["hit_ratio"] if goods_cache._enabled() else 0,
+        "stale_after_restock": stale,
+    }
+    print(result)
+    return result
+
+
+async def main_async(args):
+    await _seed(args.goods)
+    plan = _plan(args.goods, args.scans, args.unknown)
+    size = goods_cache.MAX_ENTRIES
+    try:
+        goods_cache.MAX_ENTRIES = 0
+        off = await run("no_cache", plan, args.tills, args.restock_every)
+        goods_cache.MAX_ENTRIES = size
+        on = await run("goods_cache", plan, args.tills, args.restock_every)
+        print({"speedup_p50": round(off["p50_ms"] / max(on["p50_ms"], 0.001), 1),
+               "db_reads_saved": off["db_reads"] - on["db_reads"]})
+    finally:
+        goods_cache.MAX_ENTRIES = size
+        await _cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--goods", type=int, default=2000)
+    parser.add_argument("--scans", type=int, default=5000)
+    parser.add_argument("--tills", type=int, default=3)
+    parser.add_argument("--unknown", type=float, default=3, help="%% ของการสแกนที่ไม่มีในระบบ")
+    parser.add_argument("--restock-every", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
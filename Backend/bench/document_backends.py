@@ -0,0 +1,56 @@
+"""
+📊 byte ต่อใบเสร็จ / เวลาสร้างคำสั่งพิมพ์ ของแต่ละ backend ใน utils/print_document
+
+รันจากโฟลเดอร์ Backend:
+    python -m bench.document_backends --items 15 --rounds 30 --codepage 21
+
+- raster:          วาดทั้งใบเป็นภาพ (โลโก้ส่งไปกับทุกใบ)
+- raster+stored:   ภาพ แต่โลโก้/อีโมจิอยู่ในเครื่องพิมพ์แล้ว (utils/stored_graphics)
+- text:            ข้อความ code page ไทย โลโก้/อีโมจิเป็นภาพ
+- text+stored:     ข้อความ code page ไทย + โลโก้/อีโมจิในเครื่องพิมพ์
+"""
+import argparse
+import time
+
+from bench.render_layout import _order
+from utils.print_document import BACKEND_PREVIEW, BACKEND_RASTER, BACKEND_TEXT
+from utils.receipt_render import encode_receipt
+
+POINTS = {"before": 10, "redeem": 0, "earned": 16, "after": 26}
+STORED = ("logo", "emoji")
+
+
+def measure(name, fn, rounds):
+    data = fn()
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    ms = (time.perf_counter() - t0) / rounds * 1000
+    return {"backend": name, "bytes": len(data), "ms": round(ms, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=15)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--codepage", type=int, default=21)
+    args = parser.parse_args()
+
+    order = _order(args.items)
+    caps = {"thai_codepage": args.codepage}
+    cases = [
+        ("raster", lambda: encode_receipt(order, POINTS, "x", BACKEND_RASTER)),
+        ("raster+stored", lambda: encode_receipt(order, POINTS, "x", BACKEND_RASTER, stored=STORED)),
+        ("text", lambda: encode_receipt(order, POINTS, "x", BACKEND_TEXT, caps)),
+        ("text+stored", lambda: encode_receipt(order, POINTS, "x", BACKEND_TEXT, caps, STORED)),
+        ("preview_png", lambda: encode_receipt(order, POINTS, "x", BACKEND_PREVIEW)),
+    ]
+    results = [measure(name, fn, args.rounds) for name, fn in cases]
+    base = results[0]["bytes"]
+    for r in results:
+        r["vs_raster"] = f"{base / r['bytes']:.1f}x"
+        print(r)
+
+
+if __name__ == "__main__":
+    main()
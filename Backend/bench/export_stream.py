@@ -0,0 +1,127 @@
+"""
+📊 memory ของ export รายการขายทั้งหมด: stream (routes/export_routes) vs โหลดทั้งก้อน (to_list)
+
+รันจากโฟลเดอร์ Backend (ต้องต่อ Mongo ได้: ใช้ DB_NAME=TUKJAISHOP_BENCH ถ้าไม่ได้ตั้งไว้ ลบข้อมูลทดสอบเองตอนจบ):
+    python -m bench.export_stream --orders 1000000 --rss-ceiling-mb 64
+    python -m bench.export_stream --orders 200000 --compare     # วัดแบบ to_list เทียบด้วย (ใช้ memory มาก)
+
+- seed บิลทดสอบ (paymentType = "bench") ทีละ 10k บิล
+- อ่าน body ของ /api/export/orders (ndjson / csv) และ /api/export/order-items ทีละก้อนแบบที่ client ได้รับ
+  ทิ้งข้อมูลทันที (นับแค่ bytes / บรรทัด) วัด RSS ระหว่างทาง
+- RSS ที่เพิ่มขึ้นสูงสุดเกิน --rss-ceiling-mb -> exit 1 (ใช้เป็น check ก่อนปล่อยได้)
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+
+os.environ.setdefault("DB_NAME", "TUKJAISHOP_BENCH")
+
+from database import db  # noqa: E402
+from routes.export_routes import export_order_items, export_orders  # noqa: E402
+
+PAYMENT = "bench"
+PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_mb():
+    """RSS ปัจจุบัน (Linux อ่าน /proc ได้ / ที่อื่นใช้ค่าสูงสุดของ process แทน)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE / (1024 * 1024)
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _seed(count, items):
+    existing = await db.orders.count_documents({"paymentType": PAYMENT})
+    if existing == count:
+        return
+    await _cleanup()
+    batch = []
+    for i in range(count):
+        lines = [{"id": f"bench-exp-{(i + k) % 5000:04d}", "name": f"สินค้าทดสอบ {(i + k) % 5000}",
+                  "qty": 1 + k, "price": 20.0, "total": 20.0 * (1 + k)} for k in range(items)]
+        total = sum(line["total"] for line in lines)
+        batch.append({
+            "date": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:00:00",
+            "items": lines, "total": total, "cash": total, "change": 0.0, "paymentType": PAYMENT,
+            "member": {"phone": f"08{i % 100000:08d}", "name": "สมาชิกทดสอบ"} if i % 3 == 0 else None,
+        })
+        if len(batch) == 10_000:
+            await db.orders.insert_many(batch)
+            batch = []
+    if batch:
+        await db.orders.insert_many(batch)
+
+
+async def _cleanup():
+    await db.orders.delete_many({"paymentType": PAYMENT})
+
+
+async def _drain(name, response):
+    base = peak = _rss_mb()
+    size = rows = 0
+    t0 = time.perf_counter()
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+        rows += chunk.count(b"\n")
+        peak = max(peak, _rss_mb())
+    result = {"mode": name, "rows": rows, "mb": round(size / (1024 * 1024), 1),
+              "seconds": round(time.perf_counter() - t0, 1), "rss_growth_mb": round(peak - base, 1)}
+    print(result)
+    return result
+
+
+async def _to_list(name):
+    """แบบไม่ stream: โหลดบิลทั้งหมดเข้า list แล้ว json.dumps ก้อนเดียว"""
+    base = _rss_mb()
+    t0 = time.perf_counter()
+    docs = await db.orders.find({"paymentType": PAYMENT}).sort("date", 1).to_list(length=None)
+    body = json.dumps(docs, ensure_ascii=False, default=str).encode("utf-8")
+    result = {"mode": name, "rows": len(docs), "mb": round(len(body) / (1024 * 1024), 1),
+              "seconds": round(time.perf_counter() - t0, 1), "rss_growth_mb": round(_rss_mb() - base, 1)}
+    del docs, body
+    print(result)
+    return result
+
+
+async def main_async(args):
+    await _seed(args.orders, args.items)
+    filters = {"startDate": None, "endDate": None, "paymentType": PAYMENT, "phone": None}
+    try:
+        results = [
+            await _drain("orders_ndjson", await export_orders(format="ndjson", **filters)),
+            await _drain("orders_csv", await export_orders(format="csv", **filters)),
+            await _drain("order_items_csv", await export_order_items(format="csv", barcode=None, **filters)),
+        ]
+        if args.compare:
+            await _to_list("orders_to_list")
+    finally:
+        if not args.keep:
+            await _cleanup()
+
+    worst = max(r["rss_growth_mb"] for r in results)
+    if worst > args.rss_ceiling_mb:
+        print(f"❌ RSS เพิ่ม {worst} MB เกินเพดาน {args.rss_ceiling_mb} MB")
+        return 1
+    print(f"✅ RSS เพิ่มสูงสุด {worst} MB (เพดาน {args.rss_ceiling_mb} MB)")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--items", type=int, default=3, help="จำนวนสินค้าต่อบิล")
+    parser.add_argument("--rss-ceiling-mb", type=float, default=64)
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
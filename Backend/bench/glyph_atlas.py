@@ -0,0 +1,80 @@
+"""
+📊 วาดข้อความด้วย glyph atlas (utils/glyph_atlas) vs FreeType ทุกบรรทัด
+
+รันจากโฟลเดอร์ Backend:
+    python -m bench.glyph_atlas --items 15 --rounds 50
+
+วัดเฉพาะขั้น render() ของ Layout (หัว/ท้ายใบเสร็จเป็น tile อยู่แล้วจึงไม่นับ)
+และนับจำนวนครั้งที่เรียก FreeType (ImageDraw.text) ต่อใบ
+"""
+import argparse
+import time
+
+from PIL import ImageDraw
+
+from bench.render_layout import _order
+from utils import glyph_atlas
+from utils.print_document import Document, layout_block
+from utils.receipt_layout import Layout
+from utils.receipt_render import RECEIPT_THRESHOLD, RECEIPT_W, receipt_body, warm_tiles
+
+POINTS = {"before": 10, "redeem": 0, "earned": 16, "after": 26}
+
+
+class _DrawCounter:
+    def __enter__(self):
+        self.calls = 0
+        self._inner = ImageDraw.ImageDraw.text
+
+        def count(draw, *args, **kwargs):
+            self.calls += 1
+            return self._inner(draw, *args, **kwargs)
+
+        ImageDraw.ImageDraw.text = count
+        return self
+
+    def __exit__(self, *exc):
+        ImageDraw.ImageDraw.text = self._inner
+
+
+def _body_layout(order):
+    doc = Document(RECEIPT_W, threshold=RECEIPT_THRESHOLD)
+    receipt_body(doc, order, POINTS)
+    doc.center("01/01/2026 10:00:00", 34, gap=20)
+    lay = Layout(RECEIPT_W)
+    for block in doc.blocks:
+        layout_block(lay, block, RECEIPT_THRESHOLD)
+    return lay
+
+
+def measure(mode, lay, rounds):
+    img = lay.render(RECEIPT_THRESHOLD, mode=mode)
+    with _DrawCounter() as calls:
+        lay.render(RECEIPT_THRESHOLD, mode=mode)
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        lay.render(RECEIPT_THRESHOLD, mode=mode)
+    ms = (time.perf_counter() - t0) / rounds * 1000
+    return img, {"mode": mode, "render_ms": round(ms, 3), "freetype_calls": calls.calls}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=15)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    warm_tiles()
+    lay = _body_layout(_order(args.items))
+    print({"text_runs": len(lay._texts), "canvas_px": (lay.width, lay.height)})
+
+    ref, result = measure("L", lay, args.rounds)
+    print(result)
+    img, result = measure("atlas", lay, args.rounds)
+    diff = sum(bin(a ^ b).count("1") for a, b in zip(ref.tobytes(), img.tobytes()))
+    print({**result, "pixels_differ_from_L": diff})
+    print(glyph_atlas.stats()["atlases"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+📊 ขนาด payload และ latency ของ GET /api/goods บนแคตตาล็อก 50k สินค้า: แบบเดิม vs keyset + fields
+
+รันจากโฟลเดอร์ Backend (ต้องต่อ Mongo ได้: ใช้ DB_NAME=TUKJAISHOP_BENCH ถ้าไม่ได้ตั้งไว้ ลบข้อมูลทดสอบเองตอนจบ):
+    python -m bench.goods_listing --goods 50000 --image-kb 8 --image-pct 30
+    python -m bench.goods_listing --keep        # ไม่ลบสินค้าทดสอบ (รันซ้ำไม่ต้อง seed ใหม่)
+
+- legacy:      find() ทั้งเอกสาร (รวม imageBase64) สูงสุด 1000 รายการ (get_all_goods เดิม)
+- lean_1000:   ค่าเริ่มต้นใหม่ ไม่รวมรูป 1000 รายการ
+- lean_100:    หน้าละ 100
+- fields_100:  ?fields=barcode,name,price,stock หน้าละ 100
+- deep_skip / deep_keyset: หน้าที่อยู่ลึก (--deep รายการแรกข้ามไป) ด้วย skip เทียบกับ cursor
+รายงาน bytes (JSON ที่ส่งจริง) และ p50 / p95 ms ของ --repeat รอบ
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("DB_NAME", "TUKJAISHOP_BENCH")
+
+from database import db, serialize_doc  # noqa: E402
+from fastapi import Response  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from routes.goods_routes import get_all_goods  # noqa: E402
+from utils import db_indexes, pagination  # noqa: E402
+
+PREFIX = "bench-list-"
+
+
+async def _seed(count, image_kb, image_pct):
+    existing = await db.goods.count_documents({"barcode": {"$regex": f"^{PREFIX}"}})
+    if existing == count:
+        return
+    await _cleanup()
+    image = "A" * (image_kb * 1024)
+    every = max(1, round(100 / image_pct)) if image_pct else 0
+    batch = []
+    for i in range(count):
+        batch.append({
+            "barcode": f"{PREFIX}{i:06d}", "name": f"สินค้าทดสอบ {(i * 7919) % count:06d}", "type": None,
+            "cost": 10.0, "price": 15.0 + i % 50, "stock": (i * 31) % 200, "supplier": "bench",
+            "dateReceived": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "imageBase64": image if every and i % every == 0 else None,
+        })
+        if len(batch) == 5000:
+            await db.goods.insert_many(batch)
+            batch = []
+    if batch:
+        await db.goods.insert_many(batch)
+
+
+async def _cleanup():
+    await db.goods.delete_many({"barcode": {"$regex": f"^{PREFIX}"}})
+
+
+def _bytes(items):
+    return len(json.dumps(jsonable_encoder(items), ensure_ascii=False).encode("utf-8"))
+
+
+async def _list(**kwargs):
+    params = {"name": None, "type": None, "supplier": "bench", "startDate": None, "endDate": None,
+              "sort": "_id", "order": "asc", "limit": 1000, "cursor": None, "fields": None}
+    params.update(kwargs)
+    response = Response()
+    items = await get_all_goods(response, **params)
+    return items, response.headers.get(pagination.NEXT_CURSOR_HEADER)
+
+
+async def legacy():
+    items = await db.goods.find({"supplier": {"$regex": "bench", "$options": "i"}}).limit(1000).to_list(length=1000)
+    return [serialize_doc(x) for x in items]
+
+
+async def deep_skip(deep, limit, sort):
+    found = db.goods.find({"supplier": {"$regex": "bench", "$options": "i"}}, {"imageBase64": 0})
+    items = await found.sort(pagination.sort_spec(sort, 1)).skip(deep).limit(limit).to_list(length=limit)
+    return [serialize_doc(x) for x in items]
+
+
+async def _cursor_at(deep, sort):
+    """token ของหน้าที่เริ่มที่รายการ deep (เตรียมก่อนจับเวลา เหมือน client ที่เลื่อนมาถึงหน้านั้นแล้ว)"""
+    found = db.goods.find({"supplier": {"$regex": "bench", "$options": "i"}}, {sort: 1})
+    last = (await found.sort(pagination.sort_spec(sort, 1)).skip(deep - 1).to_list(length=1))[0]
+    return pagination.encode_cursor(sort, 1, last.get(sort), last["_id"])
+
+
+async def measure(name, call, repeat):
+    times, size = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        items = await call()
+        if isinstance(items, tuple):
+            items = items[0]
+        size = _bytes(items)
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    result = {"mode": name, "rows": len(items), "bytes": size, "p50_ms": round(statistics.median(times), 1),
+              "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 1)}
+    print(result)
+    return result
+
+
+async def main_async(args):
+    await db_indexes.ensure()
+    await _seed(args.goods, args.image_kb, args.image_pct)
+    try:
+        results = [
+            await measure("legacy", legacy, args.repeat),
+            await measure("lean_1000", lambda: _list(), args.repeat),
+            await measure("lean_100", lambda: _list(limit=100), args.repeat),
+            await measure("fields_100", lambda: _list(limit=100, fields="barcode,name,price,stock"), args.repeat),
+        ]
+        token = await _cursor_at(args.deep, args.sort)
+        results.append(await measure(f"deep_skip_{args.sort}", lambda: deep_skip(args.deep, 100, args.sort), args.repeat))
+        results.append(await measure(f"deep_keyset_{args.sort}",
+                                     lambda: _list(sort=args.sort, limit=100, cursor=token), args.repeat))
+        base = results[0]
+        for r in results[1:]:
+            print(f"{r['mode']:>22}: payload {r['bytes'] / max(base['bytes'], 1):.1%} ของแบบเดิม, "
+                  f"p50 {r['p50_ms']} ms (เดิม {base['p50_ms']} ms)")
+    finally:
+        if not args.keep:
+            await _cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--goods", type=int, default=50_000)
+    parser.add_argument("--image-kb", type=int, default=8)
+    parser.add_argument("--image-pct", type=float, default=30)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--deep", type=int, default=40_000)
+    parser.add_argument("--sort", default="name", choices=["_id", "name", "stock", "dateReceived"])
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
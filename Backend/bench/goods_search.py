@@ -0,0 +1,137 @@
+"""
+📊 latency ของการค้นหาสินค้าบนแคตตาล็อก 100k: $regex แบบเดิม vs utils/goods_search (n-gram)
+
+รันจากโฟลเดอร์ Backend (ต้องต่อ Mongo ได้: ใช้ DB_NAME=TUKJAISHOP_BENCH ถ้าไม่ได้ตั้งไว้ ลบข้อมูลทดสอบเองตอนจบ):
+    python -m bench.goods_search --goods 100000 --repeat 20
+    python -m bench.goods_search --keep        # ไม่ลบสินค้าทดสอบ (รันซ้ำไม่ต้อง seed / ทำ index ใหม่)
+
+- ชื่อสินค้าสุ่มจากคำไทย / อังกฤษที่พบในร้าน + ขนาด เช่น "น้ำปลาตราหอย 700ml"
+- คำค้น 5 แบบ: ขึ้นต้น / อยู่กลางชื่อ / ไม่ใส่วรรณยุกต์ / พิมพ์ผิด 1 ตัว / ไม่มีในร้าน (regex ต้องสแกนทุกตัว)
+- regex:  find({"name": {"$regex": q, "$options": "i"}}).limit(20) (get_all_goods?name= เดิม)
+- search: GET /api/goods/search?q= (limit 20)
+รายงาน p50 / p95 ms และจำนวนคำค้นที่เจอสินค้าอย่างน้อย 1 ตัว (regex หาคำที่พิมพ์ผิด / ไม่มีวรรณยุกต์ไม่เจอ)
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("DB_NAME", "TUKJAISHOP_BENCH")
+
+from database import db  # noqa: E402
+from routes.goods_routes import search_goods  # noqa: E402
+from utils import db_indexes, goods_search  # noqa: E402
+
+PREFIX = "bench-search-"
+SUPPLIER = "bench-search"
+
+WORDS = ["น้ำปลา", "ซอส", "ปรุงรส", "ขนมปัง", "นมสด", "กาแฟ", "ชาเขียว", "น้ำดื่ม", "บะหมี่", "ต้มยำ",
+         "ข้าวสาร", "หอมมะลิ", "น้ำมันพืช", "สบู่", "ยาสีฟัน", "แชมพู", "ผงซักฟอก", "น้ำยาล้างจาน",
+         "ปลากระป๋อง", "ไข่ไก่", "เส้นหมี่", "ซีอิ๊ว", "น้ำตาลทราย", "เกลือ", "พริกแกง", "กะทิ",
+         "Cola", "Soda", "Snack", "Cookie", "Choco", "Milk", "Coffee", "Green", "Tea"]
+BRANDS = ["ตราหอย", "ตราช้าง", "ฝาเขียว", "ทิพรส", "แม่ครัว", "ภูเขาทอง", "มาม่า", "ไวไว", "เนสท์", "ดัชมิลล์"]
+SIZES = ["100g", "200ml", "350ml", "700ml", "1L", "1.5L", "5kg", "แพ็ค 6", "แพ็ค 12", ""]
+
+
+def _name(rng):
+    return " ".join(filter(None, [rng.choice(WORDS) + rng.choice(["", rng.choice(WORDS)]),
+                                  rng.choice(BRANDS), rng.choice(SIZES)]))
+
+
+async def _seed(count):
+    existing = await db.goods.count_documents({"supplier": SUPPLIER})
+    if existing != count:
+        await _cleanup()
+        rng = random.Random(11)
+        batch = []
+        for i in range(count):
+            doc = {"barcode": f"{PREFIX}{i:06d}", "name": _name(rng), "type": None, "cost": 10.0,
+                   "price": 15.0, "stock": i % 100, "supplier": SUPPLIER}
+            doc["search"] = goods_search.document(doc)
+            batch.append(doc)
+            if len(batch) == 5000:
+                await db.goods.insert_many(batch)
+                batch = []
+        if batch:
+            await db.goods.insert_many(batch)
+    await goods_search.reindex()
+
+
+async def _cleanup():
+    await db.goods.delete_many({"supplier": SUPPLIER})
+
+
+def _strip_tones(text):
+    return "".join(ch for ch in text if not 0x0E47 <= ord(ch) <= 0x0E4E)
+
+
+def _typo(word, rng):
+    i = rng.randrange(1, len(word) - 1) if len(word) > 2 else 0
+    return word[:i] + rng.choice("กขคงจชซดตบปผพมยรลวสหอ") + word[i + 1:]
+
+
+def _queries(rng):
+    long_words = [w for w in WORDS if len(w) >= 4]
+    return {
+        "prefix": [w[:3] for w in rng.sample(WORDS, 10)],
+        "infix": [w[1:] for w in rng.sample(long_words, 10)],
+        "no_tone": [_strip_tones(w) for w in rng.sample([w for w in WORDS if _strip_tones(w) != w], 8)],
+        "typo": [_typo(w, rng) for w in rng.sample(long_words, 10)],
+        "missing": ["ทุเรียนทอด", "ไม้กวาด", "Battery", "ถ่านไฟฉาย", "หมึกพิมพ์"],
+    }
+
+
+async def regex(q):
+    return await db.goods.find({"name": {"$regex": q, "$options": "i"}}, {"imageBase64": 0}).limit(20).to_list(20)
+
+
+async def search(q):
+    return await search_goods(q=q, limit=20)
+
+
+async def measure(name, call, queries, repeat):
+    times, found = [], 0
+    for q in queries:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            items = await call(q)
+            times.append((time.perf_counter() - t0) * 1000)
+        found += bool(items)
+    times.sort()
+    return {"mode": name, "queries": len(queries), "found": found,
+            "p50_ms": round(statistics.median(times), 2),
+            "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 2)}
+
+
+async def main_async(args):
+    await db_indexes.ensure()
+    t0 = time.perf_counter()
+    await _seed(args.goods)
+    print({"seed_and_index_sec": round(time.perf_counter() - t0, 1)})
+    try:
+        for kind, queries in _queries(random.Random(3)).items():
+            before = await measure(f"regex_{kind}", regex, queries, args.repeat)
+            after = await measure(f"search_{kind}", search, queries, args.repeat)
+            print(before)
+            print(after)
+            print(f"{kind:>8}: p50 {before['p50_ms']} -> {after['p50_ms']} ms "
+                  f"(x{before['p50_ms'] / max(after['p50_ms'], 0.01):.1f}), "
+                  f"เจอ {before['found']} -> {after['found']} จาก {len(queries)} คำค้น")
+    finally:
+        if not args.keep:
+            await _cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--goods", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
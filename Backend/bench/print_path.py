@@ -0,0 +1,324 @@
+"""
+📊 วัดเส้นทางพิมพ์ทั้งเส้น (วาด -> ส่ง -> กระดาษออก) กับเครื่องพิมพ์จำลอง (bench/printer_emulator)
+
+รันจากโฟลเดอร์ Backend (ต้องต่อ Mongo ได้: ใช้ DB_NAME=TUKJAISHOP_BENCH ถ้าไม่ได้ตั้งไว้ ลบข้อมูลทดสอบเองตอนจบ):
+    python -m bench.print_path --iterations 10 --labels 20
+    python -m bench.print_path --backend text --stored logo,emoji --printers 2
+    python -m bench.print_path --baseline bench/results/print_path-20260101-100000.json
+    python -m bench.print_path --golden bench/golden        # ครั้งแรกบันทึก golden ครั้งต่อไปเทียบ pixel
+
+วัด 5 เส้นทาง
+- receipt_thai:    order_routes.print_receipt_thai (async, ผ่าน printer_registry)
+- reprint:         order_routes.reprint_order (ภาพจากคลังใบเสร็จ ไม่วาดใหม่)
+- goods_label:     goods_routes.print_goods_label
+- multiple_labels: goods_routes.print_multiple_labels(stream=True)
+- sync_receipt:    utils/printer.print_receipt (python-escpos, text backend)
+
+แต่ละเส้นทางรายงาน render_ms (วาดอย่างเดียว), bytes_on_wire (ต่องาน), latency_ms (เรียกฟังก์ชัน ->
+กระดาษออกครบตาม speed ที่จำลอง) และ labels_per_min แล้วบันทึกเป็น JSON ใน bench/results/
+ใส่ --baseline เพื่อเทียบกับผลรอบก่อน (แย่ลงเกิน --tolerance % จะขึ้น ⚠️)
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault("DB_NAME", "TUKJAISHOP_BENCH")
+
+from bench.printer_emulator import EmulatedPrinter, diff_pixels  # noqa: E402
+from bench.render_layout import _order  # noqa: E402
+from bson import ObjectId  # noqa: E402
+from database import db  # noqa: E402
+from routes.goods_routes import print_goods_label, print_multiple_labels  # noqa: E402
+from routes.order_routes import print_receipt_thai, reprint_order  # noqa: E402
+from utils import (  # noqa: E402
+    label_cache, printer, printer_registry, printer_transport, receipt_archive, render_pool, stored_graphics,
+)
+from utils.escpos_raster import build_job  # noqa: E402
+from utils.print_document import BACKEND_TEXT, choose_backend  # noqa: E402
+from utils.receipt_render import encode_receipt, render_goods_label  # noqa: E402
+
+HOST = "127.0.0.1"
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+BENCH_TYPE = "BENCH"
+PRINTED_AT = "01/01/2026 10:00:00"
+POINTS = {"before": 10, "redeem": 0, "earned": 16, "after": 26}
+
+# ตัวชี้วัดที่ยิ่งน้อยยิ่งดี / ยิ่งมากยิ่งดี (ใช้เทียบกับ baseline)
+LOWER_IS_BETTER = ("render_ms", "bytes_on_wire", "latency_ms")
+HIGHER_IS_BETTER = ("labels_per_min",)
+
+
+def _barcode(i):
+    return f"bench-{i:05d}"
+
+
+def _item(i):
+    return {"barcode": _barcode(i), "name": f"สินค้าทดสอบหมายเลข {i}", "type": BENCH_TYPE, "price": 10.0 + i}
+
+
+def _summary(values):
+    values = sorted(values)
+    return {
+        "p50": round(statistics.median(values), 2),
+        "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 2),
+        "max": round(values[-1], 2),
+    }
+
+
+class Bench:
+    def __init__(self, emulators, caps):
+        self.emulators = emulators
+        self.caps = caps
+
+    def _pages(self):
+        return sum(len(e.pages) for e in self.emulators)
+
+    def _counts(self):
+        return [len(e.pages) for e in self.emulators]
+
+    def _bytes(self):
+        return sum(e.bytes_received for e in self.emulators)
+
+    async def _finish(self, before, expected, timeout=60.0):
+        """รอจนมีใบใหม่ครบ คืนเวลาที่ใบสุดท้ายออกจากเครื่อง (perf_counter)"""
+        deadline = time.perf_counter() + timeout
+        while self._pages() < sum(before) + expected:
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"เครื่องพิมพ์จำลองได้ {self._pages() - sum(before)} จาก {expected} ใบ")
+            await asyncio.sleep(0.002)
+        new = [p for e, start in zip(self.emulators, before) for p in e.pages[start:]]
+        printed = max(p.printed for p in new)
+        # ✅ รอหัวพิมพ์ว่างก่อนรอบถัดไป: วัด latency ของงานเดียว ไม่ใช่คิว
+        await asyncio.sleep(max(0.0, printed - time.perf_counter()))
+        return printed
+
+    async def measure(self, name, iterations, call, render, pages=1, labels=0):
+        render_ms, wire, latency = [], [], []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            render()
+            render_ms.append((time.perf_counter() - t0) * 1000)
+
+            before_pages, before_bytes = self._counts(), self._bytes()
+            t0 = time.perf_counter()
+            await call()
+            printed = await self._finish(before_pages, pages)
+            latency.append((printed - t0) * 1000)
+            wire.append(self._bytes() - before_bytes)
+
+        elapsed = time.perf_counter() - started
+        result = {
+            "scenario": name,
+            "iterations": iterations,
+            "pages_per_job": pages,
+            "render_ms": _summary(render_ms),
+            "bytes_on_wire": int(statistics.median(wire)),
+            "latency_ms": _summary(latency),
+        }
+        if labels:
+            # ✅ ต่อเนื่องทั้งรอบ (รวมเวลาวาด + ส่ง + หัวพิมพ์) ไม่ใช่แค่งานเดียว
+            result["labels_per_min"] = round(labels * iterations / elapsed * 60, 1)
+        print(result)
+        return result
+
+
+async def _seed(count):
+    await db.goods.delete_many({"barcode": {"$regex": "^bench-"}})
+    await db.goods_types.delete_many({"name": BENCH_TYPE})
+    await db.goods_types.insert_one({"name": BENCH_TYPE})
+    await db.goods.insert_many([_item(i) for i in range(count)])
+
+
+async def _cleanup():
+    await db.goods.delete_many({"barcode": {"$regex": "^bench-"}})
+    await db.goods_types.delete_many({"name": BENCH_TYPE})
+
+
+async def _golden(bench, golden_dir, caps, stored):
+    """ส่งเอกสารที่ผลต้องเหมือนเดิมทุกครั้ง (เวลาคงที่) แล้วเทียบภาพที่เครื่องจำลองวาดกลับ"""
+    emulator = bench.emulators[0]
+    target = printer_registry.get("bench-1")
+    docs = {
+        "receipt": encode_receipt(_order(15), POINTS, PRINTED_AT, choose_backend(caps), caps, stored),
+        "label": build_job([render_goods_label(_item(1), BENCH_TYPE)]),
+    }
+    result = {}
+    for name, data in docs.items():
+        before = len(emulator.pages)
+        await printer_transport.send(target.host, data, port=target.port)
+        await emulator.wait_pages(before + 1)
+        page = emulator.pages[before]
+        result[name] = diff_pixels(page.image, os.path.join(golden_dir, f"{name}_{choose_backend(caps)}.png"))
+    print({"golden_diff_px": result})
+    return result
+
+
+def _compare(results, baseline_path, tolerance):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {s["scenario"]: s for s in json.load(f)["scenarios"]}
+
+    def value(metric, data):
+        v = data.get(metric)
+        return v["p50"] if isinstance(v, dict) else v
+
+    report = []
+    for scenario in results:
+        old = baseline.get(scenario["scenario"])
+        if not old:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            new_v, old_v = value(metric, scenario), value(metric, old)
+            if not new_v or not old_v:
+                continue
+            change = (new_v - old_v) / old_v * 100
+            worse = change > tolerance if metric in LOWER_IS_BETTER else change < -tolerance
+            report.append({"scenario": scenario["scenario"], "metric": metric, "baseline": old_v,
+                           "now": new_v, "change_pct": round(change, 1), "regression": worse})
+            print(f"{'⚠️' if worse else '  '} {scenario['scenario']:<16} {metric:<15} {old_v:>10} -> {new_v:<10} ({change:+.1f}%)")
+    return report
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+async def run(args):
+    tmp = tempfile.mkdtemp()
+    stored = [n.strip() for n in args.stored.split(",") if n.strip()]
+    emulators, config = [], []
+    for i in range(args.printers):
+        emulator = EmulatedPrinter(bandwidth=args.bandwidth or None, speed=args.speed or None)
+        port = await emulator.start(HOST, 0)
+        emulators.append(emulator)
+        config.append({"name": f"bench-{i + 1}", "host": HOST, "port": port, "roles": list(printer_registry.ROLES),
+                       "thai_codepage": 21 if args.backend == BACKEND_TEXT else None, "stored_graphics": stored})
+
+    printer_registry.CONFIG_PATH = os.path.join(tmp, "printers.json")
+    with open(printer_registry.CONFIG_PATH, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    printer_registry.load()
+    stored_graphics.STATE_PATH = os.path.join(tmp, "stored_graphics.json")
+    stored_graphics._state = None
+    receipt_archive.ARCHIVE_DIR = os.path.join(tmp, "receipt_archive")
+    render_pool.start()
+
+    bench = Bench(emulators, printer_registry.get("bench-1").caps)
+    caps = bench.caps
+    order = _order(args.items)
+    item = _item(0)
+    batch = {"barcodes": [_barcode(i) for i in range(args.labels)]}
+    sync_caps = {**caps, "thai_codepage": caps["thai_codepage"] or 21}
+
+    async def cold_labels():
+        if args.cold:
+            for i in range(args.labels):
+                await label_cache.invalidate(_barcode(i))
+
+    async def call_goods_label():
+        await cold_labels()
+        await print_goods_label(item)
+
+    async def call_multiple_labels():
+        await cold_labels()
+        response = await print_multiple_labels(batch, stream=True)
+        async for _ in response.body_iterator:
+            pass
+
+    def render_batch():
+        for i in range(args.labels):
+            render_goods_label(_item(i), BENCH_TYPE)
+
+    await _seed(max(args.labels, 1))
+    try:
+        # ✅ อัปโหลดรูปใน NV ก่อนเริ่มวัด (ครั้งเดียวต่อเครื่อง ไม่ใช่ต้นทุนของแต่ละใบ)
+        ready = [await stored_graphics.ensure(HOST, c["port"], names=stored) for c in config]
+        stored_ready = ready[0]
+        archived_id = str(ObjectId())
+        await receipt_archive.save(archived_id, order, POINTS, PRINTED_AT)
+        scenarios = [
+            await bench.measure(
+                "receipt_thai", args.iterations,
+                lambda: print_receipt_thai({**order, "_id": str(ObjectId())}),
+                lambda: encode_receipt(order, POINTS, PRINTED_AT, choose_backend(caps), caps, stored_ready),
+            ),
+            await bench.measure(
+                "reprint", args.iterations, lambda: reprint_order(archived_id), lambda: None,
+            ),
+            await bench.measure(
+                "goods_label", args.iterations, call_goods_label,
+                lambda: render_goods_label(item, BENCH_TYPE), labels=1,
+            ),
+            await bench.measure(
+                "multiple_labels", args.iterations, call_multiple_labels, render_batch,
+                pages=args.labels, labels=args.labels,
+            ),
+            await bench.measure(
+                "sync_receipt", args.iterations,
+                lambda: asyncio.to_thread(printer.print_receipt, order),
+                lambda: encode_receipt(order, None, None, BACKEND_TEXT, sync_caps),
+            ),
+        ]
+        golden = await _golden(bench, args.golden, caps, stored_ready) if args.golden else None
+    finally:
+        await _cleanup()
+        await printer_transport.close_all()
+        for emulator in emulators:
+            await emulator.stop()
+        render_pool.stop()
+
+    result = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "args": vars(args),
+        },
+        "emulators": [e.stats() for e in emulators],
+        "scenarios": scenarios,
+        "golden_diff_px": golden,
+    }
+    if args.baseline:
+        result["comparison"] = _compare(scenarios, args.baseline, args.tolerance)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"print_path-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"💾 บันทึกผลที่ {out}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--items", type=int, default=15, help="จำนวนรายการในใบเสร็จ")
+    parser.add_argument("--labels", type=int, default=20, help="จำนวน Label ต่อชุด")
+    parser.add_argument("--printers", type=int, default=1, help="จำนวนเครื่องพิมพ์จำลอง")
+    parser.add_argument("--backend", choices=["raster", BACKEND_TEXT], default="raster")
+    parser.add_argument("--stored", default="", help="รูปใน NV เช่น logo,emoji")
+    parser.add_argument("--bandwidth", type=int, default=250_000, help="byte/วินาที (0 = ไม่จำกัด)")
+    parser.add_argument("--speed", type=float, default=250, help="mm/วินาที (0 = ไม่จำกัด)")
+    parser.add_argument("--cold", action="store_true", help="ล้าง label_cache ก่อนพิมพ์ Label ทุกรอบ")
+    parser.add_argument("--golden", default=None, help="โฟลเดอร์ภาพ golden")
+    parser.add_argument("--baseline", default=None, help="ไฟล์ผลรอบก่อนสำหรับเทียบ")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="% ที่ถือว่าแย่ลง")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
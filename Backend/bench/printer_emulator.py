@@ -0,0 +1,459 @@
+"""
+🖨️ เครื่องพิมพ์ ESC/POS จำลอง (TCP port 9100) สำหรับวัดผลโดยไม่ต้องมีเครื่องจริง
+
+รันจากโฟลเดอร์ Backend:
+    python -m bench.printer_emulator --port 9100 --bandwidth 200000 --speed 250 --save ./emulator_pages
+
+แล้วตั้ง PRINTER_IP=127.0.0.1 (หรือใส่ใน printers.json) ให้แอปส่งงานมาที่นี่
+
+- อ่านคำสั่งทีละคำสั่งจาก stream (ESC @ / ESC a / ESC J / GS ! / GS v 0 / GS ( L / GS 8 L / GS V ...)
+- ภาพ raster (GS v 0, GS ( L fn=112/50) และรูปใน NV (fn=67 / 69) วาดกลับเป็นภาพ
+  ข้อความ code page ไทยวาดด้วยฟอนต์ของร้าน (ใกล้เคียงของจริง ใช้ดูผล/เทียบ golden ได้)
+- ตัดกระดาษ (GS V) = จบ 1 ใบ เก็บเป็น Page (ภาพ mode "1", ข้อความ, byte, เวลา)
+- bandwidth = byte/วินาทีที่รับได้ (จำลองสายช้า / buffer เครื่องพิมพ์เต็ม)
+- speed = ความเร็วหัวพิมพ์ mm/วินาที (8 dot/mm) -> เวลาที่กระดาษออกจากเครื่องจริง
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter, namedtuple
+
+from PIL import Image, ImageChops, ImageDraw
+
+from utils import print_assets
+
+DOTS_PER_MM = 8
+LINE_HEIGHT = 30                 # ESC 2: ระยะบรรทัดเริ่มต้น (dot)
+TEXT_SIZE = 24                   # Font A สูง 24 dot
+
+ESC, GS, FS, DLE = 0x1B, 0x1D, 0x1C, 0x10
+
+# บรรทัดข้อความ: วาดตอนขอดูภาพเท่านั้น (ไม่กินเวลา event loop ระหว่างวัด latency)
+TextLine = namedtuple("TextLine", ["text", "scale", "align", "height"])
+
+# ESC / GS ที่มี parameter เป็น byte คงที่ (จำนวน byte หลังตัวคำสั่ง)
+_ESC_ARGS = {
+    ord("@"): 0, ord("2"): 0, ord("<"): 0,
+    ord("p"): 3, ord("$"): 2, ord("\\"): 2,
+}
+_GS_ARGS = {
+    ord("L"): 2, ord("W"): 2, ord("P"): 2, ord("$"): 2, ord("\\"): 2,
+}
+
+
+class Page:
+    def __init__(self, index, segments, width, text, size, started, received, printed, commands):
+        self.index = index
+        self.segments = segments
+        self.width = width
+        self.text = text                 # บรรทัดข้อความที่ส่งเป็นตัวอักษร
+        self.bytes = size                # byte ที่ได้รับตั้งแต่ใบก่อนจนถึงคำสั่งตัด
+        self.started = started           # time.perf_counter() ตอนได้ byte แรกของใบ
+        self.received = received         # ได้คำสั่งตัดกระดาษ
+        self.printed = printed           # กระดาษออกจากเครื่อง (ตาม speed ที่จำลอง)
+        self.commands = commands
+
+        self._image = None
+
+    @property
+    def height(self):
+        return _height(self.segments)
+
+    @property
+    def image(self) -> Image.Image:
+        """ภาพทั้งใบ mode "1" (ขาว = 1)"""
+        if self._image is None:
+            self._image = _compose(self.segments, self.width)
+        return self._image
+
+    def info(self):
+        return {
+            "index": self.index,
+            "height": self.height,
+            "bytes": self.bytes,
+            "text_lines": len(self.text),
+            "receive_ms": round((self.received - self.started) * 1000, 2),
+            "print_ms": round((self.printed - self.started) * 1000, 2),
+            "commands": dict(self.commands),
+        }
+
+
+class _Session:
+    """สถานะคำสั่งของแต่ละ connection (ESC @ รีเซ็ต)"""
+
+    def __init__(self):
+        self.reset()
+        self.segments = []               # [(ภาพ mode "1" หรือ int = เลื่อนกระดาษกี่ dot, align)]
+        self.text = []
+        self.line = bytearray()
+        self.graphics_buffer = None
+        self.bytes = 0
+        self.started = None
+        self.commands = Counter()
+
+    def reset(self):
+        self.align = 0
+        self.size_mode = 0
+        self.codepage = 0
+        self.line_height = LINE_HEIGHT
+
+
+class EmulatedPrinter:
+    def __init__(self, width: int = 576, bandwidth: int = None, speed: float = None,
+                 thai_codepage: int = 21, save_dir: str = None):
+        self.width = width
+        self.bandwidth = bandwidth       # byte/วินาที (None = ไม่จำกัด)
+        self.speed = speed               # mm/วินาที (None = พิมพ์ทันที)
+        self.thai_codepage = thai_codepage
+        self.save_dir = save_dir
+        self.pages = []
+        self.nv = {}                     # key 2 byte -> ภาพ mode "1"
+        self.bytes_received = 0
+        self.unknown = Counter()
+        self._head_free = 0.0
+        self._changed = asyncio.Condition()
+        self._server = None
+
+    # ===== server =====
+    async def start(self, host: str = "127.0.0.1", port: int = 9100) -> int:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        session = _Session()
+        buf = bytearray()
+        due = time.perf_counter()
+        chunk = 4096 if not self.bandwidth else max(64, min(4096, self.bandwidth // 100))
+        try:
+            while data := await reader.read(chunk):
+                if self.bandwidth:
+                    # ✅ token bucket: รับได้ไม่เกิน bandwidth -> ผู้ส่งโดน TCP backpressure เหมือนของจริง
+                    due = max(due, time.perf_counter()) + len(data) / self.bandwidth
+                    await asyncio.sleep(due - time.perf_counter())
+                self.bytes_received += len(data)
+                buf += data
+                consumed = self._feed(session, buf, writer)
+                del buf[:consumed]
+                await self._notify()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def wait_pages(self, count: int, timeout: float = 30.0) -> list:
+        """รอจนมีอย่างน้อย count ใบ แล้วรอจนกระดาษออกครบตามเวลาที่จำลอง"""
+        async with self._changed:
+            await asyncio.wait_for(self._changed.wait_for(lambda: len(self.pages) >= count), timeout)
+        pages = self.pages[:count]
+        delay = max(p.printed for p in pages) - time.perf_counter() if pages else 0
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return pages
+
+    # ===== parser =====
+    def _feed(self, s, buf, writer) -> int:
+        i, n = 0, len(buf)
+        while i < n:
+            if s.started is None:
+                s.started = time.perf_counter()
+            end = self._command(s, buf, i, writer)
+            if end is None:              # คำสั่งยังมาไม่ครบ รอ byte ต่อไป
+                break
+            s.bytes += end - i
+            i = end
+        return i
+
+    def _command(self, s, buf, i, writer):
+        n = len(buf)
+        b = buf[i]
+        if b == 0x0A:
+            self._line_feed(s)
+            return i + 1
+        if b == 0x0D:
+            return i + 1
+        if b not in (ESC, GS, FS, DLE):
+            s.line.append(b)
+            return i + 1
+        if i + 1 >= n:
+            return None
+        c = buf[i + 1]
+
+        if b == DLE:
+            if i + 2 >= n:
+                return None
+            if c == 0x04:                # DLE EOT n: ถามสถานะ -> ตอบว่าพร้อม
+                writer.write(b"\x12")
+            s.commands["DLE"] += 1
+            return i + 3
+        if b == FS:
+            s.commands["FS"] += 1
+            return i + (4 if c == ord("p") else 2)
+        if b == ESC:
+            return self._esc(s, buf, i, c)
+        return self._gs(s, buf, i, c)
+
+    def _esc(self, s, buf, i, c):
+        n = len(buf)
+        if c in _ESC_ARGS:
+            end = i + 2 + _ESC_ARGS[c]
+            if end > n:
+                return None
+            if c == ord("@"):
+                self._flush_line(s)
+                s.reset()
+            elif c == ord("2"):
+                s.line_height = LINE_HEIGHT
+            s.commands[f"ESC {chr(c)}"] += 1
+            return end
+        if i + 2 >= n:
+            return None
+        arg = buf[i + 2]
+        if c == ord("a"):
+            self._flush_line(s)
+            s.align = arg % 48
+        elif c == ord("J"):
+            self._flush_line(s)
+            s.segments.append((arg, 0))
+        elif c == ord("d"):
+            self._flush_line(s)
+            s.segments.append((arg * s.line_height, 0))
+        elif c == ord("3"):
+            s.line_height = arg
+        elif c == ord("t"):
+            s.codepage = arg
+        elif c == ord("!"):
+            s.size_mode = (0x01 if arg & 0x10 else 0) | (0x10 if arg & 0x20 else 0)
+        elif chr(c) not in "EG-M":
+            self.unknown[f"ESC {c:#04x}"] += 1
+        s.commands[f"ESC {chr(c)}"] += 1
+        return i + 3
+
+    def _gs(self, s, buf, i, c):
+        n = len(buf)
+        if c == ord("v"):                # GS v 0 m xL xH yL yH d...
+            if i + 8 > n:
+                return None
+            row_bytes = int.from_bytes(buf[i + 4:i + 6], "little")
+            rows = int.from_bytes(buf[i + 6:i + 8], "little")
+            end = i + 8 + row_bytes * rows
+            if end > n:
+                return None
+            self._flush_line(s)
+            s.segments.append((_bits_image(buf[i + 8:end], row_bytes, rows), s.align))
+            s.commands["GS v 0"] += 1
+            return end
+        if c in (ord("("), ord("8")):     # GS ( X pL pH ... / GS 8 L p1 p2 p3 p4 ...
+            head = 5 if c == ord("(") else 7
+            if i + head > n:
+                return None
+            size = int.from_bytes(buf[i + 3:i + head], "little")
+            end = i + head + size
+            if end > n:
+                return None
+            if buf[i + 2] == ord("L"):
+                self._graphics(s, bytes(buf[i + head:end]))
+            else:
+                s.commands[f"GS ( {chr(buf[i + 2])}"] += 1
+            return end
+        if c == ord("V"):                # GS V m [n]
+            if i + 2 >= n:
+                return None
+            end = i + (4 if buf[i + 2] in (65, 66, 97, 98) else 3)
+            if end > n:
+                return None
+            if end == i + 4:
+                s.segments.append((buf[i + 3], 0))
+            s.commands["GS V"] += 1
+            self._cut(s, end - i)
+            return end
+        if c == ord("k"):                # บาร์โค้ด: ข้ามข้อมูล (ร้านพิมพ์ QR เป็นภาพอยู่แล้ว)
+            if i + 3 >= n:
+                return None
+            m = buf[i + 2]
+            if m >= 65:
+                end = i + 4 + buf[i + 3]
+            else:
+                nul = buf.find(b"\x00", i + 3)
+                end = None if nul < 0 else nul + 1
+            if end is None or end > n:
+                return None
+            s.commands["GS k"] += 1
+            return end
+        if c in _GS_ARGS:
+            end = i + 2 + _GS_ARGS[c]
+        else:
+            end = i + 3
+        if end > n:
+            return None
+        if c == ord("!"):
+            s.size_mode = buf[i + 2]
+        elif c not in _GS_ARGS and chr(c) not in "BHfhwa":
+            self.unknown[f"GS {c:#04x}"] += 1
+        s.commands[f"GS {chr(c)}"] += 1
+        return end
+
+    def _graphics(self, s, body):
+        """GS ( L / GS 8 L: m fn ..."""
+        fn = body[1] if len(body) > 1 else None
+        s.commands[f"GS ( L fn={fn}"] += 1
+        if fn == 112:                    # เก็บภาพลง print buffer
+            width = int.from_bytes(body[6:8], "little")
+            rows = int.from_bytes(body[8:10], "little")
+            s.graphics_buffer = _bits_image(body[10:], (width + 7) // 8, rows)
+        elif fn == 50 and s.graphics_buffer is not None:
+            self._flush_line(s)
+            s.segments.append((s.graphics_buffer, s.align))
+            s.graphics_buffer = None
+        elif fn == 67:                   # define NV: a kc1 kc2 b xL xH yL yH c data
+            key = body[3:5]
+            width = int.from_bytes(body[6:8], "little")
+            rows = int.from_bytes(body[8:10], "little")
+            self.nv[key] = _bits_image(body[11:], (width + 7) // 8, rows)
+        elif fn == 69:                   # print NV: kc1 kc2 x y
+            image = self.nv.get(body[2:4])
+            if image is None:
+                self.unknown[f"NV {body[2:4].decode(errors='replace')} missing"] += 1
+            else:
+                self._flush_line(s)
+                s.segments.append((image, s.align))
+        elif fn == 66:
+            self.nv.pop(body[2:4], None)
+        elif fn == 65:
+            self.nv.clear()
+
+    # ===== text =====
+    def _encoding(self, s):
+        return "cp874" if s.codepage == self.thai_codepage else "cp437"
+
+    def _line_feed(self, s):
+        if s.line:
+            self._flush_line(s)
+        else:
+            s.segments.append((s.line_height, 0))
+
+    def _flush_line(self, s):
+        if not s.line:
+            return
+        text = bytes(s.line).decode(self._encoding(s), errors="replace")
+        s.line.clear()
+        s.text.append(text)
+        scale = (s.size_mode & 0x0F) + 1
+        s.segments.append((TextLine(text, scale, s.align, max(s.line_height, TEXT_SIZE * scale + 6)), 0))
+
+    # ===== page =====
+    def _cut(self, s, cut_bytes):
+        self._flush_line(s)
+        now = time.perf_counter()
+        started = s.started or now
+        # ✅ หัวพิมพ์เริ่มเมื่อได้ข้อมูลและพิมพ์ใบก่อนเสร็จแล้ว จบไม่ก่อนได้คำสั่งตัด
+        printed = now
+        if self.speed:
+            begin = max(started, self._head_free)
+            printed = max(now, begin + _height(s.segments) / (self.speed * DOTS_PER_MM))
+        self._head_free = printed
+        page = Page(len(self.pages), s.segments, self.width, list(s.text), s.bytes + cut_bytes, started, now, printed, s.commands)
+        self.pages.append(page)
+        if self.save_dir:
+            os.makedirs(self.save_dir, exist_ok=True)
+            page.image.save(os.path.join(self.save_dir, f"page_{page.index:04d}.png"))
+            print(f"🧾 ใบที่ {page.index} {page.info()}")
+        s.segments, s.text, s.bytes, s.started, s.commands = [], [], -cut_bytes, None, Counter()
+
+    def stats(self):
+        return {
+            "pages": len(self.pages),
+            "bytes_received": self.bytes_received,
+            "nv_keys": sorted(k.decode(errors="replace") for k in self.nv),
+            "unknown_commands": dict(self.unknown),
+        }
+
+
+def _bits_image(data, row_bytes, rows) -> Image.Image:
+    """ข้อมูล raster ESC/POS (1 = ดำ) -> ภาพ mode "1" (1 = ขาว)"""
+    size = row_bytes * rows
+    data = bytes(data[:size]).ljust(size, b"\x00")
+    return ImageChops.invert(Image.frombytes("1", (row_bytes * 8, rows), data))
+
+
+def _height(segments):
+    return sum(seg if isinstance(seg, int) else seg.height for seg, _ in segments)
+
+
+def _text_image(line, width) -> Image.Image:
+    font = print_assets.font(TEXT_SIZE * line.scale)
+    img = Image.new("1", (width, line.height), 1)
+    draw = ImageDraw.Draw(img)
+    length = draw.textlength(line.text, font=font)
+    x = {1: (width - length) / 2, 2: width - length}.get(line.align, 0)
+    draw.text((max(0, x), 0), line.text, font=font, fill=0)
+    return img
+
+
+def _compose(segments, width) -> Image.Image:
+    page = Image.new("1", (width, _height(segments)), 1)
+    y = 0
+    for seg, align in segments:
+        if isinstance(seg, int):
+            y += seg
+            continue
+        if isinstance(seg, TextLine):
+            seg = _text_image(seg, width)
+        x = {1: (width - seg.width) // 2, 2: width - seg.width}.get(align, 0)
+        page.paste(seg, (max(0, x), y))
+        y += seg.height
+    return page
+
+
+def diff_pixels(image: Image.Image, golden_path: str) -> int:
+    """
+    เทียบกับภาพ golden: คืนจำนวน pixel ที่ต่างกัน (0 = เหมือนทุก pixel)
+    ยังไม่มีไฟล์ golden -> บันทึกภาพนี้เป็น golden แล้วคืน 0
+    """
+    if not os.path.exists(golden_path):
+        os.makedirs(os.path.dirname(golden_path) or ".", exist_ok=True)
+        image.save(golden_path)
+        return 0
+    golden = Image.open(golden_path).convert("1")
+    if golden.size != image.size:
+        return max(golden.width, image.width) * max(golden.height, image.height)
+    return ImageChops.logical_xor(golden, image.convert("1")).histogram()[255]
+
+
+async def serve(args):
+    printer = EmulatedPrinter(args.width, args.bandwidth, args.speed, args.thai_codepage, args.save)
+    port = await printer.start(args.host, args.port)
+    print(f"🖨️ เครื่องพิมพ์จำลองรอที่ {args.host}:{port} (bandwidth={args.bandwidth or '∞'} B/s, speed={args.speed or '∞'} mm/s)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await printer.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--width", type=int, default=576)
+    parser.add_argument("--bandwidth", type=int, default=None, help="byte/วินาที")
+    parser.add_argument("--speed", type=float, default=None, help="mm/วินาที")
+    parser.add_argument("--thai-codepage", type=int, default=21)
+    parser.add_argument("--save", default=None, help="โฟลเดอร์เก็บภาพแต่ละใบ (PNG)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
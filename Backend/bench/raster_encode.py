@@ -0,0 +1,60 @@
+"""
+📊 เทียบการแปลงใบเสร็จเป็นคำสั่งพิมพ์: escpos Network.image() (ผ่าน PNG) vs utils/escpos_raster
+
+รันจากโฟลเดอร์ Backend:
+    python -m bench.raster_encode --items 15 --rounds 50
+
+ใช้ escpos.printer.Dummy เก็บ byte แทนการส่งเข้าเครื่องพิมพ์จริง (Network.image() ใช้โค้ดเดียวกัน)
+"""
+import argparse
+import time
+from io import BytesIO
+
+from escpos.printer import Dummy
+
+from bench.render_layout import _order
+from utils.escpos_raster import build_job, decode_gs_v0
+from utils.receipt_layout import to_image
+from utils.receipt_render import render_receipt
+
+
+def escpos_image_path(raster):
+    bw = to_image(raster)
+    buf = BytesIO()
+    bw.save(buf, format="PNG")
+    buf.seek(0)
+    p = Dummy()
+    p.profile.profile_data["media"]["width"]["pixels"] = raster.width
+    p.image(buf)
+    p.cut()
+    return p.output
+
+
+def direct_path(raster):
+    return build_job([raster])
+
+
+def measure(name, fn, raster, rounds):
+    data = fn(raster)
+    t0 = time.process_time()
+    for _ in range(rounds):
+        fn(raster)
+    cpu_ms = (time.process_time() - t0) / rounds * 1000
+    return {"path": name, "bytes_sent": len(data), "cpu_ms": round(cpu_ms, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=15)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    raster = render_receipt(_order(args.items), {"before": 10, "redeem": 0, "earned": 16, "after": 26})
+    assert decode_gs_v0(direct_path(raster)).data == raster.data
+    print({"receipt_px": (raster.width, raster.height)})
+    print(measure("escpos_image", escpos_image_path, raster, args.rounds))
+    print(measure("direct", direct_path, raster, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+📊 เทียบเวลา / หน่วยความจำของการวาดใบเสร็จ: แบบเดิม vs layout engine
+
+รันจากโฟลเดอร์ Backend:
+    python -m bench.render_layout --items 15 --rounds 30
+
+"แบบเดิม" คือวิธีของ print_receipt_thai ก่อนมี layout engine:
+canvas RGB 576x2500 -> crop -> L -> threshold ด้วย lambda ต่อ pixel
+หน่วยความจำนับจากขนาดภาพทุกภาพที่ PIL สร้างระหว่างวาด 1 ใบ
+"""
+import argparse
+import time
+from datetime import datetime
+
+from PIL import Image, ImageDraw
+
+from utils import print_assets
+from utils.receipt_render import RECEIPT_W, render_receipt
+
+_BYTES_PER_PIXEL = {"1": 1, "L": 1, "P": 1}
+
+
+class _AllocCounter:
+    """นับ byte ของภาพทุกภาพที่ PIL สร้าง (Image.new / crop / convert / point ฯลฯ ผ่าน Image._new ทั้งหมด)"""
+
+    def __enter__(self):
+        self.total = 0
+        self._inner = Image.Image._new
+
+        def count(im, core):
+            out = self._inner(im, core)
+            self.total += out.size[0] * out.size[1] * _BYTES_PER_PIXEL.get(out.mode, 4)
+            return out
+
+        Image.Image._new = count
+        return self
+
+    def __exit__(self, *exc):
+        Image.Image._new = self._inner
+
+
+def _draw_center(draw, y, text, font, canvas_w):
+    w = draw.textlength(text, font=font)
+    x = int((canvas_w - w) / 2)
+    draw.text((x, y), text, font=font, fill="black")
+    return draw.textbbox((x, y), text, font=font)[3]
+
+
+def legacy_render_receipt(order_dict, points):
+    font_title, font_normal, font_small = (print_assets.font(s) for s in (60, 42, 34))
+    img = Image.new("RGB", (RECEIPT_W, 2500), "white")
+    draw = ImageDraw.Draw(img)
+    y = 6
+    logo = Image.open(print_assets.LOGO_PATH).convert("RGBA")
+    ratio = min(1.0, ((RECEIPT_W - 48) / logo.width))
+    logo = logo.resize((int(logo.width * ratio), int(logo.height * ratio)))
+    img.paste(logo, (int((RECEIPT_W - logo.width) / 2), y), mask=logo)
+    y += logo.height + 10
+    y = _draw_center(draw, y, print_assets.SHOP_NAME, font_title, RECEIPT_W) + 6
+    y = _draw_center(draw, y, print_assets.SHOP_ADDRESS, font_small, RECEIPT_W) + 10
+    draw.text((40, y), "-" * 42, font=font_small, fill="black")
+    y += 40
+    for item in order_dict["items"]:
+        draw.text((40, y), f"{item['name']} x{item['qty']}", font=font_normal, fill="black")
+        val = f"{item['total']:,.2f}"
+        draw.text((RECEIPT_W - 40 - draw.textlength(val, font=font_normal), y), val, font=font_normal, fill="black")
+        y += 36
+    draw.text((40, y), "-" * 42, font=font_small, fill="black")
+    y += 40
+    for text, font, step in [
+        (f"รวมทั้งหมด: {order_dict['total']:,.2f} บาท", font_normal, 36),
+        (f"ยอดสุทธิ: {order_dict['total']:,.2f} บาท", font_normal, 40),
+        ("ชำระโดย: เงินสด", font_small, 30),
+        (f"รับเงิน: {order_dict['cash']:,.2f}", font_small, 30),
+        (f"เงินทอน: {order_dict['change']:,.2f}", font_small, 40),
+        ("-" * 42, font_small, 40),
+        (f"เบอร์สมาชิก: {order_dict['member']['phone']}", font_small, 30),
+        (f"แต้มก่อนใช้: {points['before']}", font_small, 28),
+        (f"ใช้แต้ม: {points['redeem']}", font_small, 28),
+        (f"ได้รับใหม่: {points['earned']}", font_small, 28),
+        (f"แต้มคงเหลือ: {points['after']}", font_small, 40),
+        ("-" * 42, font_small, 36),
+    ]:
+        draw.text((40, y), text, font=font, fill="black")
+        y += step
+    y = _draw_center(draw, y, "ขอบคุณที่อุดหนุน", font_normal, RECEIPT_W)
+    emoji = Image.open(print_assets.EMOJI_PATH).convert("RGBA").resize((48, 48))
+    img.paste(emoji, (int((RECEIPT_W - 48) / 2), y), mask=emoji)
+    y += 48 + 6 + 8
+    y = _draw_center(draw, y, datetime.now().strftime("%d/%m/%Y %H:%M:%S"), font_small, RECEIPT_W) + 20
+    img = img.crop((0, 0, RECEIPT_W, y))
+    return img.convert("L").point(lambda x: 0 if x < 160 else 255, mode="1")
+
+
+def _order(n_items):
+    items = [{"name": f"สินค้าทดสอบหมายเลข {i}", "qty": 1 + i % 3, "total": 100.0 + i} for i in range(n_items)]
+    total = sum(i["total"] for i in items)
+    return {"items": items, "total": total, "cash": total + 100, "change": 100.0,
+            "paymentType": "cash", "member": {"phone": "0800000000"}}
+
+
+def measure(name, fn, rounds):
+    fn()
+    with _AllocCounter() as alloc:
+        fn()
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    ms = (time.perf_counter() - t0) / rounds * 1000
+    return {"path": name, "render_ms": round(ms, 2), "image_bytes_allocated": alloc.total}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=15)
+    parser.add_argument("--rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    order = _order(args.items)
+    points = {"before": 10, "redeem": 0, "earned": 16, "after": 26}
+    print_assets.warm()
+    print(measure("legacy", lambda: legacy_render_receipt(order, points), args.rounds))
+    print(measure("layout", lambda: render_receipt(order, points), args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+📊 วัด latency ของการสแกนบาร์โค้ด ระหว่างที่มีใบเสร็จกำลังวาดอยู่พร้อมกัน
+
+รันจากโฟลเดอร์ Backend:
+    python -m bench.scan_latency --receipts 20
+
+เปรียบเทียบ 2 แบบ
+- inline: วาดใบเสร็จบน event loop (แบบเดิม)
+- pool:   วาดใน render_pool (process pool)
+ตัวจำลองการสแกนใช้ asyncio.sleep แทน round trip ไป Mongo ไม่ต้องต่อ DB / เครื่องพิมพ์
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from utils import render_pool
+from utils.receipt_render import render_receipt
+
+SCAN_RTT_SEC = 0.002
+
+ORDER = {
+    "_id": "bench",
+    "items": [{"name": f"สินค้าทดสอบ {i}", "qty": 1, "total": 100.0 + i} for i in range(15)],
+    "total": 1600.0,
+    "cash": 2000.0,
+    "change": 400.0,
+    "paymentType": "cash",
+    "member": {"phone": "0800000000"},
+}
+POINTS = {"before": 10, "redeem": 0, "earned": 16, "after": 26}
+
+
+async def _scan_probe(gap, out, done):
+    while not done.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(SCAN_RTT_SEC)
+        out.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(gap)
+
+
+async def _print_receipts(n, mode):
+    for _ in range(n):
+        if mode == "inline":
+            render_receipt(ORDER, POINTS)
+            await asyncio.sleep(0)
+        else:
+            await render_pool.run_cpu(render_receipt, ORDER, POINTS)
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run(mode, receipts):
+    latencies = []
+    done = asyncio.Event()
+    t0 = time.perf_counter()
+    probe = asyncio.create_task(_scan_probe(0.005, latencies, done))
+    await asyncio.gather(*[_print_receipts(receipts // 2, mode) for _ in range(2)])
+    done.set()
+    await probe
+    return {
+        "mode": mode,
+        "wall_s": round(time.perf_counter() - t0, 2),
+        "scans": len(latencies),
+        "scan_p50_ms": round(statistics.median(latencies), 2),
+        "scan_p99_ms": round(_pct(latencies, 99), 2),
+        "scan_max_ms": round(max(latencies), 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=20)
+    args = parser.parse_args()
+
+    render_pool.start()
+    try:
+        for mode in ("inline", "pool"):
+            print(await run(mode, args.receipts))
+    finally:
+        render_pool.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+"""
+📊 หักสต๊อกตอนขาย: แบบเดิม (find_one + update_one ทีละบรรทัด) vs utils/stock_commit ($in + หักแบบมีเงื่อนไข)
+
+รันจากโฟลเดอร์ Backend (ต้องต่อ Mongo ได้: ใช้ DB_NAME=TUKJAISHOP_BENCH ถ้าไม่ได้ตั้งไว้ ลบข้อมูลทดสอบเองตอนจบ):
+    python -m bench.stock_commit --lines 20 --orders 50
+    python -m bench.stock_commit --concurrent 20      # ขายสินค้าชิ้นเดียวกันพร้อมกัน: ตรวจ lost update
+
+- latency ต่อ order (p50 / p95) ของทั้งสองแบบ และจำนวน round trip ต่อ order
+- --concurrent: ยิง N order พร้อมกัน (บรรทัดละ 1 ชิ้นของสินค้าเดียวกัน) แล้วเทียบสต๊อกที่เหลือกับที่ควรเป็น
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("DB_NAME", "TUKJAISHOP_BENCH")
+
+from database import db  # noqa: E402
+from utils import db_indexes, stock_commit  # noqa: E402
+
+PREFIX = "bench-stock-"
+
+
+def _order(lines, offset=0):
+    items = [{"id": f"{PREFIX}{(offset + i) % lines:03d}", "name": f"สินค้า {i}", "qty": 1 + i % 3,
+              "price": 10.0, "total": 10.0 * (1 + i % 3)} for i in range(lines)]
+    return {"member": None, "items": items, "paymentType": "bench", "cash": 0, "total": 0, "change": 0, "date": "bench"}
+
+
+async def legacy_commit(order_dict):
+    """create_order แบบเดิม (ก่อนมี stock_commit) ไว้เทียบ"""
+    result = await db.orders.insert_one(order_dict)
+    updated = []
+    for item in order_dict.get("items", []):
+        barcode = item.get("id") or item.get("barcode")
+        qty_sold = int(item.get("qty", 0))
+        product = await db.goods.find_one({"barcode": barcode})
+        if not product:
+            continue
+        current_qty = int(product.get("stock", 0))
+        new_qty = max(0, current_qty - qty_sold)
+        await db.goods.update_one({"barcode": barcode}, {"$set": {"stock": new_qty}})
+        updated.append({"name": product["name"], "old_qty": current_qty, "sold": qty_sold, "new_qty": new_qty})
+    return result.inserted_id, updated
+
+
+async def new_commit(order_dict):
+    result = await stock_commit.commit_order(order_dict)
+    return result.order_id, result.updated
+
+
+async def _reset(lines, stock):
+    await db.goods.delete_many({"barcode": {"$regex": f"^{PREFIX}"}})
+    await db.goods.insert_many([{"barcode": f"{PREFIX}{i:03d}", "name": f"สินค้า {i}", "stock": stock}
+                                for i in range(lines)])
+
+
+async def _cleanup():
+    await db.goods.delete_many({"barcode": {"$regex": f"^{PREFIX}"}})
+    await db.orders.delete_many({"paymentType": "bench"})
+    await db.stock_movements.delete_many({"barcode": {"$regex": f"^{PREFIX}"}})
+
+
+async def latency(name, commit, lines, orders):
+    await _reset(lines, stock=10_000)
+    await commit(_order(lines))                 # warm connection / index
+    times = []
+    for i in range(orders):
+        order = _order(lines, offset=i)
+        t0 = time.perf_counter()
+        await commit(order)
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    result = {
+        "mode": name,
+        "lines": lines,
+        "orders": orders,
+        "p50_ms": round(statistics.median(times), 2),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 2),
+        "round_trips": 1 + 2 * lines if name == "legacy" else 4,     # $in + insert + bulk_write + ledger
+    }
+    print(result)
+    return result
+
+
+async def concurrent(name, commit, count):
+    """N order พร้อมกัน ซื้อสินค้าชิ้นเดียวกันคนละ 1 ชิ้น สต๊อกที่เหลือควรลดลง N พอดี"""
+    await _reset(1, stock=count * 2)
+    order = {**_order(1), "items": [{"id": f"{PREFIX}000", "name": "สินค้า 0", "qty": 1, "price": 10.0, "total": 10.0}]}
+    await asyncio.gather(*(commit(dict(order)) for _ in range(count)))
+    left = (await db.goods.find_one({"barcode": f"{PREFIX}000"}))["stock"]
+    result = {"mode": name, "orders": count, "expected_stock": count, "actual_stock": left,
+              "lost_updates": left - count}
+    print(result)
+    return result
+
+
+async def run(args):
+    await db_indexes.ensure()       # ✅ unique index ของ goods.barcode -> หักสต๊อกด้วย bulk_write ครั้งเดียว
+    try:
+        if args.concurrent:
+            await concurrent("legacy", legacy_commit, args.concurrent)
+            await concurrent("stock_commit", new_commit, args.concurrent)
+        legacy = await latency("legacy", legacy_commit, args.lines, args.orders)
+        new = await latency("stock_commit", new_commit, args.lines, args.orders)
+        print({"transactions": await stock_commit.supports_transactions(),
+               "speedup_p50": round(legacy["p50_ms"] / max(new["p50_ms"], 0.001), 1)})
+    finally:
+        await _cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--orders", type=int, default=50)
+    parser.add_argument("--concurrent", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+📊 โลโก้ในหน่วยความจำเครื่องพิมพ์ (utils/stored_graphics) vs ส่งโลโก้ไปกับทุกใบเสร็จ
+
+รันจากโฟลเดอร์ Backend:
+    python -m bench.stored_logo --receipts 20
+
+เปิดเครื่องพิมพ์ปลอม (TCP) นับ byte ที่ได้รับ แล้วตรวจว่า
+- ใบเสร็จแรกอัปโหลดโลโก้ (GS ( L fn=67) ครั้งเดียว ใบถัดไปไม่อัปโหลดซ้ำ
+- แต่ละใบส่ง byte น้อยลงอย่างน้อยเท่าขนาดภาพโลโก้
+- เปลี่ยนโลโก้ (version ใหม่) แล้วอัปโหลดใหม่อัตโนมัติ
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+
+from bench.render_layout import _order
+from utils import printer_health, printer_transport, stored_graphics
+from utils.print_document import BACKEND_RASTER
+from utils.receipt_render import encode_receipt, stored_graphic
+
+HOST = "127.0.0.1"
+POINTS = {"before": 10, "redeem": 0, "earned": 16, "after": 26}
+
+
+class FakePrinter:
+    def __init__(self):
+        self.received = bytearray()
+
+    async def handle(self, reader, writer):
+        while data := await reader.read(65536):
+            self.received += data
+        writer.close()
+
+    def take(self):
+        data, self.received = bytes(self.received), bytearray()
+        return data
+
+
+async def _settle(printer, expected):
+    for _ in range(200):
+        if len(printer.received) >= expected:
+            return printer.take()
+        await asyncio.sleep(0.005)
+    raise AssertionError(f"เครื่องพิมพ์ปลอมได้ {len(printer.received)} byte จาก {expected}")
+
+
+async def _print(printer, port, order, names):
+    conn = printer_transport.get_connection(HOST, port)
+    sent_before = conn.bytes_sent
+    stored = await stored_graphics.ensure(HOST, port, names=names)
+    upload = conn.bytes_sent - sent_before
+    data = encode_receipt(order, POINTS, "01/01/2026 10:00:00", BACKEND_RASTER, stored=stored)
+    await printer_health.submit(HOST, data, ref="bench", port=port)
+    received = await _settle(printer, upload + len(data))
+    return stored, upload, len(received) - upload
+
+
+async def run(receipts):
+    stored_graphics.STATE_PATH = os.path.join(tempfile.mkdtemp(), "stored_graphics.json")
+    stored_graphics._state = None
+    printer = FakePrinter()
+    server = await asyncio.start_server(printer.handle, HOST, 0)
+    port = server.sockets[0].getsockname()[1]
+    order = _order(15)
+
+    try:
+        inline = [await _print(printer, port, order, names=[]) for _ in range(receipts)]
+        stored = [await _print(printer, port, order, names=["logo", "emoji"]) for _ in range(receipts)]
+
+        logo = stored_graphic("logo")
+        uploads = [u for _, u, _ in stored if u]
+        assert len(uploads) == 1 and stored[0][1] > 0, f"ต้องอัปโหลดครั้งเดียว ได้ {uploads}"
+        assert all(s == {"logo", "emoji"} for s, _, _ in stored)
+        saved = inline[0][2] - stored[-1][2]
+        assert saved >= (logo.width // 8) * logo.height, f"ประหยัดได้แค่ {saved} byte"
+
+        # ✅ โลโก้เปลี่ยน -> version ไม่ตรง -> อัปโหลดใหม่
+        stored_graphics._state[HOST]["logo"] = "old-version"
+        _, reupload, _ = await _print(printer, port, order, names=["logo", "emoji"])
+        assert reupload > 0, "เปลี่ยนโลโก้แล้วต้องอัปโหลดใหม่"
+
+        print({"receipts": receipts, "logo_px": (logo.width, logo.height)})
+        print({"mode": "inline", "bytes_per_receipt": inline[-1][2]})
+        print({"mode": "stored", "bytes_per_receipt": stored[-1][2], "one_time_upload": stored[0][1]})
+        print({"saved_per_receipt": saved, "saved_pct": round(saved / inline[-1][2] * 100, 1),
+               "break_even_receipts": round(stored[0][1] / saved, 2)})
+    finally:
+        await printer_transport.close_all()
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.receipts))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,48 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routes.member_routes import router as MemberRouter
 from routes.goods_routes import router as GoodsRouter
 from routes.order_routes import router as OrderRouter
+from routes.print_routes import router as PrintRouter
+from routes.system_routes import router as SystemRouter
+from routes.export_routes import router as ExportRouter
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils import db_indexes, print_spooler, render_pool, printer_transport, printer_health, printer_registry, receipt_archive, stock_ledger, goods_cache, goods_images, goods_search
 
-app = FastAPI(title="Tookjai Backend", version="1.0.0", redirect_slashes=False)
+
+# ✅ เริ่ม/หยุด worker pool วาดภาพ, worker คิวงานพิมพ์ และ connection เครื่องพิมพ์พร้อมแอป
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    render_pool.start()
+    printer_registry.load()
+    await printer_health.start()
+    try:
+        await db_indexes.ensure()
+    except Exception as e:
+        print(f"⚠️ ตรวจ index ไม่สำเร็จ: {e}")
+    await print_spooler.start()
+    receipt_archive.start()
+    stock_ledger.start()
+    goods_cache.start()
+    goods_search.start()
+    try:
+        await goods_images.resume()
+    except Exception as e:
+        print(f"⚠️ ทำ thumbnail ที่ค้างไม่สำเร็จ: {e}")
+    yield
+    await goods_images.stop()
+    await goods_search.stop()
+    await goods_cache.stop()
+    await stock_ledger.stop()
+    await receipt_archive.stop()
+    await print_spooler.stop()
+    await printer_health.stop()
+    await printer_transport.close_all()
+    render_pool.stop()
+
+
+app = FastAPI(title="Tookjai Backend", version="1.0.0", redirect_slashes=False, lifespan=lifespan)
 
 # ✅ ตั้งค่า CORS ให้เชื่อมกับ React ได้
 origins = [
@@ -20,12 +58,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],     # ✅ หน้าเว็บอ่าน token หน้าถัดไปได้
 )
 
 # ✅ รวม router ทั้งหมด
 app.include_router(MemberRouter)
 app.include_router(GoodsRouter)
 app.include_router(OrderRouter)
+app.include_router(PrintRouter)
+app.include_router(SystemRouter)
+app.include_router(ExportRouter)
 
 @app.get("/")
 def root():
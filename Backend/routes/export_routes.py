@@ -0,0 +1,219 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from database import db
+from datetime import date, datetime, timedelta
+from typing import Optional
+import csv, io, json, os, re
+
+router = APIRouter(prefix="/api/export", tags=["Export"])
+
+# ===============================
+# 📤 Export ข้อมูลทั้งหมดแบบ stream (NDJSON / CSV)
+# ===============================
+# หน้ารายการปกติตัดที่ 1000 / 200 รายการ ตรงนี้ไม่ตัด: อ่าน motor cursor ทีละ EXPORT_BATCH_SIZE เอกสาร
+# แปลงเป็นบรรทัดแล้วส่งออกทีละก้อน (~EXPORT_CHUNK_KB) ไม่เก็บผลทั้งหมดไว้ใน memory
+# -> memory คงที่ไม่ว่าข้อมูลจะมีกี่แถว (ดู bench/export_stream)
+# ?format=ndjson (ค่าเริ่มต้น, 1 เอกสาร JSON ต่อบรรทัด) / csv (มี BOM ให้ Excel อ่านภาษาไทยถูก)
+# ช่วงวันที่ startDate / endDate: "2025-01-31" (endDate รวมทั้งวัน) หรือเวลาเต็มแบบ ISO
+
+BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_KB", "64")) * 1024
+
+FORMAT_PATTERN = "^(ndjson|csv)$"
+
+
+def _date_range(start, end) -> dict:
+    """ฟิลด์วันที่เก็บเป็น ISO string -> เทียบแบบ string ได้ endDate ที่เป็นวันล้วนนับถึงสิ้นวัน"""
+    cond = {}
+    if start:
+        cond["$gte"] = start
+    if end:
+        if len(end) == 10:
+            try:
+                cond["$lt"] = (date.fromisoformat(end) + timedelta(days=1)).isoformat()
+            except ValueError:
+                raise HTTPException(status_code=400, detail="endDate ไม่ถูกต้อง (YYYY-MM-DD)")
+        else:
+            cond["$lte"] = end
+    return cond
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)        # ObjectId และอื่น ๆ
+
+
+async def _stream(cursor, fmt: str, columns: list, row):
+    """
+    แปลงเอกสารจาก cursor เป็นบรรทัด NDJSON / CSV แล้วส่งทีละก้อน
+    row(doc) -> dict ของแถว (CSV ใช้เฉพาะ columns / NDJSON ส่งทั้ง dict)
+    """
+    buffer = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        buffer.write("\ufeff")
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+    try:
+        async for doc in cursor:
+            data = row(doc)
+            if writer is not None:
+                writer.writerow(data)
+            else:
+                buffer.write(json.dumps(data, ensure_ascii=False, default=_json_default))
+                buffer.write("\n")
+            if buffer.tell() >= CHUNK_BYTES:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+    finally:
+        await cursor.close()     # ✅ client ยกเลิกกลางทาง -> ปิด cursor บน server ด้วย
+
+
+def _response(name: str, fmt: str, body):
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    media = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(body, media_type=media, headers={
+        "Content-Disposition": f'attachment; filename="{name}-{stamp}.{fmt}"',
+        "Cache-Control": "no-store",
+    })
+
+
+def _member(doc):
+    member = doc.get("member") or {}
+    return member.get("phone"), member.get("name")
+
+
+# ===============================
+# 📦 สินค้า
+# ===============================
+GOODS_COLUMNS = ["barcode", "name", "type", "cost", "price", "stock", "supplier", "dateReceived"]
+
+
+@router.get("/goods")
+async def export_goods(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    type: Optional[str] = None,
+    supplier: Optional[str] = None,
+    startDate: Optional[str] = None,
+    endDate: Optional[str] = None,
+):
+    """สินค้าทั้งหมด (ไม่รวมรูป) เรียงตาม _id ฟิลเตอร์ type / supplier / ช่วง dateReceived"""
+    query = {}
+    if type:
+        query["type"] = type
+    if supplier:
+        # ✅ ค้นแบบข้อความธรรมดา: regex เสีย (เช่น "(") จะล้มตอน stream ไปแล้ว client ได้ 200 ที่ขาดกลางทาง
+        query["supplier"] = {"$regex": re.escape(supplier), "$options": "i"}
+    if startDate or endDate:
+        query["dateReceived"] = _date_range(startDate, endDate)
+
+    projection = {"_id": 0, **{c: 1 for c in GOODS_COLUMNS}}
+    cursor = db.goods.find(query, projection, batch_size=BATCH_SIZE).sort("_id", 1)
+    return _response("goods", format, _stream(cursor, format, GOODS_COLUMNS, lambda doc: doc))
+
+
+# ===============================
+# 🧾 รายการขาย
+# ===============================
+ORDER_COLUMNS = ["_id", "date", "paymentType", "total", "cash", "change", "memberPhone", "memberName", "itemCount"]
+
+
+def _orders_query(startDate, endDate, paymentType, phone):
+    query = {}
+    if startDate or endDate:
+        query["date"] = _date_range(startDate, endDate)
+    if paymentType:
+        query["paymentType"] = paymentType
+    if phone:
+        query["member.phone"] = phone
+    return query
+
+
+def _order_row(fmt):
+    def row(doc):
+        phone, name = _member(doc)
+        data = {
+            "_id": str(doc["_id"]), "date": doc.get("date"), "paymentType": doc.get("paymentType"),
+            "total": doc.get("total"), "cash": doc.get("cash"), "change": doc.get("change"),
+            "memberPhone": phone, "memberName": name, "itemCount": len(doc.get("items") or []),
+        }
+        if fmt == "ndjson":
+            data["items"] = doc.get("items") or []      # ✅ NDJSON ได้รายการสินค้าในบิลไปด้วย
+        return data
+    return row
+
+
+@router.get("/orders")
+async def export_orders(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    startDate: Optional[str] = None,
+    endDate: Optional[str] = None,
+    paymentType: Optional[str] = None,
+    phone: Optional[str] = None,
+):
+    """รายการขายเรียงตามวันที่ (เก่า -> ใหม่)"""
+    query = _orders_query(startDate, endDate, paymentType, phone)
+    # ✅ เรียงด้วย date อย่างเดียว -> เดิน index ที่ลงท้ายด้วย date ได้ ไม่ต้องเรียงใน memory ของ Mongo (เกิน 100MB ที่ 1M บิล)
+    #    ไม่มีฟิลเตอร์: orders.date / phone: (member.phone, date) / paymentType: (paymentType, date) ดู utils/db_indexes
+    cursor = db.orders.find(query, batch_size=BATCH_SIZE).sort("date", 1)
+    return _response("orders", format, _stream(cursor, format, ORDER_COLUMNS, _order_row(format)))
+
+
+# ✅ รายการสินค้าในบิล (1 แถวต่อสินค้า 1 บรรทัดในบิล) แตกบน server ด้วย $unwind
+ORDER_ITEM_COLUMNS = ["orderId", "date", "paymentType", "memberPhone", "barcode", "name", "qty", "price", "total"]
+
+
+@router.get("/order-items")
+async def export_order_items(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    startDate: Optional[str] = None,
+    endDate: Optional[str] = None,
+    paymentType: Optional[str] = None,
+    phone: Optional[str] = None,
+    barcode: Optional[str] = None,
+):
+    query = _orders_query(startDate, endDate, paymentType, phone)
+    if barcode:
+        query["items.id"] = barcode
+    pipeline = [
+        {"$match": query},
+        {"$sort": {"date": 1}},         # ✅ index เดียวกับ /orders (ก่อน $unwind)
+        {"$unwind": "$items"},
+    ]
+    if barcode:
+        pipeline.append({"$match": {"items.id": barcode}})
+    pipeline.append({"$project": {
+        "_id": 0,
+        "orderId": {"$toString": "$_id"},
+        "date": 1,
+        "paymentType": 1,
+        "memberPhone": "$member.phone",
+        "barcode": "$items.id",
+        "name": "$items.name",
+        "qty": "$items.qty",
+        "price": "$items.price",
+        "total": "$items.total",
+    }})
+    cursor = db.orders.aggregate(pipeline, batchSize=BATCH_SIZE)
+    return _response("order-items", format, _stream(cursor, format, ORDER_ITEM_COLUMNS, lambda doc: doc))
+
+
+# ===============================
+# 👥 สมาชิก
+# ===============================
+MEMBER_COLUMNS = ["name", "phone", "points"]
+
+
+@router.get("/members")
+async def export_members(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    minPoints: Optional[int] = None,
+):
+    query = {"points": {"$gte": minPoints}} if minPoints is not None else {}
+    projection = {"_id": 0, **{c: 1 for c in MEMBER_COLUMNS}}
+    cursor = db.members.find(query, projection, batch_size=BATCH_SIZE).sort("_id", 1)
+    return _response("members", format, _stream(cursor, format, MEMBER_COLUMNS, lambda doc: doc))
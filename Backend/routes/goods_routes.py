@@ -1,115 +1,119 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import Response, StreamingResponse
 from database import db, serialize_doc
 from models.goods_model import Goods
-from escpos.printer import Network
-from PIL import Image, ImageDraw, ImageFont
-from io import BytesIO
-import qrcode, os
+from utils import print_spooler, printer_registry, label_cache, stock_ledger, goods_cache, pagination, goods_images, goods_search, db_indexes
+from utils.escpos_raster import build_job
+from utils.printer_transport import PartialWriteError
+from utils.receipt_render import RECEIPT_W
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 from typing import Optional, List
+import asyncio, json, os
 
 router = APIRouter(prefix="/api/goods", tags=["Goods"])
 
 
+# ✅ ฟิลด์ที่ต้องใช้พิมพ์ Label (ไม่ดึง imageBase64)
+LABEL_FIELDS = {"_id": 0, "barcode": 1, "name": 1, "type": 1, "price": 1}
+MAX_LABEL_COPIES = 50
+MAX_RESTOCK_LINES = 500
+
+# ✅ หน้ารายการสินค้า: ค่าเริ่มต้นไม่ส่งรูป (รูปเดียวใหญ่กว่าข้อมูลอื่นทั้งแถวหลายเท่า)
+GOODS_PAGE_SIZE = int(os.getenv("GOODS_PAGE_SIZE", "1000"))
+MAX_PAGE_SIZE = 1000
+GOODS_FIELDS = {"barcode", "name", "type", "cost", "price", "stock", "supplier", "dateReceived",
+                "image", "imageBase64", "profitPercent", "manualPrice", "quantity"}
+GOODS_HIDDEN = ("search",)      # ✅ ฟิลด์ภายใน (n-gram ของ utils/goods_search) ไม่ส่งออกแม้ขอ fields=all
+GOODS_LEAN = {"imageBase64": 0, **{f: 0 for f in GOODS_HIDDEN}}
+
+# ✅ ค้นหาสินค้า (utils/goods_search)
+SEARCH_LIMIT = int(os.getenv("GOODS_SEARCH_LIMIT", "20"))
+MAX_SEARCH_LIMIT = 100
+
+
 # ===============================
 # 🧩 ฟังก์ชันช่วย
 # ===============================
 
-def _load_font(paths, size):
-    for p in paths:
-        if os.path.exists(p):
-            return ImageFont.truetype(p, size)
-    raise RuntimeError("❌ ไม่พบฟอนต์ภาษาไทยในพาธที่กำหนด")
+async def _resolve_type_names(type_values) -> dict:
+    """
+    แปลงค่า type ของสินค้าเป็นชื่อประเภท ด้วย query เดียว
+    type อาจเป็นชื่อประเภท (จากหน้าเพิ่มสินค้า), ObjectId ของ goods_types หรือ dict ที่มี name
+    """
+    names, oids, resolved = set(), set(), {}
+    for value in type_values:
+        if not value:
+            continue
+        if isinstance(value, dict):
+            resolved[str(value.get("_id", value.get("name")))] = value.get("name", "")
+        elif isinstance(value, ObjectId) or ObjectId.is_valid(str(value)):
+            oids.add(ObjectId(str(value)))
+        else:
+            names.add(str(value))
+
+    if names or oids:
+        cursor = db.goods_types.find(
+            {"$or": [{"_id": {"$in": list(oids)}}, {"name": {"$in": list(names)}}]}
+        )
+        for t in await cursor.to_list(length=None):
+            resolved[str(t["_id"])] = t.get("name", "")
+            resolved[t.get("name", "")] = t.get("name", "")
+    return resolved
+
+
+def _type_key(value):
+    if isinstance(value, dict):
+        return str(value.get("_id", value.get("name")))
+    return str(value) if value else ""
+
+
+def _label_width():
+    """ความกว้างหัวพิมพ์ของเครื่อง Label ที่จะได้งาน (ใช้วาดตัวอย่าง / วาดล่วงหน้า)"""
+    try:
+        return printer_registry.primary(printer_registry.ROLE_LABEL).width
+    except LookupError:
+        return RECEIPT_W
 
 
 # ===============================
 # 🖨️ พิมพ์ QR Label สำหรับ 1 ชิ้นสินค้า
 # ===============================
 async def print_goods_label(item: dict):
-    PRINTER_IP = "192.168.1.250"
-    RECEIPT_W = 576
-    MARGIN = 20
-
-    font_candidates = [
-        "./utils/THSarabunNew Bold.ttf",
-        "/System/Library/Fonts/Supplemental/TH Sarabun New Bold.ttf",
-        "C:/Windows/Fonts/THSarabunNew.ttf",
-        "/usr/share/fonts/truetype/thai/THSarabunNew.ttf",
-    ]
-
     try:
-        font_name = _load_font(font_candidates, 48)
-        font_info = _load_font(font_candidates, 36)
-        font_price = _load_font(font_candidates, 56)
+        # ✅ ดึงประเภทสินค้า
+        type_names = await _resolve_type_names([item.get("type")])
+        type_name = type_names.get(_type_key(item.get("type")), "")
 
-        img = Image.new("RGB", (RECEIPT_W, 750), "white")
-        draw = ImageDraw.Draw(img)
+        # ✅ วาดตามความกว้างของเครื่องที่ได้งาน (สลับเครื่องแล้วกว้างไม่เท่ากันก็ไม่ล้นกระดาษ)
+        async def build(printer):
+            return build_job([await label_cache.get_label(item, type_name, printer.width)])
 
-        # ✅ ดึงประเภทสินค้า
-        type_name = ""
-        if item.get("type"):
-            type_data = await db.goods_types.find_one({"_id": item["type"]}) if isinstance(item["type"], dict) == False else item["type"]
-            if type_data:
-                type_name = type_data.get("name", "")
-
-        # ✅ สร้าง QR
-        qr = qrcode.QRCode(box_size=8, border=2)
-        qr.add_data(item.get("barcode", "UNKNOWN"))
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
-
-        qr_w, qr_h = qr_img.size
-        scale = min((RECEIPT_W - MARGIN * 2) / qr_w, 1.2)
-        qr_img = qr_img.resize((int(qr_w * scale), int(qr_h * scale)), Image.LANCZOS)
-        qr_x = (RECEIPT_W - qr_img.width) // 2
-        qr_y = 20
-        img.paste(qr_img, (qr_x, qr_y))
-
-        CURSOR_Y = qr_y + qr_img.height + 25
-
-        # ✅ ชื่อสินค้า
-        name_text = f"{type_name} {item.get('name', '')}".strip()
-        w = draw.textlength(name_text, font=font_name)
-        draw.text(((RECEIPT_W - w) / 2, CURSOR_Y), name_text, font=font_name, fill="black")
-        CURSOR_Y += 55
-
-        # ✅ รหัสสินค้า
-        barcode_text = f"รหัส: {item.get('barcode', '-')}"
-        w = draw.textlength(barcode_text, font=font_info)
-        draw.text(((RECEIPT_W - w) / 2, CURSOR_Y), barcode_text, font=font_info, fill="black")
-        CURSOR_Y += 45
-
-        # ✅ ราคา
-        price_text = f"฿{item.get('price', 0):,.0f}"
-        w = draw.textlength(price_text, font=font_price)
-        draw.text(((RECEIPT_W - w) / 2, CURSOR_Y), price_text, font=font_price, fill="black")
-        CURSOR_Y += 65
-
-        # ✅ Crop
-        total_height = CURSOR_Y + 20
-        img = img.crop((0, 0, RECEIPT_W, total_height))
-        bw = img.convert("L").point(lambda x: 0 if x < 170 else 255, mode="1")
-
-        buf = BytesIO()
-        bw.save(buf, format="PNG")
-        buf.seek(0)
-
-        p = Network(PRINTER_IP, port=9100, timeout=10)
-        p.image(buf)
-        try:
-            p.cut()
-        except Exception:
-            p.text("\n\n\n")
-        p.close()
+        result = await printer_registry.dispatch(printer_registry.ROLE_LABEL, build, ref=item.get("barcode"))
 
-        print(f"🖨️ พิมพ์ Label สินค้า {item.get('name')} สำเร็จ")
-        return {"message": f"พิมพ์ Label สินค้า {item.get('name')} แล้ว"}
+        print(f"🖨️ พิมพ์ Label สินค้า {item.get('name')} ที่ {result['printer']} ({result['status']})")
+        return {"message": f"พิมพ์ Label สินค้า {item.get('name')} แล้ว", **result}
 
+    except PartialWriteError as e:
+        # ✅ ส่งต่อให้คิวงานพิมพ์รู้ว่าพิมพ์ไปแล้วบางส่วน (ห้ามลองใหม่เอง)
+        print(f"❌ Print label error: {e}")
+        raise
     except Exception as e:
         print(f"❌ Print label error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+print_spooler.register_handler("label", print_goods_label, priority=print_spooler.PRIORITY_LABEL)
+
+
+# ✅ ส่ง Label เข้าคิวพิมพ์ (เก็บเฉพาะฟิลด์ที่ใช้พิมพ์ ไม่เก็บรูปสินค้า)
+async def enqueue_label(item: dict) -> str:
+    payload = {k: item.get(k) for k in ("barcode", "name", "type", "price")}
+    return await print_spooler.enqueue("label", payload, ref=item.get("barcode"))
+
+
 # ===============================
 # 📦 ดึง / เพิ่มสินค้า
 # ===============================
@@ -123,30 +127,62 @@ async def add_goods(item: Goods):
     data["cost"] = float(data.get("cost", 0) or 0)
     data["price"] = float(data.get("price", 0) or 0)
 
-    existing = await db.goods.find_one({"barcode": item.barcode})
-    if existing:
+    # ✅ รูปแบบ base64 (หน้าเว็บเดิม) ย้ายไปเก็บใน GridFS หลัง insert (สินค้าไม่มี barcode เก็บในเอกสารเหมือนเดิม)
+    image = None
+    if item.barcode and data.get("imageBase64"):
+        try:
+            image = goods_images.decode_base64(data.pop("imageBase64"))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    data["search"] = goods_search.document(data)     # ✅ gram สำหรับ /api/goods/search
+
+    # ✅ barcode ซ้ำ -> unique index (db_indexes) ตอบ DuplicateKeyError ไม่ต้องค้นก่อน
+    #    index ยังไม่พร้อม (สร้างไม่ได้ / DB_AUTO_INDEX=0) -> ค้นก่อนแบบเดิม
+    if item.barcode and not db_indexes.unique_ready("goods", "barcode") \
+            and await db.goods.find_one({"barcode": item.barcode}, {"_id": 1}):
+        raise HTTPException(status_code=400, detail="รหัสบาร์โค้ดนี้มีอยู่แล้ว")
+    try:
+        result = await db.goods.insert_one(data)
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="รหัสบาร์โค้ดนี้มีอยู่แล้ว")
-
-    result = await db.goods.insert_one(data)
     data["_id"] = str(result.inserted_id)
-
-    # ✅ พิมพ์ QR Code (ถ้ามีเครื่องพิมพ์)
+    data.pop("search", None)
+    if image is not None:
+        data["image"] = await goods_images.save(item.barcode, *image)
+        goods_images.with_url(data)
+    await label_cache.invalidate(item.barcode)
+    goods_cache.invalidate(item.barcode)     # ✅ เคยสแกนแล้วไม่พบ (negative cache)
+    if item.barcode:
+        await stock_ledger.record([stock_ledger.movement(item.barcode, data.get("stock", 0), stock_ledger.KIND_OPEN)])
+
+    # ✅ ส่ง QR Label เข้าคิวพิมพ์ (ไม่รอเครื่องพิมพ์)
+    job_id = None
     try:
-        await print_goods_label(data)
+        job_id = await enqueue_label(data)
     except Exception as e:
         print(f"⚠️ QR print failed: {e}")
 
-    return {"message": "✅ เพิ่มสินค้าเรียบร้อย", "data": data}
+    return {"message": "✅ เพิ่มสินค้าเรียบร้อย", "data": data, "print_job": job_id}
 
 @router.get("")
 async def get_all_goods(
+    response: Response,
     name: Optional[str] = None,
     type: Optional[str] = None,
     supplier: Optional[str] = None,
     startDate: Optional[str] = None,
     endDate: Optional[str] = None,
+    sort: str = Query("_id", pattern="^(_id|name|stock|dateReceived)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(GOODS_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
 ):
-    """ดึงรายการสินค้าทั้งหมด (รองรับฟิลเตอร์)"""
+    """
+    ดึงรายการสินค้า (รองรับฟิลเตอร์) ทีละหน้า เรียงที่ server ด้วย sort / order
+    หน้าถัดไป: ส่ง ?cursor=<ค่าใน header X-Next-Cursor> (ไม่มี header = หน้าสุดท้าย)
+    fields: ค่าเริ่มต้นไม่รวมรูป (imageBase64) / "all" ทุกฟิลด์ / "barcode,name,stock" เฉพาะที่ขอ
+    """
     query = {}
     if name:
         query["name"] = {"$regex": name, "$options": "i"}
@@ -161,9 +197,46 @@ async def get_all_goods(
         if endDate:
             query["dateReceived"]["$lte"] = endDate
 
-    cursor = db.goods.find(query)
-    items = await cursor.to_list(length=1000)
-    return [serialize_doc(x) for x in items]
+    direction = 1 if order == "asc" else -1
+    try:
+        fields_projection = pagination.projection(
+            fields, GOODS_FIELDS, GOODS_LEAN, always=(sort,), hidden=GOODS_HIDDEN
+        )
+        if cursor:
+            query = pagination.query_with_cursor(
+                query, pagination.after(sort, direction, *pagination.decode_cursor(cursor, sort, direction))
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    found = db.goods.find(query, fields_projection).sort(pagination.sort_spec(sort, direction)).limit(limit + 1)
+    items = await found.to_list(length=limit + 1)     # ✅ อ่านเกิน 1 ตัวไว้รู้ว่ามีหน้าถัดไป
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        response.headers[pagination.NEXT_CURSOR_HEADER] = pagination.encode_cursor(
+            sort, direction, last.get(sort), last["_id"]
+        )
+    return [goods_images.with_url(serialize_doc(x)) for x in items]
+
+
+# ===============================
+# 🔎 ค้นหาสินค้า (ชื่อ / ผู้จำหน่าย / ประเภท / barcode)
+# ===============================
+@router.get("/search")
+async def search_goods(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+):
+    """
+    ค้นแบบพิมพ์ไม่ครบ / พิมพ์ผิดบางตัว / ไม่ใส่วรรณยุกต์ก็เจอ เรียงตามความตรง (score มาก -> น้อย)
+    highlight: {"name": [[เริ่ม, จบ), ...], ...} ตำแหน่งตัวอักษรในข้อความเดิมที่ตรงกับคำค้น
+    """
+    results = await goods_search.search(q, limit, projection=GOODS_LEAN)
+    return [
+        {**goods_images.with_url(serialize_doc(doc)), "score": score, "highlight": highlight}
+        for doc, score, highlight in results
+    ]
 
 # ===============================
 # 🖨️ พิมพ์ Label ซ้ำ (1 ชิ้น)
@@ -171,38 +244,172 @@ async def get_all_goods(
 
 @router.post("/print-label/{barcode}")
 async def print_label_by_barcode(barcode: str):
-    item = await db.goods.find_one({"barcode": barcode})
+    item = await goods_cache.get(barcode)
+    if not item:
+        raise HTTPException(status_code=404, detail="ไม่พบสินค้าในระบบ")
+    job_id = await enqueue_label(item)
+    return {"message": f"✅ ส่งพิมพ์ Label สินค้า {item.get('name')} แล้ว", "print_job": job_id}
+
+
+@router.get("/label-preview/{barcode}")
+async def preview_label(barcode: str, request: Request):
+    """ภาพ Label (PNG) แบบเดียวกับที่พิมพ์ ให้แอปแสดงตัวอย่างโดยไม่ต้องพิมพ์"""
+    item = await db.goods.find_one({"barcode": barcode}, LABEL_FIELDS)
     if not item:
         raise HTTPException(status_code=404, detail="ไม่พบสินค้าในระบบ")
-    await print_goods_label(item)
-    return {"message": f"✅ พิมพ์ Label สินค้า {item.get('name')} สำเร็จ"}
+    type_names = await _resolve_type_names([item.get("type")])
+    type_name = type_names.get(_type_key(item.get("type")), "")
+
+    width = _label_width()
+    etag = f'"{label_cache.label_key(item, type_name, width)}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    png, _ = await label_cache.get_label_png(item, type_name, width)
+    return Response(content=png, media_type="image/png", headers=headers)
 
 
 # ===============================
 # 🖨️ พิมพ์ Label หลายรายการ (Batch)
 # ===============================
 
+def _label_copies(value) -> int:
+    """จำนวนใบจาก client (ตัวเลข / สตริงตัวเลข) แปลงไม่ได้ -> 400 แทน 500"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"จำนวน Label ไม่ถูกต้อง: {value!r}")
+
+
+def _parse_label_request(data: dict):
+    """
+    รับได้ทั้ง {"barcodes": ["123", "456"], "copies": 1}
+    และ {"barcodes": [{"barcode": "123", "copies": 3}, "456"]}
+    คืน [(barcode, copies)] ตามลำดับที่ขอ (barcode ซ้ำจะรวมจำนวนให้)
+    รูปแบบ / จำนวนไม่ถูกต้อง -> 400
+    """
+    default_copies = _label_copies(data.get("copies", 1) or 1)
+    barcodes = data.get("barcodes", []) or []
+    if not isinstance(barcodes, list):
+        raise HTTPException(status_code=400, detail="barcodes ต้องเป็นรายการ")
+    wanted = {}
+    for entry in barcodes:
+        if isinstance(entry, dict):
+            code, copies = entry.get("barcode"), _label_copies(entry.get("copies", default_copies) or 0)
+        else:
+            code, copies = entry, default_copies
+        if not code or copies <= 0:
+            continue
+        code = str(code)
+        wanted[code] = min(MAX_LABEL_COPIES, wanted.get(code, 0) + copies)
+    return list(wanted.items())
+
+
+async def print_label_batch(payload: dict, progress=None):
+    """
+    พิมพ์ Label ทั้งชุดเป็นงานพิมพ์เดียว
+    1) ดึงสินค้าทั้งหมดด้วย $in ครั้งเดียว  2) แปลงประเภทครั้งเดียว
+    3) ดึงจาก label_cache / วาดขนานกัน   4) ส่งทุกใบต่อกัน (ตัดกระดาษคั่น) ในงานเดียว
+    progress(dict) ถูกเรียกทุกขั้นตอน (ใช้ stream ความคืบหน้าให้หน้าเว็บ)
+    """
+    async def report(event):
+        if progress is not None:
+            await progress(event)
+
+    requested = [(e["barcode"], e["copies"]) for e in payload["items"]]
+    codes = [code for code, _ in requested]
+
+    cursor = db.goods.find({"barcode": {"$in": codes}}, LABEL_FIELDS)
+    goods = {g["barcode"]: g for g in await cursor.to_list(length=None)}
+    missing = [code for code in codes if code not in goods]
+    found = [(code, copies) for code, copies in requested if code in goods]
+    type_names = await _resolve_type_names([g.get("type") for g in goods.values()])
+    await report({"stage": "loaded", "found": len(found), "missing": missing})
+
+    def label(code, width):
+        item = goods[code]
+        return label_cache.get_label(item, type_names.get(_type_key(item.get("type")), ""), width)
+
+    # ✅ วาดล่วงหน้าที่ความกว้างของเครื่องหลัก เครื่องที่กว้างไม่เท่ากันดึง/วาดของตัวเองตอน build
+    width = _label_width()
+
+    async def render(code):
+        return code, await label(code, width)
+
+    rasters = {}
+    for done, task in enumerate(asyncio.as_completed([render(code) for code, _ in found]), 1):
+        code, raster = await task
+        rasters[code] = raster
+        await report({"stage": "rendered", "barcode": code, "done": done, "total": len(found)})
+
+    labels = [code for code, copies in found for _ in range(copies)]
+
+    # ✅ มีเครื่องพิมพ์ Label หลายเครื่อง -> แบ่งกันพิมพ์พร้อมกัน (แต่ละเครื่องได้งานเดียว)
+    async def build(printer, chunk):
+        if printer.width == width:
+            return build_job([rasters[code] for code in chunk])
+        own = {code: await label(code, printer.width) for code in dict.fromkeys(chunk)}
+        return build_job([own[code] for code in chunk])
+
+    printers = []
+    if labels:
+        printers = await printer_registry.dispatch_spread(
+            printer_registry.ROLE_LABEL, labels, build, ref=f"labels-{len(labels)}"
+        )
+    statuses = {p["status"] for p in printers}
+    status = "empty" if not printers else statuses.pop() if len(statuses) == 1 else "partial"
+    result = {
+        "message": f"✅ พิมพ์ {len(labels)} Label ({len(found)} รายการ)",
+        "printed": [code for code, _ in found],
+        "labels": len(labels),
+        "missing": missing,
+        "status": status,
+        "printers": printers,
+    }
+    await report({"stage": "sent", **result})
+    print(f"🖨️ พิมพ์ Label ชุด {len(labels)} ใบ ({status})")
+    return result
+
+
+print_spooler.register_handler("label_batch", print_label_batch, priority=print_spooler.PRIORITY_LABEL)
+
+
 @router.post("/print-labels")
-async def print_multiple_labels(data: dict):
+async def print_multiple_labels(data: dict, stream: bool = False):
     """
-    รับ JSON: { "barcodes": ["123", "456", "789"] }
-    แล้วพิมพ์ทุกชิ้น
+    รับ JSON: { "barcodes": ["123", "456", "789"] } หรือ { "barcodes": [{"barcode": "123", "copies": 2}] }
+    ปกติ: ส่งทั้งชุดเข้าคิวพิมพ์แล้วตอบกลับทันที
+    ?stream=true: พิมพ์ทันทีและส่งความคืบหน้ากลับเป็น NDJSON ทีละบรรทัด
     """
-    barcodes = data.get("barcodes", [])
-    if not barcodes:
+    requested = _parse_label_request(data)
+    if not requested:
         raise HTTPException(status_code=400, detail="ไม่พบ barcode ในคำขอ")
+    payload = {"items": [{"barcode": code, "copies": copies} for code, copies in requested]}
+
+    if not stream:
+        job_id = await print_spooler.enqueue("label_batch", payload, ref=f"{len(requested)} barcodes")
+        return {
+            "message": f"✅ ส่งพิมพ์ {len(requested)} รายการแล้ว",
+            "printed": [code for code, _ in requested],
+            "print_job": job_id,
+        }
 
-    printed = []
-    for code in barcodes:
-        item = await db.goods.find_one({"barcode": code})
-        if item:
+    async def events():
+        queue = asyncio.Queue()
+
+        async def run():
             try:
-                await print_goods_label(item)
-                printed.append(code)
+                await print_label_batch(payload, progress=queue.put)
             except Exception as e:
-                print(f"⚠️ Print fail {code}: {e}")
+                await queue.put({"stage": "error", "detail": str(e)})
+            await queue.put(None)
+
+        task = asyncio.create_task(run())
+        while (event := await queue.get()) is not None:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+        await task
 
-    return {"message": f"✅ พิมพ์ {len(printed)} รายการสำเร็จ", "printed": printed}
+    return StreamingResponse(events(), media_type="application/x-ndjson")
 
 @router.get("/types")
 async def get_goods_types():
@@ -220,13 +427,16 @@ async def add_goods_type(data: dict):
     if not name:
         raise HTTPException(status_code=400, detail="ต้องระบุชื่อประเภทสินค้า")
 
-    # 🔍 ตรวจสอบชื่อซ้ำ (ไม่ให้เพิ่มประเภทที่มีอยู่แล้ว)
-    existing = await db.goods_types.find_one({"name": {"$regex": f"^{name}$", "$options": "i"}})
-    if existing:
+    # 🔍 ชื่อซ้ำ (ไม่สนตัวพิมพ์เล็ก/ใหญ่) -> unique index แบบ collation ใน db_indexes ตอบ DuplicateKeyError
+    new_type = {"name": name}
+    if not db_indexes.unique_ready("goods_types", "name") and await db.goods_types.find_one(
+        {"name": name}, {"_id": 1}, collation=db_indexes.TYPE_NAME_COLLATION
+    ):
+        raise HTTPException(status_code=400, detail=f"ประเภท '{name}' มีอยู่แล้วในระบบ")
+    try:
+        await db.goods_types.insert_one(new_type)
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail=f"ประเภท '{name}' มีอยู่แล้วในระบบ")
-
-    result = await db.goods_types.insert_one({"name": name})
-    new_type = await db.goods_types.find_one({"_id": result.inserted_id})
 
     return {
         "message": f"✅ เพิ่มประเภทสินค้า '{name}' สำเร็จ",
@@ -235,32 +445,264 @@ async def add_goods_type(data: dict):
 @router.get("/barcode/{barcode}")
 async def get_goods_by_barcode(barcode: str):
     """
-    ดึงข้อมูลสินค้าจากรหัสบาร์โค้ด เช่น /api/goods/barcode/1234567890
+    ดึงข้อมูลสินค้าจากรหัสบาร์โค้ด เช่น /api/goods/barcode/1234567890 (ผ่าน goods_cache)
     """
-    item = await db.goods.find_one({"barcode": barcode})
+    item = await goods_cache.get(barcode)
     if not item:
         raise HTTPException(status_code=404, detail="❌ ไม่พบสินค้านี้ในระบบ")
-    return serialize_doc(item)
+    return goods_images.with_url(serialize_doc(item))
+# ===============================
+# 📥 เติมสต็อก
+# ===============================
+# $inc บน server: ไม่ต้องอ่านก่อนเขียน และไม่ทับยอดที่ create_order หักไปพร้อมกัน
+
+def _restock_update(qty: int, cost=None) -> dict:
+    update = {"$inc": {"stock": qty}}
+    if cost is not None:
+        update["$set"] = {"cost": float(cost)}
+    return update
+
+
 # ✅ เติมสต็อกโดยใช้ barcode
 @router.put("/restock/{barcode}")
 async def restock_goods(barcode: str, payload: dict):
-    """เติมสต็อกสินค้าโดยใช้ barcode"""
+    """เติมสต็อกสินค้าโดยใช้ barcode (find_one_and_update ได้ยอดใหม่กลับมาในคำสั่งเดียว)"""
     qty_to_add = int(payload.get("qty", 0))
     if qty_to_add <= 0:
         raise HTTPException(status_code=400, detail="จำนวนต้องมากกว่า 0")
 
-    product = await db.goods.find_one({"barcode": barcode})
+    product = await db.goods.find_one_and_update(
+        {"barcode": barcode},
+        _restock_update(qty_to_add, payload.get("cost")),
+        projection=GOODS_LEAN,
+        return_document=ReturnDocument.AFTER,
+    )
     if not product:
         raise HTTPException(status_code=404, detail="❌ ไม่พบสินค้าในระบบ")
+    await stock_ledger.record([stock_ledger.movement(barcode, qty_to_add, stock_ledger.KIND_RESTOCK)])
+    await label_cache.invalidate(barcode)
+    goods_cache.invalidate(barcode)
 
-    new_stock = int(product.get("stock", 0)) + qty_to_add
+    new_stock = int(product.get("stock", 0))
+    old_stock = new_stock - qty_to_add
+    return {
+        "message": f"✅ อัปเดตสต็อกจาก {old_stock} ➜ {new_stock}",
+        "data": {**serialize_doc(product), "stock": old_stock, "new_stock": new_stock}
+    }
 
-    await db.goods.update_one(
-        {"barcode": barcode},
-        {"$set": {"stock": new_stock}}
+
+# ✅ เติมสต็อกทั้งใบส่งของ: [{"barcode", "qty", "cost"?}, ...]
+@router.put("/restock")
+async def restock_batch(lines: List[dict], labels: bool = False):
+    """
+    เติมสต็อกหลายรายการด้วย bulk_write ครั้งเดียว แล้วดึงยอดใหม่ด้วย $in ครั้งเดียว
+    ตอบผลทีละบรรทัด: ok / not_found / invalid (บรรทัดที่ผิดไม่ทำให้บรรทัดอื่นล้ม)
+    ?labels=true ส่งพิมพ์ Label ตามจำนวนที่รับเข้า เป็นงานพิมพ์เดียวในคิว
+    """
+    if not lines:
+        raise HTTPException(status_code=400, detail="ไม่พบรายการในคำขอ")
+    if len(lines) > MAX_RESTOCK_LINES:
+        raise HTTPException(status_code=400, detail=f"เติมได้ครั้งละไม่เกิน {MAX_RESTOCK_LINES} รายการ")
+
+    results, ops = [], []
+    for line in lines:
+        barcode = str(line.get("barcode") or "")
+        try:
+            qty = int(line.get("qty", 0))
+            cost = line.get("cost")
+            cost = None if cost in (None, "") else float(cost)
+        except (TypeError, ValueError):
+            qty, cost = 0, None
+        if not barcode or qty <= 0:
+            results.append({"barcode": barcode, "qty": line.get("qty"), "status": "invalid",
+                            "detail": "ต้องมี barcode และจำนวนมากกว่า 0"})
+            continue
+        results.append({"barcode": barcode, "qty": qty, "status": "ok"})
+        ops.append(UpdateOne({"barcode": barcode}, _restock_update(qty, cost)))
+
+    goods = {}
+    if ops:
+        await db.goods.bulk_write(ops, ordered=False)
+        codes = list({r["barcode"] for r in results if r["status"] == "ok"})
+        cursor = db.goods.find({"barcode": {"$in": codes}}, {"barcode": 1, "name": 1, "stock": 1})
+        goods = {g["barcode"]: g async for g in cursor}
+
+    received, movements = {}, []
+    for r in results:
+        if r["status"] != "ok":
+            continue
+        product = goods.get(r["barcode"])
+        if product is None:
+            r.update(status="not_found", detail="❌ ไม่พบสินค้าในระบบ")
+            continue
+        r.update(name=product.get("name"), new_stock=int(product.get("stock", 0)))
+        received[r["barcode"]] = received.get(r["barcode"], 0) + r["qty"]
+        movements.append(stock_ledger.movement(r["barcode"], r["qty"], stock_ledger.KIND_RESTOCK))
+
+    await stock_ledger.record(movements)
+    for barcode in received:
+        await label_cache.invalidate(barcode)
+    goods_cache.invalidate(*received)
+
+    job_id = None
+    if labels and received:
+        requested = _parse_label_request({"barcodes": [{"barcode": c, "copies": q} for c, q in received.items()]})
+        payload = {"items": [{"barcode": code, "copies": copies} for code, copies in requested]}
+        try:
+            job_id = await print_spooler.enqueue("label_batch", payload, ref=f"restock {len(requested)} barcodes")
+        except Exception as e:
+            print(f"⚠️ ส่งพิมพ์ Label ไม่สำเร็จ: {e}")
+
+    failed = sum(1 for r in results if r["status"] != "ok")
+    return {
+        "message": f"✅ เติมสต็อก {len(received)} รายการ" + (f" (ไม่สำเร็จ {failed} บรรทัด)" if failed else ""),
+        "results": results,
+        "print_job": job_id,
+    }
+
+
+# ✅ ปรับยอดจากการนับจริง {"stock": ยอดที่นับได้} หรือ {"delta": +/-จำนวน} พร้อม "reason"
+@router.put("/adjust/{barcode}")
+async def adjust_stock(barcode: str, payload: dict):
+    """ปรับสต๊อกด้วยมือ บันทึกส่วนต่างลงสมุดบัญชี (ได้ยอดก่อนปรับจากคำสั่งเดียวกัน)"""
+    try:
+        if payload.get("stock") is not None:
+            counted = int(payload["stock"])
+            update, delta = {"$set": {"stock": counted}}, None
+        else:
+            delta = int(payload.get("delta", 0))
+            update = {"$inc": {"stock": delta}}
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="จำนวนไม่ถูกต้อง")
+    if delta == 0:
+        raise HTTPException(status_code=400, detail="ต้องระบุ stock หรือ delta")
+
+    before = await db.goods.find_one_and_update(
+        {"barcode": barcode}, update, projection={"_id": 0, "name": 1, "stock": 1},
+        return_document=ReturnDocument.BEFORE,
     )
+    if not before:
+        raise HTTPException(status_code=404, detail="❌ ไม่พบสินค้าในระบบ")
+    old_stock = int(before.get("stock", 0) or 0)
+    if delta is None:
+        delta = counted - old_stock
+    await stock_ledger.record([stock_ledger.movement(barcode, delta, stock_ledger.KIND_ADJUST, payload.get("reason"))])
+    await label_cache.invalidate(barcode)
+    goods_cache.invalidate(barcode)
 
     return {
-        "message": f"✅ อัปเดตสต็อกจาก {product.get('stock', 0)} ➜ {new_stock}",
-        "data": {**serialize_doc(product), "new_stock": new_stock}
-    }
\ No newline at end of file
+        "message": f"✅ ปรับสต๊อก {before.get('name', barcode)} จาก {old_stock} ➜ {old_stock + delta}",
+        "data": {"barcode": barcode, "old_stock": old_stock, "delta": delta, "new_stock": old_stock + delta},
+    }
+
+
+# ===============================
+# 📒 ประวัติการเคลื่อนไหวสต๊อก
+# ===============================
+
+@router.get("/movements/{barcode}")
+async def get_stock_movements(barcode: str, limit: int = Query(50, ge=1, le=500), before: Optional[str] = None):
+    """รายการเคลื่อนไหวของสินค้า ใหม่ -> เก่า หน้าถัดไปส่ง ?before=<next>"""
+    try:
+        result = await stock_ledger.history(barcode, limit, before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result["ledger"] = await stock_ledger.stock_at(barcode)
+    return result
+
+
+@router.get("/stock/{barcode}")
+async def get_stock_at(barcode: str, at: Optional[datetime] = None):
+    """ยอดตามสมุดบัญชี ณ เวลา ?at=2025-01-31T20:00:00 (ไม่ระบุ = ตอนนี้) เทียบกับ goods.stock"""
+    if at is not None and at.tzinfo is None:
+        at = at.astimezone()       # ✅ เวลาไม่มีโซน = เวลาเครื่อง
+    result = await stock_ledger.stock_at(barcode, at)
+    product = await db.goods.find_one({"barcode": barcode}, {"_id": 0, "stock": 1})
+    if product is None and result["stock"] is None:
+        raise HTTPException(status_code=404, detail="❌ ไม่พบสินค้าในระบบ")
+    return {**result, "at": at, "current": product.get("stock") if product else None}
+
+
+# ===============================
+# 🖼️ รูปสินค้า (GridFS)
+# ===============================
+
+IMAGE_CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@router.get("/{barcode}/image")
+async def get_goods_image(barcode: str, request: Request, size: Optional[int] = Query(None, ge=16, le=4096),
+                          v: Optional[str] = None):
+    """
+    รูปสินค้า ?size=128 ได้ thumbnail ที่เล็กที่สุดที่ไม่เล็กกว่าที่ขอ (ยังไม่เสร็จ = ต้นฉบับ แบบไม่ cache ถาวร)
+    URL ที่มี ?v=<etag> (จาก imageUrl) cache ได้ตลอด ไม่มี v -> ต้องถามใหม่ทุกครั้ง (ได้ 304 ถ้าไม่เปลี่ยน)
+    """
+    item = await goods_cache.get(barcode)
+    image = (item or {}).get("image")
+    if not image:
+        raise HTTPException(status_code=404, detail="ไม่พบรูปสินค้า")
+
+    file_id, label = goods_images.pick(image, size)
+    etag = f'"{image["etag"]}-{label}"'
+    # ✅ ขอ size แต่ได้ต้นฉบับเพราะ thumbnail ยังทำไม่เสร็จ -> ห้าม cache ถาวร (ไม่งั้น browser ไม่มาเอา thumbnail อีกเลย)
+    pending = image.get("thumbs") == {} and bool(goods_images.THUMB_SIZES)
+    final = not size or label != "original" or not pending
+    immutable = v == image["etag"] and final
+    headers = {"ETag": etag, "Cache-Control": IMAGE_CACHE_IMMUTABLE if immutable else "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        stream, content_type = await goods_images.open_stream(file_id)
+    except Exception:
+        goods_cache.invalidate(barcode)         # ✅ ไฟล์ถูกแทนที่ไปแล้ว ข้อมูลใน cache เก่า
+        raise HTTPException(status_code=404, detail="ไม่พบรูปสินค้า")
+
+    async def body():
+        while chunk := await stream.readchunk():
+            yield chunk
+
+    headers["Content-Length"] = str(stream.length)
+    return StreamingResponse(body(), media_type=content_type, headers=headers)
+
+
+# ✅ อัปโหลดรูปแบบ multipart (field "file") เขียนลง GridFS ทีละ chunk
+@router.put("/{barcode}/image")
+async def upload_goods_image(barcode: str, file: UploadFile = File(...)):
+    async def chunks():
+        while chunk := await file.read(goods_images.CHUNK):
+            yield chunk
+
+    return await _save_image(barcode, chunks(), file.content_type or "application/octet-stream")
+
+
+# ✅ อัปโหลดรูปแบบ base64 / data URL {"imageBase64": "data:image/png;base64,..."} (หน้าเว็บเดิม)
+@router.put("/{barcode}/image/base64")
+async def upload_goods_image_base64(barcode: str, payload: dict):
+    try:
+        data, content_type = goods_images.decode_base64(payload.get("imageBase64") or "")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _save_image(barcode, data, content_type)
+
+
+async def _save_image(barcode, data, content_type):
+    if not content_type.startswith("image/") and content_type != "application/octet-stream":
+        raise HTTPException(status_code=400, detail="ไฟล์ต้องเป็นรูปภาพ")
+    try:
+        image = await goods_images.save(barcode, data, content_type)
+    except goods_images.ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if image is None:
+        raise HTTPException(status_code=404, detail="❌ ไม่พบสินค้าในระบบ")
+    goods_cache.invalidate(barcode)
+    doc = goods_images.with_url({"barcode": barcode, "image": image})
+    return {"message": "✅ บันทึกรูปสินค้าแล้ว", "image": doc["image"], "imageUrl": doc["imageUrl"]}
+
+
+@router.delete("/{barcode}/image")
+async def delete_goods_image(barcode: str):
+    if not await goods_images.remove(barcode):
+        raise HTTPException(status_code=404, detail="❌ ไม่พบสินค้าในระบบ")
+    goods_cache.invalidate(barcode)
+    return {"message": "✅ ลบรูปสินค้าแล้ว"}
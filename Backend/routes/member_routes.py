@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
 from models.member_model import Member
 from database import db, serialize_doc
+from utils import db_indexes
 
 router = APIRouter(prefix="/api/members", tags=["Members"])
 
@@ -22,11 +24,14 @@ async def get_member(phone: str):
 # ✅ เพิ่มสมาชิกใหม่
 @router.post("")
 async def create_member(member: Member):
-    exists = await db.members.find_one({"phone": member.phone})
-    if exists:
+    # ✅ เบอร์ซ้ำ -> unique index (db_indexes) ตอบ DuplicateKeyError ไม่ต้องค้นก่อน
+    #    index ยังไม่พร้อม (สร้างไม่ได้ / DB_AUTO_INDEX=0) -> ค้นก่อนแบบเดิม
+    if not db_indexes.unique_ready("members", "phone") and await db.members.find_one({"phone": member.phone}, {"_id": 1}):
+        raise HTTPException(status_code=400, detail="เบอร์นี้ลงทะเบียนแล้ว")
+    try:
+        await db.members.insert_one(member.dict())
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="เบอร์นี้ลงทะเบียนแล้ว")
-
-    await db.members.insert_one(member.dict())
     return {
         "message": "✅ เพิ่มสมาชิกเรียบร้อย",
         "data": member.dict()
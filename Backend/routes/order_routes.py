@@ -1,229 +1,140 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
 from database import db, serialize_doc
 from models.order_model import Order
-from escpos.printer import Network
+from utils import print_spooler
+from utils import render_pool
+from utils import printer_registry
+from utils import stored_graphics
+from utils import receipt_archive
+from utils import stock_commit
+from utils import pagination
+from utils.escpos_raster import build_job
+from utils.print_document import BACKEND_PREVIEW, BACKEND_RASTER, choose_backend
+from utils.receipt_render import encode_receipt
 from datetime import datetime
-from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
-import os
 from bson import ObjectId
+from pymongo import ReturnDocument
+from typing import Optional
+import os
 
 router = APIRouter(prefix="/api/orders", tags=["Orders"])
 
-# ✅ ฟังก์ชันโหลดฟอนต์ไทย
-def _load_font(paths, size):
-    for p in paths:
-        if os.path.exists(p):
-            return ImageFont.truetype(p, size)
-    raise RuntimeError("ไม่พบฟอนต์ภาษาไทย")
+ORDERS_PAGE_SIZE = int(os.getenv("ORDERS_PAGE_SIZE", "200"))
+ORDER_FIELDS = {"member", "items", "paymentType", "cash", "total", "change", "date", "receipt"}
 
-# ✅ ฟังก์ชันวาดข้อความกึ่งกลาง
-def _draw_center(draw, y, text, font, canvas_w):
-    w = draw.textlength(text, font=font)
-    x = int((canvas_w - w) / 2)
-    draw.text((x, y), text, font=font, fill="black")
-    bbox = draw.textbbox((x, y), text, font=font)
-    return bbox[3]
 
+def _member_phone(order_dict):
+    phone = (order_dict.get("member") or {}).get("phone", "")
+    return None if not phone or phone == "-" else phone
 
-# ✅ ฟังก์ชันพิมพ์ใบเสร็จ
-async def print_receipt_thai(order_dict):
-    PRINTER_IP = "192.168.1.250"
-    RECEIPT_W = 576
-    INNER_W = RECEIPT_W - 48
-    CURSOR_Y = 6
-
-    font_candidates = [
-        "./utils/THSarabunNew.ttf",
-        "./utils/THSarabunNew Bold.ttf",
-        "/System/Library/Fonts/Supplemental/TH Sarabun New Bold.ttf",
-        "/usr/share/fonts/truetype/thai/THSarabunNew.ttf",
-    ]
-    font_title = _load_font(font_candidates, 60)
-    font_normal = _load_font(font_candidates, 42)
-    font_small = _load_font(font_candidates, 34)
-
-    img = Image.new("RGB", (RECEIPT_W, 2500), "white")
-    draw = ImageDraw.Draw(img)
-
-    # ===== โลโก้ =====
-    logo_path = "./assets/logo.png"
-    if os.path.exists(logo_path):
-        logo = Image.open(logo_path).convert("RGBA")
-        ratio = min(1.0, (INNER_W / logo.width))
-        logo = logo.resize((int(logo.width * ratio), int(logo.height * ratio)))
-        x = int((RECEIPT_W - logo.width) / 2)
-        img.paste(logo, (x, CURSOR_Y), mask=logo)
-        CURSOR_Y += logo.height + 10
-
-    # ===== Header =====
-    CURSOR_Y = _draw_center(draw, CURSOR_Y, "ถูกใจการค้า", font_title, RECEIPT_W)
-    CURSOR_Y += 6
-    CURSOR_Y = _draw_center(
-        draw, CURSOR_Y, "526 ม.11 ต.บางตาเถร อ.สองพี่น้อง จ.สุพรรณบุรี", font_small, RECEIPT_W
-    )
-    CURSOR_Y += 10
-    draw.text((40, CURSOR_Y), "-" * 42, font=font_small, fill="black")
-    CURSOR_Y += 40
-
-    # ===== สินค้า =====
-    for item in order_dict["items"]:
-        name = item["name"]
-        qty = item["qty"]
-        total = item["total"]
-        draw.text((40, CURSOR_Y), f"{name} x{qty}", font=font_normal, fill="black")
-        val = f"{total:,.2f}"
-        val_w = draw.textlength(val, font=font_normal)
-        draw.text((RECEIPT_W - 40 - val_w, CURSOR_Y), val, font=font_normal, fill="black")
-        CURSOR_Y += 36
-
-    draw.text((40, CURSOR_Y), "-" * 42, font=font_small, fill="black")
-    CURSOR_Y += 40
-
-    # ===== รวมทั้งหมด =====
+
+def _points_from(order_dict, member_db):
+    """แต้มบนใบเสร็จจากยอดแต้มของสมาชิกหลังบวกแต้มของ order นี้แล้ว"""
     total = float(order_dict.get("total", 0))
-    redeem = float(order_dict.get("redeem", 0))
-    net_total = total - redeem
-    payment_type = order_dict.get("paymentType", "cash")
-    cash = float(order_dict.get("cash", 0))
-    change = float(order_dict.get("change", 0))
-
-    draw.text((40, CURSOR_Y), f"รวมทั้งหมด: {total:,.2f} บาท", font=font_normal, fill="black")
-    CURSOR_Y += 36
-    if redeem > 0:
-        draw.text((40, CURSOR_Y), f"ใช้แต้มแลกส่วนลด: {redeem:,.2f} บาท", font=font_small, fill="black")
-        CURSOR_Y += 30
-    draw.text((40, CURSOR_Y), f"ยอดสุทธิ: {net_total:,.2f} บาท", font=font_normal, fill="black")
-    CURSOR_Y += 40
-
-    # ===== วิธีชำระเงิน =====
-    pay_label = "เงินสด" if payment_type == "cash" else "โอน"
-    draw.text((40, CURSOR_Y), f"ชำระโดย: {pay_label}", font=font_small, fill="black")
-    CURSOR_Y += 30
-    if payment_type == "cash":
-        draw.text((40, CURSOR_Y), f"รับเงิน: {cash:,.2f}", font=font_small, fill="black")
-        CURSOR_Y += 30
-        draw.text((40, CURSOR_Y), f"เงินทอน: {change:,.2f}", font=font_small, fill="black")
-        CURSOR_Y += 40
-    draw.text((40, CURSOR_Y), "-" * 42, font=font_small, fill="black")
-    CURSOR_Y += 40
-
-    # ===== แต้มสะสม =====
-    member = order_dict.get("member", {})
-    phone = member.get("phone", "")
-
-    # ✅ ถ้าไม่มีสมาชิกหรือ phone == "-" ให้ข้ามส่วนแต้ม
-    if not phone or phone == "-":
-        draw.text((40, CURSOR_Y), "ไม่มีสมาชิก", font=font_small, fill="black")
-        CURSOR_Y += 35
+    net_total = total - float(order_dict.get("redeem", 0))
+    points_before = int(member_db.get("points", 0) if member_db else 0)
+    earned = int(order_dict.get("earnedPoints", int(net_total // 100)))
+    redeem_points = int(order_dict.get("redeem", 0))
+    points_before = points_before - earned
+    points_after = points_before - redeem_points + earned
+    return {"before": points_before, "redeem": redeem_points, "earned": earned, "after": points_after}
+
+
+# ✅ คำนวณแต้มที่จะแสดงบนใบเสร็จ (None = ไม่มีสมาชิก) สำหรับ order ที่ยังไม่ได้แช่แข็งแต้มไว้
+async def _receipt_points(order_dict):
+    phone = _member_phone(order_dict)
+    if not phone:
+        return None
+    return _points_from(order_dict, await db.members.find_one({"phone": phone}))
+
+
+# ✅ ฟังก์ชันพิมพ์ใบเสร็จ (สร้างคำสั่งพิมพ์ใน process pool แล้วส่งผ่าน connection ที่เปิดค้างไว้)
+async def print_receipt_thai(order_dict):
+    # ✅ แต้ม / เวลาที่แช่แข็งไว้ตอนสร้าง order (งานเก่าในคิวที่ไม่มี ค่อยคำนวณตอนนี้)
+    frozen = order_dict.get("receipt")
+    order = {k: v for k, v in order_dict.items() if k != "receipt"}
+    if frozen:
+        points, printed_at = frozen.get("points"), frozen.get("printedAt")
     else:
-        member_db = await db.members.find_one({"phone": phone})
-        points_before = int(member_db.get("points", 0) if member_db else 0)
-        earned = int(order_dict.get("earnedPoints", int(net_total // 100)))
-        redeem_points = int(order_dict.get("redeem", 0))
-        points_before = points_before - earned
-        points_after = points_before - redeem_points + earned
-
-        draw.text((40, CURSOR_Y), f"เบอร์สมาชิก: {phone}", font=font_small, fill="black")
-        CURSOR_Y += 30
-        draw.text((40, CURSOR_Y), f"แต้มก่อนใช้: {points_before}", font=font_small, fill="black")
-        CURSOR_Y += 28
-        draw.text((40, CURSOR_Y), f"ใช้แต้ม: {redeem_points}", font=font_small, fill="black")
-        CURSOR_Y += 28
-        draw.text((40, CURSOR_Y), f"ได้รับใหม่: {earned}", font=font_small, fill="black")
-        CURSOR_Y += 28
-        draw.text((40, CURSOR_Y), f"แต้มคงเหลือ: {points_after}", font=font_small, fill="black")
-        CURSOR_Y += 40
-        draw.text((40, CURSOR_Y), "-" * 42, font=font_small, fill="black")
-        CURSOR_Y += 36
-
-    # ===== ข้อความท้าย =====
-    CURSOR_Y = _draw_center(draw, CURSOR_Y, "ขอบคุณที่อุดหนุน", font_normal, RECEIPT_W)
-    emoji_path = "./assets/thankyou.png"
-    if os.path.exists(emoji_path):
-        emoji = Image.open(emoji_path).convert("RGBA")
-        emoji = emoji.resize((48, 48))
-        x = int((RECEIPT_W - emoji.width) / 2)
-        img.paste(emoji, (x, CURSOR_Y), mask=emoji)
-        CURSOR_Y += emoji.height + 6
-    CURSOR_Y += 8
-    CURSOR_Y = _draw_center(draw, CURSOR_Y, datetime.now().strftime("%d/%m/%Y %H:%M:%S"), font_small, RECEIPT_W)
-    CURSOR_Y += 20
-
-    # ===== ครอปใบเสร็จ =====
-    img = img.crop((0, 0, RECEIPT_W, CURSOR_Y))
-    bw = img.convert("L").point(lambda x: 0 if x < 160 else 255, mode="1")
-
-    buf = BytesIO()
-    bw.save(buf, format="PNG")
-    buf.seek(0)
+        points = await _receipt_points(order)
+        printed_at = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+
+    # ✅ สร้างคำสั่งพิมพ์ตามเครื่องที่ได้งาน: backend ที่ส่ง byte น้อยที่สุด (ข้อความไทย / ภาพ)
+    #    กว้างตามหัวพิมพ์ของเครื่องนั้น และใช้โลโก้ที่อยู่ในเครื่องพิมพ์แล้ว
+    async def build(printer):
+        # ✅ เก็บภาพที่พิมพ์ลงคลังก่อนส่ง (พิมพ์ซ้ำใช้ภาพนี้) งานที่ลองใหม่ไม่วาดซ้ำ
+        raster = await receipt_archive.ensure(order["_id"], order, points, printed_at, printer.width)
+        backend = choose_backend(printer.caps)
+        stored = await stored_graphics.ensure(printer.host, printer.port, names=printer.stored_graphics,
+                                              width=printer.width)
+        if backend == BACKEND_RASTER and not stored:
+            return build_job([raster])
+        return await render_pool.run_cpu(
+            encode_receipt, order, points, printed_at, backend, printer.caps, stored
+        )
 
-    try:
-        p = Network(PRINTER_IP, port=9100, timeout=10)
-        p.image(buf)
-        try:
-            p.cut()
-        except Exception:
-            p.text("\n\n\n")
-        p.close()
-    except Exception as e:
-        print(f"⚠️ Printer not reachable: {e}")
-        img.save("./last_receipt.png")
+    # ✅ เครื่องที่ว่างที่สุดล้ม -> สลับเครื่อง, ออฟไลน์ทุกเครื่อง -> เก็บลง spool พิมพ์ให้เองเมื่อกลับมา
+    result = await printer_registry.dispatch(printer_registry.ROLE_RECEIPT, build, ref=order.get("_id"))
+    if result["status"] != "printed":
+        print(f"⚠️ Printer not reachable: ใบเสร็จ {order.get('_id')} {result['status']}")
+    return result
+
+
+print_spooler.register_handler("receipt", print_receipt_thai, priority=print_spooler.PRIORITY_RECEIPT)
 
 
 # ✅ บันทึกคำสั่งซื้อ + หัก stock
 @router.post("")
 async def create_order(order: Order):
     order_dict = order.model_dump()
-    result = await db.orders.insert_one(order_dict)
-    order_dict["_id"] = str(result.inserted_id)
-
-    not_found_items, low_stock_items, updated_items = [], [], []
-
-    for item in order_dict.get("items", []):
-        barcode = item.get("id") or item.get("barcode")
-        qty_sold = int(item.get("qty", 0))
-        if not barcode or qty_sold <= 0:
-            continue
-
-        product = await db.goods.find_one({"barcode": barcode})
-        if not product:
-            not_found_items.append(item.get("name", f"Unknown({barcode})"))
-            continue
-
-        current_qty = int(product.get("stock", 0))
-        new_qty = max(0, current_qty - qty_sold)
-        if new_qty < qty_sold:
-            low_stock_items.append(f"{product['name']} (คงเหลือ {current_qty}, ขาย {qty_sold})")
-
-        await db.goods.update_one({"barcode": barcode}, {"$set": {"stock": new_qty}})
-
-        updated_items.append({
-            "name": product["name"],
-            "old_qty": current_qty,
-            "sold": qty_sold,
-            "new_qty": new_qty
-        })
-
-    # ✅ อัปเดตแต้ม (เฉพาะมีสมาชิก)
-    if order_dict.get("member", {}).get("phone") not in [None, "-"]:
-        await db.members.update_one(
-            {"phone": order_dict["member"]["phone"]},
-            {"$inc": {"points": int(order_dict["total"] // 100)}}
+
+    # ✅ อัปเดตแต้ม (เฉพาะมีสมาชิก) ได้ยอดใหม่กลับมาในคำสั่งเดียว ใช้แช่แข็งแต้มบนใบเสร็จ
+    points = None
+    earned = 0
+    phone = _member_phone(order_dict)
+    if phone:
+        earned = int(order_dict["total"] // 100)
+        member_db = await db.members.find_one_and_update(
+            {"phone": phone},
+            {"$inc": {"points": earned}},
+            return_document=ReturnDocument.AFTER,
         )
+        points = _points_from(order_dict, member_db)
 
-    # ✅ พิมพ์ใบเสร็จ
-    await print_receipt_thai(order_dict)
+    # ✅ แช่แข็งข้อมูลใบเสร็จไว้ในเอกสาร order ตั้งแต่ insert (ไม่มี order ไหนที่ไม่มี receipt)
+    #    งานพิมพ์ถูกยกเลิก / ล้ม / หาย พิมพ์ซ้ำก็ยังได้แต้มเดิม
+    order_dict["receipt"] = {"points": points, "printedAt": datetime.now().strftime("%d/%m/%Y %H:%M:%S")}
+
+    # ✅ insert order + หักสต๊อก: ดึงสินค้าครั้งเดียว หักด้วย bulk_write ครั้งเดียว (transaction ถ้ามี replica set)
+    try:
+        stock = await stock_commit.commit_order(order_dict)
+    except Exception:
+        # ✅ บันทึก order ไม่สำเร็จ -> คืนแต้มที่เพิ่งบวกไป
+        if phone and earned:
+            await db.members.update_one({"phone": phone}, {"$inc": {"points": -earned}})
+        raise
+    order_dict["_id"] = str(stock.order_id)
+
+    # ✅ ส่งใบเสร็จเข้าคิวพิมพ์ (ไม่รอเครื่องพิมพ์)
+    job_id = None
+    try:
+        job_id = await print_spooler.enqueue("receipt", order_dict, ref=order_dict["_id"])
+    except Exception as e:
+        print(f"⚠️ Receipt enqueue failed: {e}")
 
     response = {
-        "message": "✅ บันทึกคำสั่งซื้อและพิมพ์ใบเสร็จเรียบร้อย",
+        "message": "✅ บันทึกคำสั่งซื้อและส่งพิมพ์ใบเสร็จเรียบร้อย",
         "data": order_dict,
-        "stock_updates": updated_items
+        "stock_updates": stock.updated,
+        "print_job": job_id
     }
-    if not_found_items:
-        response["warning_notfound"] = f"❌ ไม่พบสินค้า: {', '.join(not_found_items)}"
-    if low_stock_items:
-        response["warning_lowstock"] = f"⚠️ สินค้าสต๊อกไม่พอ: {', '.join(low_stock_items)}"
+    if stock.not_found:
+        response["warning_notfound"] = f"❌ ไม่พบสินค้า: {', '.join(stock.not_found)}"
+    if stock.low_stock:
+        response["warning_lowstock"] = f"⚠️ สินค้าสต๊อกไม่พอ: {', '.join(stock.low_stock)}"
+    if stock.conflicts:
+        response["warning_conflict"] = f"⚠️ มีการขายพร้อมกัน ตรวจสอบสต๊อก: {', '.join(stock.conflicts)}"
 
     return response
 # ✅ ดึงรายการขายล่าสุด
@@ -235,22 +146,93 @@ async def get_last_order():
     return serialize_doc(last_order)
 
 
-# ✅ ดึงรายการขายทั้งหมด (สำหรับรายงาน)
+# ✅ ดึงรายการขาย ใหม่ -> เก่า ทีละหน้า (สำหรับรายงาน)
 @router.get("")
-async def get_all_orders():
-    orders_cursor = db.orders.find().sort("_id", -1)
-    orders = await orders_cursor.to_list(length=200)
+async def get_all_orders(
+    response: Response,
+    limit: int = Query(ORDERS_PAGE_SIZE, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    หน้าถัดไป (เก่ากว่า): ส่ง ?cursor=<ค่าใน header X-Next-Cursor> (ไม่มี header = หน้าสุดท้าย)
+    fields: ค่าเริ่มต้นทุกฟิลด์ / "date,total,paymentType" เฉพาะที่ขอ
+    """
+    query = {}
+    try:
+        projection = pagination.projection(fields, ORDER_FIELDS, {})
+        if cursor:
+            query = pagination.after("_id", -1, *pagination.decode_cursor(cursor, "_id", -1))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    orders_cursor = db.orders.find(query, projection).sort("_id", -1).limit(limit + 1)
+    orders = await orders_cursor.to_list(length=limit + 1)
+    if len(orders) > limit:
+        orders = orders[:limit]
+        response.headers[pagination.NEXT_CURSOR_HEADER] = pagination.encode_cursor("_id", -1, None, orders[-1]["_id"])
     return [serialize_doc(o) for o in orders]
 
 
-# ✅ พิมพ์ใบเสร็จซ้ำ
+# ✅ พิมพ์ใบเสร็จซ้ำ: ใช้ภาพจากคลังส่งตรงไปเครื่องพิมพ์ (ไม่วาดใหม่ / ไม่อ่าน DB / แต้มตรงกับใบแรก)
 @router.post("/print/{order_id}")
 async def reprint_order(order_id: str):
+    if not ObjectId.is_valid(order_id):
+        raise HTTPException(status_code=400, detail="order_id ไม่ถูกต้อง")
+
+    archived = await receipt_archive.load(order_id)
+    if archived is not None:
+        meta, raster = archived
+
+        async def build(printer):
+            # ✅ เครื่องที่ได้งานกว้างไม่เท่าภาพในคลัง -> วาดใหม่จากข้อมูลที่แช่แข็งไว้ (แล้วเก็บไว้ใช้ครั้งหน้า)
+            image = raster
+            if raster.width != printer.width:
+                image = await receipt_archive.ensure(
+                    order_id, meta["order"], meta.get("points"), meta.get("printedAt"), printer.width
+                )
+            return build_job([image])
+
+        result = await printer_registry.dispatch(printer_registry.ROLE_RECEIPT, build, ref=order_id)
+        return {"message": "✅ ส่งพิมพ์ใบเสร็จซ้ำเรียบร้อย", "data": meta["order"], "archived": True, **result}
+
+    # ✅ ไม่มีในคลัง (งานแรกยังไม่ได้พิมพ์ / เกินอายุ) -> วาดใหม่ผ่านคิว ด้วย order.receipt ที่แช่แข็งไว้
+    #    (order ก่อนมีการแช่แข็ง ไม่มี receipt -> คำนวณแต้มตอนพิมพ์แบบเดิม)
     try:
         order = await db.orders.find_one({"_id": ObjectId(order_id)})
         if not order:
             raise HTTPException(status_code=404, detail="ไม่พบคำสั่งซื้อ")
-        await print_receipt_thai(order)
-        return {"message": "✅ พิมพ์ใบเสร็จซ้ำเรียบร้อย", "data": serialize_doc(order)}
+        order = serialize_doc(order)
+        job_id = await print_spooler.enqueue("receipt", order, ref=order["_id"])
+        return {"message": "✅ ส่งพิมพ์ใบเสร็จซ้ำเรียบร้อย", "data": order, "archived": False, "print_job": job_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"เกิดข้อผิดพลาด: {e}")
+
+
+# ✅ ภาพตัวอย่างใบเสร็จ (PNG) แบบเดียวกับที่พิมพ์เป็นภาพ
+@router.get("/preview/{order_id}")
+async def preview_receipt(order_id: str):
+    try:
+        oid = ObjectId(order_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="order_id ไม่ถูกต้อง")
+
+    # ✅ ใบที่พิมพ์ไปแล้ว: แสดงภาพจากคลัง (ตรงกับกระดาษที่ลูกค้าได้)
+    png = await receipt_archive.load_png(order_id)
+    if png is not None:
+        return Response(content=png, media_type="image/png")
+
+    order = await db.orders.find_one({"_id": oid})
+    if not order:
+        raise HTTPException(status_code=404, detail="ไม่พบคำสั่งซื้อ")
+    order = serialize_doc(order)
+    frozen = order.pop("receipt", None)
+    if frozen:
+        points, printed_at = frozen.get("points"), frozen.get("printedAt")
+    else:
+        points = await _receipt_points(order)
+        printed_at = order.get("date") if isinstance(order.get("date"), str) else None
+    png = await render_pool.run_cpu(encode_receipt, order, points, printed_at, BACKEND_PREVIEW)
+    return Response(content=png, media_type="image/png")
@@ -0,0 +1,138 @@
+from fastapi import APIRouter, HTTPException
+from bson.errors import InvalidId
+from typing import Optional
+from utils import print_spooler, render_pool, receipt_render, printer_transport, printer_health, label_cache, stored_graphics, printer_registry, receipt_archive
+
+router = APIRouter(prefix="/api/print", tags=["Print"])
+
+
+# ✅ ดูคิวงานพิมพ์ล่าสุด (กรองตามสถานะได้ เช่น ?status=failed)
+@router.get("/jobs")
+async def get_print_jobs(status: Optional[str] = None, limit: int = 50):
+    return await print_spooler.list_jobs(status=status, limit=min(limit, 500))
+
+
+# ✅ ดูสถานะงานพิมพ์ 1 งาน
+@router.get("/jobs/{job_id}")
+async def get_print_job(job_id: str):
+    try:
+        job = await print_spooler.get_job(job_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="job id ไม่ถูกต้อง")
+    if not job:
+        raise HTTPException(status_code=404, detail="ไม่พบงานพิมพ์")
+    return job
+
+
+# ✅ สั่งพิมพ์ซ้ำงานที่ล้มเหลว / ถูกยกเลิก
+@router.post("/jobs/{job_id}/retry")
+async def retry_print_job(job_id: str):
+    try:
+        job = await print_spooler.retry_job(job_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="job id ไม่ถูกต้อง")
+    if not job:
+        raise HTTPException(status_code=409, detail="งานนี้ไม่อยู่ในสถานะที่สั่งพิมพ์ซ้ำได้")
+    return {"message": "✅ ส่งงานกลับเข้าคิวพิมพ์แล้ว", "data": job}
+
+
+# ✅ ยกเลิกงานที่ยังไม่ได้พิมพ์
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_print_job(job_id: str):
+    try:
+        job = await print_spooler.cancel_job(job_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="job id ไม่ถูกต้อง")
+    if not job:
+        raise HTTPException(status_code=409, detail="งานนี้พิมพ์ไปแล้วหรือกำลังพิมพ์อยู่")
+    return {"message": "✅ ยกเลิกงานพิมพ์แล้ว", "data": job}
+
+
+# ✅ สถิติ cache ฟอนต์/รูป/tile (ของ process หลัก และ worker ที่วาดภาพ 1 ตัว)
+@router.get("/assets/stats")
+async def get_print_asset_stats():
+    return {
+        "main": receipt_render.cache_stats(),
+        "render_worker": await render_pool.run_cpu(receipt_render.cache_stats),
+        "labels": label_cache.stats(),
+    }
+
+
+# ✅ สถานะ connection เครื่องพิมพ์ (จำนวนครั้งที่ต่อใหม่ / byte ที่ส่ง)
+@router.get("/connections")
+async def get_printer_connections():
+    return printer_transport.stats()
+
+
+# ✅ สถานะเครื่องพิมพ์: breaker (closed/open) และจำนวนงานค้างใน spool
+@router.get("/health")
+async def get_printer_health():
+    return printer_health.stats()
+
+
+# ✅ โลโก้ / อีโมจิ ที่อัปโหลดไว้ในเครื่องพิมพ์ (PRINTER_STORED_GRAPHICS)
+@router.get("/stored-graphics")
+async def get_stored_graphics():
+    return await stored_graphics.stats()
+
+
+# ✅ บังคับอัปโหลดใหม่ (เช่น เปลี่ยนเครื่องพิมพ์ / รีเซ็ตเครื่องพิมพ์)
+@router.post("/stored-graphics/upload")
+async def upload_stored_graphics(name: str):
+    printer = printer_registry.get(name)
+    if not printer:
+        raise HTTPException(status_code=404, detail="ไม่พบเครื่องพิมพ์")
+    names = printer.stored_graphics or list(stored_graphics.KEYS)
+    ready = await stored_graphics.ensure(printer.host, printer.port, names=names, force=True, width=printer.width)
+    if not ready:
+        raise HTTPException(status_code=503, detail=f"อัปโหลดเข้าเครื่องพิมพ์ {printer.name} ({printer.host}) ไม่สำเร็จ")
+    return {"message": f"✅ อัปโหลด {', '.join(sorted(ready))} แล้ว", "uploaded": sorted(ready)}
+
+
+# ===============================
+# 🗂️ ทะเบียนเครื่องพิมพ์
+# ===============================
+@router.get("/printers")
+async def get_printers():
+    return printer_registry.stats()
+
+
+# ✅ เพิ่ม / แก้ไขเครื่องพิมพ์ (ชื่อซ้ำ = แก้ไข) บันทึกลง PRINTERS_CONFIG
+@router.post("/printers")
+async def upsert_printer(data: dict):
+    try:
+        printer = await printer_registry.upsert(data)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"ข้อมูลเครื่องพิมพ์ไม่ถูกต้อง: {e}")
+    return {"message": f"✅ บันทึกเครื่องพิมพ์ {printer.name} แล้ว", "printer": printer.info()}
+
+
+@router.delete("/printers/{name}")
+async def delete_printer(name: str):
+    if not await printer_registry.remove(name):
+        raise HTTPException(status_code=404, detail="ไม่พบเครื่องพิมพ์")
+    return {"message": f"🗑️ ลบเครื่องพิมพ์ {name} แล้ว"}
+
+
+# ✅ อ่านไฟล์ทะเบียนใหม่ (หลังแก้ไฟล์เอง)
+@router.post("/printers/reload")
+async def reload_printers():
+    printers = printer_registry.load()
+    return {"message": f"✅ โหลดเครื่องพิมพ์ {len(printers)} เครื่อง", "printers": [p.name for p in printers]}
+
+
+# ===============================
+# 🗄️ คลังใบเสร็จ
+# ===============================
+@router.get("/receipt-archive")
+async def get_receipt_archive():
+    return await receipt_archive.stats()
+
+
+# ✅ ลบใบเสร็จที่เก่ากว่า days วัน (ไม่ระบุ = ตาม RECEIPT_ARCHIVE_DAYS)
+@router.post("/receipt-archive/prune")
+async def prune_receipt_archive(days: Optional[int] = None):
+    if days is not None and days < 0:
+        raise HTTPException(status_code=400, detail="days ต้องไม่ติดลบ")
+    removed = await receipt_archive.prune(days)
+    return {"message": f"🧹 ลบใบเสร็จเก่า {removed} ใบ", "removed": removed}
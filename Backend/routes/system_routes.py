@@ -0,0 +1,64 @@
+from fastapi import APIRouter
+from utils import db_indexes, stock_ledger, goods_cache, goods_images, goods_search
+
+router = APIRouter(prefix="/api/system", tags=["System"])
+
+
+# ✅ รายงาน index ที่ขาด / option ไม่ตรง / ไม่ได้ประกาศไว้ (ไม่แก้อะไร)
+@router.get("/indexes")
+async def get_index_report():
+    return await db_indexes.report()
+
+
+# ✅ สร้าง index ที่ขาด (เช่น หลังแก้ข้อมูลซ้ำที่ทำให้สร้าง unique index ไม่ได้)
+@router.post("/indexes/sync")
+async def sync_indexes():
+    return await db_indexes.ensure()
+
+
+# ✅ เก็บ snapshot สต๊อกทันที (ปกติทำเองทุก STOCK_SNAPSHOT_HOURS)
+@router.post("/stock/snapshot")
+async def take_stock_snapshot():
+    return await stock_ledger.snapshot()
+
+
+# ✅ ตรวจสมุดบัญชีเทียบ goods.stock หนึ่งรอบ / ดูผลรอบล่าสุด
+@router.post("/stock/check")
+async def check_stock_ledger(batch: int = None):
+    return await stock_ledger.check(batch)
+
+
+@router.get("/stock/check")
+async def get_stock_check():
+    return stock_ledger.last_check() or {"message": "ยังไม่เคยตรวจ"}
+
+
+# ✅ สถิติ cache สินค้าตาม barcode (hit / miss / invalidate / change stream)
+@router.get("/cache/goods")
+async def get_goods_cache_stats():
+    return goods_cache.stats()
+
+
+@router.post("/cache/goods/clear")
+async def clear_goods_cache():
+    goods_cache.clear()
+    return goods_cache.stats()
+
+
+# ✅ ย้าย imageBase64 ที่ค้างในเอกสาร goods เข้า GridFS ทีละชุด (เรียกซ้ำจน remaining = 0)
+@router.post("/images/migrate")
+async def migrate_goods_images(batch: int = 200):
+    result = await goods_images.migrate(batch)
+    goods_cache.clear()
+    return result
+
+
+# ✅ index ค้นหาสินค้า: ทำตัวที่ยังไม่มี (full=true ทำใหม่ทุกตัว เช่น หลังแก้ชื่อสินค้าตรงใน DB) / ดูสถานะ
+@router.post("/search/reindex")
+async def reindex_goods_search(batch: int = None, full: bool = False):
+    return await goods_search.reindex(batch, full)
+
+
+@router.get("/search")
+async def get_goods_search_status():
+    return goods_search.status()
@@ -0,0 +1,161 @@
+import os
+from collections import namedtuple
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from database import db
+
+# ===============================
+# 🗂️ Index ของ MongoDB (ประกาศในโค้ด สร้างตอนแอปเริ่ม)
+# ===============================
+# - สร้าง index ที่ยังไม่มี (ซ้ำกี่รอบก็ได้ ตัวที่มีแล้วข้าม)
+# - ไม่ลบ / ไม่แก้ index เอง: ตัวที่ key ตรงแต่ option ไม่ตรง หรือ index ที่ไม่ได้ประกาศ รายงานเป็น drift
+# - unique index สร้างไม่ได้เพราะข้อมูลซ้ำอยู่แล้ว -> รายงานตัวอย่างค่าที่ซ้ำให้ไปแก้ข้อมูลก่อน
+# โค้ดที่เพิ่มข้อมูลใช้ DuplicateKeyError จาก unique index แทนการ find_one ตรวจก่อน insert
+#
+# ปิดการสร้างอัตโนมัติด้วย DB_AUTO_INDEX=0 (ยังรายงาน drift ตอนเริ่มเหมือนเดิม)
+# unique index ที่ยังไม่พร้อม (สร้างไม่ได้ / ปิดการสร้าง / ยังไม่ได้ตรวจ) -> unique_ready() เป็น False
+# โค้ดที่เพิ่มข้อมูลกลับไปค้นก่อน insert แบบเดิม (กันซ้ำได้เกือบทั้งหมดจนกว่าจะแก้ index)
+
+AUTO_INDEX = os.getenv("DB_AUTO_INDEX", "1") != "0"
+
+# ✅ เทียบชื่อประเภทสินค้าแบบไม่สนตัวพิมพ์เล็ก/ใหญ่ (strength 2) ใช้ collation เดียวกันตอน query
+TYPE_NAME_COLLATION = {"locale": "th", "strength": 2}
+
+IndexSpec = namedtuple("IndexSpec", ["collection", "keys", "options"])
+
+_unique_ready = set()       # (collection, field) ของ unique index ที่มีอยู่จริงและ option ตรง
+
+
+def _spec(collection, keys, **options):
+    return IndexSpec(collection, tuple(keys), options)
+
+
+INDEXES = [
+    # สินค้าที่ไม่มี barcode (None) มีได้หลายตัว -> unique เฉพาะที่เป็น string
+    _spec("goods", [("barcode", 1)], unique=True, partialFilterExpression={"barcode": {"$type": "string"}}),
+    # หน้ารายการสินค้าเรียงตาม name / stock / dateReceived แบ่งหน้าแบบ keyset (utils/pagination)
+    _spec("goods", [("name", 1), ("_id", 1)]),
+    _spec("goods", [("stock", 1), ("_id", 1)]),
+    _spec("goods", [("dateReceived", 1), ("_id", 1)]),
+    # ค้นหาสินค้าด้วย n-gram (utils/goods_search) + หาตัวที่ยังไม่ได้ทำ index
+    _spec("goods", [("search.grams", 1)]),
+    _spec("goods", [("search.v", 1)]),
+    _spec("members", [("phone", 1)], unique=True),
+    _spec("goods_types", [("name", 1)], unique=True, collation=TYPE_NAME_COLLATION),
+    # รายการขาย / export เรียงตาม date: ฟิลเตอร์เท่ากันที่ใช้บ่อยต้องมี index (ฟิลเตอร์, date) ไม่งั้นเรียงใน memory
+    _spec("orders", [("date", -1)]),
+    _spec("orders", [("member.phone", 1), ("date", -1)]),
+    _spec("orders", [("paymentType", 1), ("date", -1)]),
+    _spec("print_jobs", [("status", 1), ("priority", 1), ("_id", 1)]),
+    _spec("stock_movements", [("barcode", 1), ("at", 1)]),
+    _spec("stock_movements", [("at", 1)]),
+    _spec("stock_snapshots", [("barcode", 1), ("at", -1)]),
+    _spec("stock_snapshots", [("at", -1)]),
+]
+
+
+def _name(keys):
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+def _options_of(info):
+    """option ของ index ที่มีอยู่ เฉพาะตัวที่ประกาศได้ใน INDEXES (ไว้เทียบ)"""
+    options = {}
+    if info.get("unique"):
+        options["unique"] = True
+    if "partialFilterExpression" in info:
+        options["partialFilterExpression"] = dict(info["partialFilterExpression"])
+    if "collation" in info:
+        collation = info["collation"]
+        options["collation"] = {k: collation.get(k) for k in TYPE_NAME_COLLATION}
+    return options
+
+
+def _wanted(spec):
+    options = dict(spec.options)
+    if "collation" in options:
+        options["collation"] = {k: options["collation"].get(k) for k in TYPE_NAME_COLLATION}
+    return options
+
+
+async def _duplicates(spec, limit=5):
+    """ตัวอย่างค่าที่ซ้ำ (สาเหตุที่สร้าง unique index ไม่ได้)"""
+    group = {field.replace(".", "_"): f"${field}" for field, _ in spec.keys}
+    pipeline = [
+        {"$match": spec.options.get("partialFilterExpression", {})},
+        {"$group": {"_id": group, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit},
+    ]
+    kwargs = {"collation": spec.options["collation"]} if "collation" in spec.options else {}
+    try:
+        return [doc async for doc in db[spec.collection].aggregate(pipeline, **kwargs)]
+    except OperationFailure:
+        return []
+
+
+async def report(create: bool = False) -> dict:
+    """
+    เทียบ index ที่ประกาศกับที่มีจริงทุก collection
+    create=True สร้างตัวที่ขาด คืน {"ok", "created", "missing", "conflicts", "failed", "extra"}
+    """
+    result = {"created": [], "missing": [], "conflicts": [], "failed": [], "extra": []}
+    declared = {}
+    for spec in INDEXES:
+        declared.setdefault(spec.collection, []).append(spec)
+
+    for collection, specs in declared.items():
+        existing = await db[collection].index_information()
+        by_keys = {tuple(info["key"]): (name, info) for name, info in existing.items()}
+
+        for spec in specs:
+            entry = {"collection": collection, "keys": dict(spec.keys), "options": spec.options}
+            found = by_keys.pop(spec.keys, None)
+            ready_key = (collection, ",".join(field for field, _ in spec.keys))
+            _unique_ready.discard(ready_key)
+            if found is not None:
+                name, info = found
+                if _options_of(info) != _wanted(spec):
+                    result["conflicts"].append({**entry, "name": name, "actual": _options_of(info)})
+                elif spec.options.get("unique"):
+                    _unique_ready.add(ready_key)
+                continue
+            if not create:
+                result["missing"].append(entry)
+                continue
+            try:
+                name = await db[collection].create_index(list(spec.keys), name=_name(spec.keys), **spec.options)
+                result["created"].append({**entry, "name": name})
+                if spec.options.get("unique"):
+                    _unique_ready.add(ready_key)
+            except DuplicateKeyError:
+                result["failed"].append({**entry, "error": "duplicate values", "duplicates": await _duplicates(spec)})
+            except OperationFailure as e:
+                result["failed"].append({**entry, "error": str(e)})
+
+        for keys, (name, info) in by_keys.items():
+            if name != "_id_":
+                result["extra"].append({"collection": collection, "name": name, "keys": dict(keys)})
+
+    result["ok"] = not (result["missing"] or result["conflicts"] or result["failed"])
+    return result
+
+
+async def ensure() -> dict:
+    """เรียกตอนแอปเริ่ม: สร้าง index ที่ขาด (ถ้า DB_AUTO_INDEX) แล้วพิมพ์สรุป drift"""
+    result = await report(create=AUTO_INDEX)
+    for entry in result["created"]:
+        print(f"🗂️ สร้าง index {entry['collection']}.{entry['name']}")
+    for entry in result["missing"]:
+        print(f"⚠️ ยังไม่มี index {entry['collection']} {entry['keys']} (DB_AUTO_INDEX=0)")
+    for entry in result["conflicts"]:
+        print(f"⚠️ index {entry['collection']}.{entry['name']} option ไม่ตรง: ต้องการ {entry['options']} มีอยู่ {entry['actual']}")
+    for entry in result["failed"]:
+        print(f"❌ สร้าง index {entry['collection']} {entry['keys']} ไม่ได้: {entry['error']} {entry.get('duplicates', '')}")
+    return result
+
+
+def unique_ready(collection: str, field: str) -> bool:
+    """unique index ของ collection.field มีอยู่จริง (ตามรายงานล่าสุด) -> ใช้ DuplicateKeyError กันซ้ำได้"""
+    return (collection, field) in _unique_ready
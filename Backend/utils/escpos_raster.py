@@ -0,0 +1,155 @@
+import os
+from PIL import Image
+from utils.receipt_layout import Raster
+
+# ===============================
+# 🖨️ แปลงภาพ 1-bit เป็นคำสั่ง ESC/POS โดยตรง
+# ===============================
+# ใช้ Image.tobytes() ของภาพ mode "1" (packed 8 pixel ต่อ byte ตรงกับรูปแบบ raster ของ ESC/POS)
+# แค่กลับบิต (PIL: 1 = ขาว, ESC/POS: 1 = ดำ) แล้วหั่นเป็นแถบด้วย memoryview
+# ไม่ต้อง encode/decode PNG และไม่มี loop ต่อ pixel ใน Python
+
+ESC_INIT = b"\x1b@"
+FEED_CUT = b"\x1dVA\x03"          # GS V 65 n: feed n แล้วตัดกระดาษ
+FEED_LINES = b"\n\n\n"
+
+CMD_GS_V0 = "gs_v0"              # GS v 0  (print raster bit image)
+CMD_GS_L = "gs_l"                # GS ( L  (graphics data: store + print)
+
+# ✅ ความสูงสูงสุดต่อ 1 คำสั่ง (เครื่องพิมพ์ที่ buffer น้อยต้องแบ่งภาพเป็นแถบ)
+BAND_HEIGHT = int(os.getenv("PRINTER_BAND_HEIGHT", "256"))
+
+_INVERT = bytes(255 - b for b in range(256))
+
+
+def packed_bits(img_or_raster):
+    """คืน (bytes ต่อแถว, ความสูง, data ที่กลับบิตแล้ว 1 = ดำ)"""
+    if isinstance(img_or_raster, Image.Image):
+        img = img_or_raster if img_or_raster.mode == "1" else img_or_raster.convert("1")
+        width, height, data = img.width, img.height, img.tobytes()
+    else:
+        width, height, data = img_or_raster
+    return (width + 7) // 8, height, data.translate(_INVERT)
+
+
+def _gs_v0(row_bytes, rows, band):
+    return b"".join((
+        b"\x1dv0\x00",
+        row_bytes.to_bytes(2, "little"),
+        rows.to_bytes(2, "little"),
+        band,
+    ))
+
+
+def _gs_l(row_bytes, rows, band):
+    # GS ( L fn=112: เก็บภาพลง print buffer (a=48 ขาวดำ, ขยาย 1x1, c=49 สีที่ 1)
+    width = row_bytes * 8
+    params = b"0p0\x01\x011" + width.to_bytes(2, "little") + rows.to_bytes(2, "little")
+    size = len(params) + len(band)
+    return b"".join((
+        b"\x1d(L",
+        size.to_bytes(2, "little"),
+        params,
+        band,
+        b"\x1d(L\x02\x0002",      # fn=50: พิมพ์ภาพใน buffer
+    ))
+
+
+def encode_raster(img_or_raster, command: str = CMD_GS_V0, band_height: int = None) -> bytes:
+    """แปลงภาพ mode "1" / Raster เป็นคำสั่ง ESC/POS raster แบ่งเป็นแถบละไม่เกิน band_height แถว"""
+    row_bytes, height, data = packed_bits(img_or_raster)
+    band_height = band_height or BAND_HEIGHT
+    if command == CMD_GS_L:
+        # ✅ GS ( L ส่งข้อมูลได้ไม่เกิน 65535 byte ต่อคำสั่ง
+        band_height = min(band_height, (65535 - 10) // row_bytes)
+    encode = _gs_l if command == CMD_GS_L else _gs_v0
+
+    view = memoryview(data)
+    out = []
+    for y in range(0, height, band_height):
+        rows = min(band_height, height - y)
+        out.append(encode(row_bytes, rows, view[y * row_bytes:(y + rows) * row_bytes]))
+    return b"".join(out)
+
+
+def build_job(rasters, command: str = CMD_GS_V0, band_height: int = None, cut: bool = True) -> bytes:
+    """รวมหลายภาพเป็นงานพิมพ์เดียว (init + ภาพ + ตัดกระดาษระหว่างภาพ)"""
+    parts = [ESC_INIT]
+    for raster in rasters:
+        parts.append(encode_raster(raster, command, band_height))
+        parts.append(FEED_CUT if cut else FEED_LINES)
+    return b"".join(parts)
+
+
+# ===============================
+# 💾 NV graphics (GS ( L fn=67 / 69 / 66): รูปที่เก็บในเครื่องพิมพ์ เรียกพิมพ์ด้วย key 2 ตัวอักษร
+# ===============================
+ALIGN_LEFT = b"\x1ba\x00"
+ALIGN_CENTER = b"\x1ba\x01"
+
+# key ของรูปที่เก็บในเครื่องพิมพ์ (ชื่อเดียวกับ stored graphics ใน print_document)
+STORED_GRAPHIC_KEYS = {"logo": b"L1", "emoji": b"E1"}
+
+
+def _graphics_command(body: bytes) -> bytes:
+    # ✅ GS ( L รับได้ไม่เกิน 65535 byte ถ้าใหญ่กว่านั้นใช้ GS 8 L (ความยาว 4 byte)
+    if len(body) <= 65535:
+        return b"\x1d(L" + len(body).to_bytes(2, "little") + body
+    return b"\x1d8L" + len(body).to_bytes(4, "little") + body
+
+
+def nv_define(key: bytes, img_or_raster) -> bytes:
+    """เก็บภาพ 1-bit ลงหน่วยความจำ NV ของเครื่องพิมพ์ที่ key (เช่น b"L1") ทับของเดิมถ้ามี"""
+    row_bytes, height, data = packed_bits(img_or_raster)
+    params = (
+        b"0C0" + key + b"\x01"
+        + (row_bytes * 8).to_bytes(2, "little") + height.to_bytes(2, "little") + b"1"
+    )
+    return _graphics_command(params + data)
+
+
+def nv_print(key: bytes) -> bytes:
+    """พิมพ์ภาพที่เก็บไว้ที่ key (กึ่งกลางกระดาษ)"""
+    return ALIGN_CENTER + _graphics_command(b"0E" + key + b"\x01\x01") + ALIGN_LEFT
+
+
+def nv_delete(key: bytes) -> bytes:
+    return _graphics_command(b"0B" + key)
+
+
+def feed_dots(n: int) -> bytes:
+    """ESC J n: เลื่อนกระดาษ n dot (ไม่ต้องส่งภาพว่างเปล่า)"""
+    out = []
+    while n > 0:
+        out.append(b"\x1bJ" + bytes([min(n, 255)]))
+        n -= 255
+    return b"".join(out)
+
+
+def build_parts_job(parts, command: str = CMD_GS_V0, band_height: int = None, cut: bool = True) -> bytes:
+    """
+    รวมใบเสร็จที่แบ่งเป็นหลายส่วนเป็นงานพิมพ์เดียว (ไม่ตัดกระดาษระหว่างส่วน)
+    parts = Raster / ภาพ mode "1" หรือคำสั่งสำเร็จรูป (bytes เช่น nv_print(b"L1"))
+    """
+    out = [ESC_INIT]
+    for part in parts:
+        out.append(part if isinstance(part, (bytes, bytearray)) else encode_raster(part, command, band_height))
+    out.append(FEED_CUT if cut else FEED_LINES)
+    return b"".join(out)
+
+
+def decode_gs_v0(stream: bytes) -> Raster:
+    """แปลงคำสั่ง GS v 0 (ต่อกันหลายแถบ) กลับเป็น Raster ใช้ตรวจผลในการทดสอบ / เทียบภาพ"""
+    rows, width, i = [], None, 0
+    while True:
+        i = stream.find(b"\x1dv0", i)
+        if i < 0:
+            break
+        row_bytes = int.from_bytes(stream[i + 4:i + 6], "little")
+        height = int.from_bytes(stream[i + 6:i + 8], "little")
+        size = row_bytes * height
+        rows.append(stream[i + 8:i + 8 + size])
+        width = row_bytes * 8
+        i += 8 + size
+    data = b"".join(rows).translate(_INVERT)
+    return Raster(width or 0, len(data) // (width // 8) if width else 0, data)
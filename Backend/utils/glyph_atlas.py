@@ -0,0 +1,134 @@
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+from PIL import Image, ImageDraw
+
+# ===============================
+# 🔠 Atlas ตัวอักษร 1-bit (วาดคำที่ใช้ซ้ำครั้งเดียว แล้วแปะเป็น tile)
+# ===============================
+# ใบเสร็จใช้ตัวอักษรชุดเดิมซ้ำ ๆ (ตัวเลข, "รวมทั้งหมด:", "บาท", "เงินทอน:" ...)
+# แทนที่จะให้ FreeType วาดทุกบรรทัดใหม่ ตัดข้อความเป็นช่วง:
+# - ตัวเลขทีละตัว (0-9 มีแค่ 10 tile ต่อขนาดฟอนต์)
+# - คำที่ไม่มีช่องว่าง (สระบน/ล่าง/วรรณยุกต์อยู่ใน tile เดียวกับพยัญชนะเสมอ ตำแหน่งจึงถูกต้องตาม FreeType)
+# แต่ละช่วงวาดครั้งแรกด้วย FreeType + threshold แล้วเก็บเป็น mask 1-bit พร้อมความกว้างที่จำไว้
+# ครั้งต่อไปแค่ paste mask ลง canvas
+# ตำแหน่งของแต่ละช่วง = ผลรวมความกว้างของช่วงก่อนหน้า (จำไว้ต่อช่วง) + kerning ของคู่ตัวอักษรที่รอยต่อ
+# (จำไว้ต่อคู่) -> บรรทัดใหม่ที่ประกอบจากช่วงที่เคยเห็นแล้วไม่ต้องเรียก FreeType เลย
+# render_pool แบบ thread (RENDER_PROCESSES=0) เรียกพร้อมกันหลาย thread -> atlas มี lock
+
+ATLAS_SIZE = int(os.getenv("GLYPH_ATLAS_SIZE", "4096"))
+
+_SEGMENT = re.compile(r"\d|[^\d\s]+")
+_PIECE = re.compile(r"\d|\s+|[^\d\s]+")      # ช่วงที่วาด + ช่องว่าง (นับความกว้างด้วย)
+
+Tile = namedtuple("Tile", ["mask", "dx", "dy"])
+
+
+@lru_cache(maxsize=16384)
+def advance(font, text: str) -> float:
+    """ความกว้างข้อความ (font.getlength) แบบจำค่าไว้"""
+    return font.getlength(text)
+
+
+@lru_cache(maxsize=4096)
+def kern(font, left: str, right: str) -> float:
+    """ระยะ kerning ระหว่างตัวอักษรสุดท้ายของช่วงก่อนกับตัวแรกของช่วงถัดไป (ฟอนต์ส่วนใหญ่ = 0)"""
+    return font.getlength(left + right) - advance(font, left) - advance(font, right)
+
+
+@lru_cache(maxsize=4096)
+def bbox(font, text: str):
+    """font.getbbox แบบจำค่าไว้"""
+    return font.getbbox(text)
+
+
+def _ink_lut(threshold):
+    # ต่ำกว่า threshold = หมึก (mask = 255)
+    return [255] * threshold + [0] * (256 - threshold)
+
+
+class GlyphAtlas:
+    def __init__(self, threshold: int, max_tiles: int = ATLAS_SIZE):
+        self.threshold = threshold
+        self.max_tiles = max_tiles
+        self._lut = _ink_lut(threshold)
+        self._tiles = OrderedDict()       # (font, text) -> Tile
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def tile(self, font, text: str) -> Tile:
+        key = (font, text)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return tile
+            self.misses += 1
+
+        # ✅ วาดนอก lock (thread อื่นวาดช่วงเดียวกันพร้อมกันได้ ผลเหมือนกัน เก็บตัวไหนก็ได้)
+        x0, y0, x1, y1 = bbox(font, text)
+        if x1 <= x0 or y1 <= y0:
+            tile = Tile(None, 0, 0)
+        else:
+            img = Image.new("L", (x1 - x0, y1 - y0), 255)
+            ImageDraw.Draw(img).text((-x0, -y0), text, font=font, fill=0)
+            tile = Tile(img.point(self._lut, mode="1"), x0, y0)
+
+        with self._lock:
+            self._tiles[key] = tile
+            if len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return tile
+
+    def draw(self, canvas: Image.Image, xy, text: str, font):
+        """วาดข้อความ 1 บรรทัดลง canvas mode "1" (ดำ = 0) ที่ตำแหน่งเดียวกับ ImageDraw.text"""
+        x, y = xy
+        left, previous = 0.0, None
+        for piece in _PIECE.findall(text):
+            if previous is not None:
+                left += kern(font, previous, piece[0])
+            if not piece.isspace():
+                tile = self.tile(font, piece)
+                if tile.mask is not None:
+                    canvas.paste(0, (round(x + left) + tile.dx, y + tile.dy), tile.mask)
+            left += advance(font, piece)
+            previous = piece[-1]
+
+    def warm(self, font, runs):
+        for text in runs:
+            for segment in _SEGMENT.findall(text):
+                self.tile(font, segment)
+
+    def info(self):
+        total = self.hits + self.misses
+        return {
+            "threshold": self.threshold,
+            "tiles": len(self._tiles),
+            "max_tiles": self.max_tiles,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+        }
+
+
+_atlases = {}
+
+
+def get_atlas(threshold: int) -> GlyphAtlas:
+    atlas = _atlases.get(threshold)
+    if atlas is None:
+        atlas = _atlases[threshold] = GlyphAtlas(threshold)
+    return atlas
+
+
+def stats():
+    return {
+        "atlases": [a.info() for a in _atlases.values()],
+        "advance": advance.cache_info()._asdict(),
+        "kern": kern.cache_info()._asdict(),
+    }
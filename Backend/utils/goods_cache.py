@@ -0,0 +1,193 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+from pymongo.errors import OperationFailure
+
+from database import db
+
+# ===============================
+# 🔎 Cache สินค้าตาม barcode (ทางด่วนของการสแกน)
+# ===============================
+# ทุกการสแกน (ขาย / เช็คสต๊อก / เติมสต๊อก) เรียก GET /api/goods/barcode/{barcode} = 1 round trip ไป Mongo
+# - LRU ไม่เกิน GOODS_CACHE_SIZE รายการ อายุ GOODS_CACHE_TTL_SEC วินาที (0 = ปิด cache)
+# - barcode ที่ไม่มีในระบบจำไว้ GOODS_CACHE_NEGATIVE_TTL_SEC วินาที (สแกนผิดซ้ำ ๆ ไม่ต้องถาม DB)
+# - สแกนพร้อมกันหลายเครื่อง barcode เดียวกัน -> อ่าน DB ครั้งเดียว
+# - write-through: โค้ดที่แก้สินค้าเรียก invalidate(barcode) หลังเขียนเสร็จ
+#   ระหว่างที่กำลังอ่าน DB อยู่ถ้ามี invalidate เข้ามา ผลที่อ่านได้จะไม่ถูกเก็บ (กันค่าเก่าค้าง)
+# - GOODS_CACHE_WATCH=1: ฟัง change stream ของ goods (ต้องเป็น replica set) เห็นการแก้จากนอก API /
+#   worker อื่นด้วย ถ้า stream หลุดล้าง cache ทั้งหมดแล้วต่อใหม่
+
+MAX_ENTRIES = int(os.getenv("GOODS_CACHE_SIZE", "2000"))
+TTL_SEC = float(os.getenv("GOODS_CACHE_TTL_SEC", "30"))
+NEGATIVE_TTL_SEC = float(os.getenv("GOODS_CACHE_NEGATIVE_TTL_SEC", "5"))
+WATCH = os.getenv("GOODS_CACHE_WATCH", "0") == "1"
+
+HIDDEN = {"search": 0}      # ✅ gram ค้นหา (utils/goods_search) ไม่ต้องส่งให้ client / เก็บใน cache
+
+_entries = OrderedDict()    # barcode -> (หมดอายุเมื่อ, doc หรือ None)
+_ids = {}                   # str(_id) -> barcode (change stream ส่งมาแค่ _id ตอน update / delete)
+_versions = {}              # barcode -> จำนวนครั้งที่ถูก invalidate
+_loading = {}               # barcode -> Future ของการอ่านที่กำลังทำอยู่
+_stats = {"hits": 0, "negative_hits": 0, "misses": 0, "expired": 0, "evictions": 0,
+          "invalidations": 0, "coalesced": 0, "watch_events": 0}
+_watch = {"task": None, "status": "off", "error": None}
+
+
+def _enabled():
+    return MAX_ENTRIES > 0 and TTL_SEC > 0
+
+
+def _store(barcode, doc):
+    ttl = TTL_SEC if doc is not None else NEGATIVE_TTL_SEC
+    if ttl <= 0:
+        return
+    _entries[barcode] = (time.monotonic() + ttl, doc)
+    _entries.move_to_end(barcode)
+    if doc is not None:
+        _ids[str(doc["_id"])] = barcode
+    while len(_entries) > MAX_ENTRIES:
+        _, (_, old) = _entries.popitem(last=False)
+        if old is not None:
+            _ids.pop(str(old["_id"]), None)
+        _stats["evictions"] += 1
+
+
+async def _load(barcode):
+    version = _versions.get(barcode, 0)
+    doc = await db.goods.find_one({"barcode": barcode}, HIDDEN)
+    if _versions.get(barcode, 0) == version:
+        _store(barcode, doc)
+    return doc
+
+
+async def get(barcode: str):
+    """สินค้าตาม barcode (dict จาก Mongo สำเนาใหม่ทุกครั้ง แก้ได้ไม่กระทบ cache) หรือ None ถ้าไม่มี"""
+    barcode = str(barcode)
+    if not _enabled():
+        return await db.goods.find_one({"barcode": barcode}, HIDDEN)
+
+    entry = _entries.get(barcode)
+    if entry is not None:
+        expires, doc = entry
+        if expires > time.monotonic():
+            _entries.move_to_end(barcode)
+            _stats["hits" if doc is not None else "negative_hits"] += 1
+            return dict(doc) if doc is not None else None
+        _stats["expired"] += 1
+        _drop(barcode)
+
+    future = _loading.get(barcode)
+    if future is not None:
+        _stats["coalesced"] += 1
+    else:
+        _stats["misses"] += 1
+        future = asyncio.ensure_future(_load(barcode))
+        _loading[barcode] = future
+        future.add_done_callback(lambda f: _loading.pop(barcode, None) if _loading.get(barcode) is f else None)
+    doc = await asyncio.shield(future)
+    return dict(doc) if doc is not None else None
+
+
+def _drop(barcode):
+    entry = _entries.pop(barcode, None)
+    if entry is not None and entry[1] is not None:
+        _ids.pop(str(entry[1]["_id"]), None)
+
+
+def invalidate(*barcodes):
+    """ลบสินค้าออกจาก cache (เรียกหลังเขียน goods เสร็จ)"""
+    for barcode in barcodes:
+        if not barcode:
+            continue
+        barcode = str(barcode)
+        _versions[barcode] = _versions.get(barcode, 0) + 1
+        _loading.pop(barcode, None)
+        _drop(barcode)
+        _stats["invalidations"] += 1
+
+
+def clear():
+    for barcode in list(_entries):
+        invalidate(barcode)
+    for barcode in list(_loading):
+        invalidate(barcode)
+
+
+def stats():
+    looked_up = _stats["hits"] + _stats["negative_hits"] + _stats["misses"] + _stats["coalesced"]
+    served = looked_up - _stats["misses"]
+    return {
+        **_stats,
+        "hit_ratio": round(served / looked_up, 3) if looked_up else None,
+        "size": len(_entries),
+        "max_size": MAX_ENTRIES,
+        "ttl_sec": TTL_SEC,
+        "negative_ttl_sec": NEGATIVE_TTL_SEC,
+        "watch": {"status": _watch["status"], "error": _watch["error"]},
+    }
+
+
+# ===============================
+# 📡 change stream (ไม่บังคับ)
+# ===============================
+_WATCH_PIPELINE = [{"$project": {
+    "operationType": 1,
+    "documentKey": 1,
+    "fullDocument.barcode": 1,
+    "updateDescription.updatedFields.barcode": 1,
+}}]
+
+
+def _on_change(change):
+    _stats["watch_events"] += 1
+    if change["operationType"] in ("drop", "rename", "dropDatabase", "invalidate"):
+        clear()
+        return
+    key = str(change.get("documentKey", {}).get("_id"))
+    invalidate(_ids.get(key))
+    invalidate((change.get("fullDocument") or {}).get("barcode"))
+    updated = (change.get("updateDescription") or {}).get("updatedFields") or {}
+    invalidate(updated.get("barcode"))
+
+
+async def _watch_loop():
+    delay = 1
+    while True:
+        try:
+            async with db.goods.watch(_WATCH_PIPELINE) as stream:
+                clear()                   # ✅ ช่วงที่ stream หลุดอาจพลาดการแก้ไป
+                _watch.update(status="watching", error=None)
+                delay = 1
+                async for change in stream:
+                    _on_change(change)
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code in (40573, 40324):  # ✅ standalone ไม่มี change stream -> ใช้ TTL อย่างเดียว
+                _watch.update(status="unsupported", error=str(e))
+                print("⚠️ Mongo ไม่รองรับ change stream (ต้องเป็น replica set) cache สินค้าใช้ TTL อย่างเดียว")
+                return
+            _watch.update(status="retrying", error=str(e))
+        except Exception as e:
+            _watch.update(status="retrying", error=str(e))
+        clear()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 60)
+
+
+def start():
+    if WATCH and _enabled() and _watch["task"] is None:
+        _watch["task"] = asyncio.create_task(_watch_loop())
+
+
+async def stop():
+    task = _watch["task"]
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        _watch.update(task=None, status="off")
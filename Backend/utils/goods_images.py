@@ -0,0 +1,281 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import os
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from PIL import Image, ImageOps
+
+from database import db
+from utils import render_pool
+
+# ===============================
+# 🖼️ รูปสินค้าใน GridFS (แยกออกจากเอกสาร goods)
+# ===============================
+# เดิมรูปเป็น base64 อยู่ใน goods.imageBase64 ทุก find / สแกน / หน้ารายการลากรูปหลายร้อย KB ไปด้วย
+# ตอนนี้: ไฟล์เก็บใน GridFS bucket "goods_images" เอกสาร goods เก็บแค่ข้อมูลอ้างอิง
+#     goods.image = {"id", "etag", "contentType", "length", "thumbs": {"128": id, ...}}
+# - รับได้ทั้ง multipart (อ่านทีละ chunk เขียนลง GridFS) และ base64 / data URL (ของเดิม)
+# - ย่อรูปเป็น thumbnail ตามขนาดใน GOODS_IMAGE_THUMBS ทีหลังใน render_pool (ไม่ให้คนอัปโหลดรอ)
+#   แอปเริ่มใหม่ -> สร้าง thumbnail ที่ยังค้างอยู่ต่อ
+# - etag = sha1 ของไฟล์ต้นฉบับ URL ที่มี ?v=<etag> cache ได้ตลอด (รูปเปลี่ยน = URL เปลี่ยน)
+# - migrate(): ย้าย imageBase64 ที่ค้างใน goods เข้า GridFS ทีละชุด
+
+BUCKET = "goods_images"
+THUMB_SIZES = [int(s) for s in os.getenv("GOODS_IMAGE_THUMBS", "128,512").split(",") if s.strip()]
+MAX_BYTES = int(float(os.getenv("GOODS_IMAGE_MAX_MB", "5")) * 1024 * 1024)
+CHUNK = 256 * 1024
+
+_bucket = None
+_pending = set()
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def bucket():
+    global _bucket
+    if _bucket is None:
+        _bucket = AsyncIOMotorGridFSBucket(db, bucket_name=BUCKET)
+    return _bucket
+
+
+def decode_base64(value: str):
+    """รับ data URL ("data:image/png;base64,...") หรือ base64 เปล่า คืน (bytes, contentType)"""
+    content_type = "application/octet-stream"
+    if value.startswith("data:"):
+        head, _, value = value.partition(",")
+        content_type = head[5:].split(";")[0] or content_type
+    try:
+        data = base64.b64decode(value, validate=False)
+    except (binascii.Error, ValueError):
+        raise ValueError("รูปภาพ base64 ไม่ถูกต้อง")
+    if not data:
+        raise ValueError("รูปภาพว่าง")
+    if len(data) > MAX_BYTES:
+        raise ImageTooLarge(f"รูปใหญ่เกิน {MAX_BYTES // (1024 * 1024)} MB")
+    return data, content_type
+
+
+def url(doc: dict, size: int = None):
+    """URL ของรูปสินค้า (มี ?v=etag -> browser cache ได้ถาวร) หรือ None"""
+    image = doc.get("image") if doc else None
+    if not image or not doc.get("barcode"):
+        return None
+    query = f"v={image['etag']}" + (f"&size={size}" if size else "")
+    return f"/api/goods/{doc['barcode']}/image?{query}"
+
+
+def with_url(doc: dict) -> dict:
+    """แทน goods.image (มี ObjectId ภายใน) ด้วยข้อมูลที่ส่งให้ client ได้ + imageUrl"""
+    image = doc.get("image") if doc else None
+    if image:
+        doc["imageUrl"] = url(doc)
+        doc["image"] = {"etag": image.get("etag"), "contentType": image.get("contentType"),
+                        "length": image.get("length"), "sizes": sorted(map(int, image.get("thumbs") or {}))}
+    return doc
+
+
+# ===============================
+# 📥 บันทึกรูป
+# ===============================
+async def _chunks_of(data: bytes):
+    for i in range(0, len(data), CHUNK):
+        yield data[i:i + CHUNK]
+
+
+async def save(barcode: str, chunks, content_type: str) -> dict:
+    """
+    เขียนรูปต้นฉบับลง GridFS ทีละ chunk (bytes หรือ async iterator ของ bytes)
+    แล้วชี้ goods.image ไปที่ไฟล์ใหม่ ลบไฟล์เก่า และสั่งทำ thumbnail เบื้องหลัง
+    คืน goods.image ใหม่ / None ถ้าไม่พบสินค้า
+    """
+    if isinstance(chunks, (bytes, bytearray)):
+        chunks = _chunks_of(bytes(chunks))
+    digest, length = hashlib.sha1(), 0
+    stream = bucket().open_upload_stream(
+        barcode, metadata={"barcode": barcode, "role": "original", "contentType": content_type}
+    )
+    try:
+        async for chunk in chunks:
+            length += len(chunk)
+            if length > MAX_BYTES:
+                raise ImageTooLarge(f"รูปใหญ่เกิน {MAX_BYTES // (1024 * 1024)} MB")
+            digest.update(chunk)
+            await stream.write(chunk)
+    except BaseException:
+        await stream.abort()
+        raise
+    await stream.close()
+
+    image = {"id": stream._id, "etag": digest.hexdigest()[:20], "contentType": content_type,
+             "length": length, "thumbs": {}}
+    old = await db.goods.find_one_and_update(
+        {"barcode": barcode}, {"$set": {"image": image}, "$unset": {"imageBase64": ""}},
+        projection={"image": 1},
+    )
+    if old is None:
+        await bucket().delete(image["id"])
+        return None
+    await _delete_files(old.get("image"))
+    schedule_thumbnails(barcode, image)
+    return image
+
+
+async def _delete_files(image):
+    if not image:
+        return
+    for file_id in [image.get("id"), *(image.get("thumbs") or {}).values()]:
+        if file_id is None:
+            continue
+        try:
+            await bucket().delete(file_id)
+        except Exception:
+            pass        # ✅ ไฟล์หายไปแล้ว / ลบซ้ำ ไม่เป็นไร
+
+
+async def remove(barcode: str) -> bool:
+    old = await db.goods.find_one_and_update(
+        {"barcode": barcode}, {"$unset": {"image": "", "imageBase64": ""}}, projection={"image": 1}
+    )
+    if old is None:
+        return False
+    await _delete_files(old.get("image"))
+    return True
+
+
+# ===============================
+# 🔍 Thumbnail (เบื้องหลัง)
+# ===============================
+def _make_thumbs(data: bytes, sizes):
+    """ย่อรูป (รันใน render_pool) คืน [(ขนาด, bytes, contentType)] รูปมีพื้นใส -> PNG นอกนั้น JPEG"""
+    with Image.open(io.BytesIO(data)) as src:
+        src = ImageOps.exif_transpose(src)
+        alpha = src.mode in ("RGBA", "LA") or (src.mode == "P" and "transparency" in src.info)
+        src = src.convert("RGBA" if alpha else "RGB")
+        out = []
+        for size in sorted(sizes):
+            thumb = src.copy()
+            thumb.thumbnail((size, size), Image.LANCZOS)
+            buf = io.BytesIO()
+            if alpha:
+                thumb.save(buf, format="PNG", optimize=True)
+                out.append((size, buf.getvalue(), "image/png"))
+            else:
+                thumb.save(buf, format="JPEG", quality=82, optimize=True, progressive=True)
+                out.append((size, buf.getvalue(), "image/jpeg"))
+        return out
+
+
+async def _read(file_id) -> bytes:
+    stream = await bucket().open_download_stream(file_id)
+    return await stream.read()
+
+
+async def _thumbnails(barcode, image):
+    data = await _read(image["id"])
+    try:
+        thumbs = await render_pool.run_cpu(_make_thumbs, data, THUMB_SIZES)
+    except (OSError, ValueError) as e:       # ✅ ไม่ใช่รูปที่ PIL เปิดได้ -> ใช้ต้นฉบับอย่างเดียว
+        print(f"⚠️ ย่อรูปสินค้า {barcode} ไม่ได้: {e}")
+        await db.goods.update_one({"barcode": barcode, "image.id": image["id"]}, {"$set": {"image.thumbs": None}})
+        return
+
+    ids = {}
+    for size, blob, content_type in thumbs:
+        ids[str(size)] = await bucket().upload_from_stream(
+            f"{barcode}@{size}", blob,
+            metadata={"barcode": barcode, "role": "thumb", "size": size, "contentType": content_type,
+                      "original": image["id"]},
+        )
+    # ✅ ระหว่างย่อ มีรูปใหม่มาแทน -> ทิ้ง thumbnail ชุดนี้
+    updated = await db.goods.update_one({"barcode": barcode, "image.id": image["id"]},
+                                        {"$set": {"image.thumbs": ids}})
+    if updated.matched_count == 0:
+        await _delete_files({"thumbs": ids})
+
+
+def schedule_thumbnails(barcode: str, image: dict):
+    if not THUMB_SIZES:
+        return
+
+    async def run():
+        try:
+            await _thumbnails(barcode, image)
+        except Exception as e:
+            print(f"⚠️ ทำ thumbnail {barcode} ไม่สำเร็จ: {e}")
+
+    task = asyncio.create_task(run())
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def resume():
+    """ทำ thumbnail ของรูปที่ค้าง (เช่น ปิดแอประหว่างย่อ)"""
+    cursor = db.goods.find({"image.id": {"$exists": True}, "image.thumbs": {}}, {"barcode": 1, "image": 1})  # None = ย่อไม่ได้
+    count = 0
+    async for doc in cursor:
+        schedule_thumbnails(doc["barcode"], doc["image"])
+        count += 1
+    return count
+
+
+async def wait_pending():
+    if _pending:
+        await asyncio.gather(*list(_pending), return_exceptions=True)
+
+
+async def stop():
+    for task in list(_pending):
+        task.cancel()
+    await wait_pending()
+
+
+# ===============================
+# 📤 อ่านรูป
+# ===============================
+def pick(image: dict, size: int = None):
+    """
+    เลือกไฟล์ที่เล็กที่สุดที่ยังใหญ่ >= size (ไม่มี -> ต้นฉบับ) คืน (file_id, ป้ายขนาด)
+    thumbnail ยังไม่เสร็จ -> ส่งต้นฉบับไปก่อน
+    """
+    if size:
+        for label in sorted((image.get("thumbs") or {}), key=int):
+            if int(label) >= size:
+                return image["thumbs"][label], label
+    return image["id"], "original"
+
+
+async def open_stream(file_id):
+    """GridOut ของไฟล์ (อ่านทีละ chunk ด้วย readchunk) คืน (stream, contentType)"""
+    stream = await bucket().open_download_stream(file_id)
+    content_type = (stream.metadata or {}).get("contentType", "application/octet-stream")
+    return stream, content_type
+
+
+# ===============================
+# 🚚 ย้าย imageBase64 เดิมเข้า GridFS
+# ===============================
+async def migrate(batch: int = 200) -> dict:
+    """
+    ย้ายรูปของสินค้าที่ยังมี imageBase64 ทีละ batch รายการ (เรียกซ้ำจนกว่า remaining = 0)
+    สินค้าที่ไม่มี barcode ข้าม (เรียกรูปตาม barcode ไม่ได้) รูปที่ถอด base64 ไม่ได้ -> failed
+    """
+    query = {"imageBase64": {"$type": "string", "$ne": ""}, "barcode": {"$type": "string"}}
+    cursor = db.goods.find(query, {"barcode": 1, "imageBase64": 1}).limit(batch)
+    moved, failed, saved_bytes = 0, [], 0
+    async for doc in cursor:
+        try:
+            data, content_type = decode_base64(doc["imageBase64"])
+            await save(doc["barcode"], data, content_type)
+            moved += 1
+            saved_bytes += len(doc["imageBase64"])
+        except ValueError as e:
+            failed.append({"barcode": doc["barcode"], "error": str(e)})
+            # ✅ ไม่ให้ตัวที่เสียวนกลับมาทุกรอบ: เก็บไว้อีกฟิลด์
+            await db.goods.update_one({"_id": doc["_id"]}, {"$rename": {"imageBase64": "imageBase64Invalid"}})
+    remaining = await db.goods.count_documents(query)
+    return {"moved": moved, "failed": failed, "bytes_removed_from_goods": saved_bytes, "remaining": remaining}
@@ -0,0 +1,324 @@
+import asyncio
+import math
+import os
+import re
+import unicodedata
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from database import db
+
+# ===============================
+# 🔎 ค้นหาสินค้าด้วย n-gram (รองรับภาษาไทยที่ไม่มีช่องว่างระหว่างคำ)
+# ===============================
+# $regex แบบไม่ยึดต้นคำ + ไม่สนตัวพิมพ์ ใช้ index ไม่ได้ -> สแกนสินค้าทุกตัวทุกครั้งที่ค้น
+# text index ของ Mongo ตัดคำไทยไม่เป็น ตรงนี้จึงทำ index เองตอนเขียน:
+#     goods.search = {"v": VERSION, "grams": ["^น", "นา", "าป", ...]}   (multikey index ดู db_indexes)
+# - ข้อความ (name / supplier / type) ผ่าน _fold: ตัวพิมพ์เล็ก ตัดวรรณยุกต์ / การันต์ / zero-width
+#   -> "น้ำปลา" กับ "นำปลา" (ลืมใส่ไม้โท) ได้ gram เดียวกัน
+# - gram = ตัวอักษรติดกัน 2 ตัวในแต่ละคำ + "^" ตัวแรกของคำ (ค้น 1 ตัวอักษร = ขึ้นต้นคำ)
+# - ค้น: ผู้สมัครไม่เกิน SEARCH_CANDIDATES ตัวต่อขั้น จาก barcode / ชื่อขึ้นต้นด้วยคำค้น, มี gram ครบ
+#   และถ้ายังได้ไม่พอ: มี gram อย่างน้อย SEARCH_MIN_MATCH ส่วน (พิมพ์ผิดบางตัวยังเจอ) แล้วให้คะแนนใน Python: ตรงทั้งหมด > ขึ้นต้น > ขึ้นต้นคำ > มีอยู่ข้างใน > คล้าย
+#   ชื่อสำคัญกว่า barcode / ประเภท / ผู้จำหน่าย พร้อมตำแหน่งที่ตรง (highlight) ในข้อความเดิม
+# - barcode ค้นแบบขึ้นต้นด้วย regex ยึดต้น (ใช้ index barcode) ไม่เก็บเป็น gram (ตัวเลข 2 หลักซ้ำกันทุกตัว)
+# สินค้าที่เพิ่มผ่าน add_goods ได้ index ทันที ของเดิม / ที่แก้นอก API: start() ไล่ทำเบื้องหลัง หรือ reindex()
+
+VERSION = 1
+MIN_MATCH = float(os.getenv("SEARCH_MIN_MATCH", "0.5"))
+CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "200"))
+REINDEX_BATCH = int(os.getenv("SEARCH_REINDEX_BATCH", "1000"))
+
+FIELDS = ("name", "barcode", "type", "supplier")
+WEIGHTS = {"name": 3.0, "barcode": 3.0, "supplier": 1.5, "type": 1.0}
+
+# ✅ ระดับความตรงของคำค้น 1 คำกับข้อความ 1 ฟิลด์
+EXACT, PREFIX, WORD_PREFIX, INFIX, FUZZY = 1.0, 0.9, 0.8, 0.7, 0.6
+
+_SILENT = {chr(c) for c in range(0x0E47, 0x0E4F)} | {"\u200b", "\u200c", "\u200d", "\ufeff"}
+
+_task = None
+_last = None
+
+
+# ===============================
+# ✂️ ตัดข้อความเป็น gram
+# ===============================
+def _fold(text: str):
+    """
+    คืน (ข้อความที่ normalize แล้ว, ตำแหน่งในข้อความเดิมของแต่ละตัว)
+    ตัวคั่นคำ (ช่องว่าง / เครื่องหมาย) กลายเป็นช่องว่างตัวเดียว
+    """
+    out, where = [], []
+    for i, ch in enumerate(unicodedata.normalize("NFC", text or "")):
+        if ch in _SILENT:
+            continue
+        if not (ch.isalnum() or unicodedata.category(ch).startswith("M")):
+            if out and out[-1] != " ":
+                out.append(" ")
+                where.append(i)
+            continue
+        for folded in ch.casefold():
+            out.append(folded)
+            where.append(i)
+    while out and out[-1] == " ":
+        out.pop()
+        where.pop()
+    return "".join(out), where
+
+
+def _words(folded: str):
+    """[(ตำแหน่งเริ่ม, คำ)] ในข้อความที่ fold แล้ว"""
+    return [(m.start(), m.group()) for m in re.finditer(r"[^ ]+", folded)]
+
+
+def _word_grams(word: str):
+    return {"^" + word[0], *(word[i:i + 2] for i in range(len(word) - 1))}
+
+
+def _type_text(value):
+    """type เก็บเป็นชื่อประเภท (หน้าเพิ่มสินค้า) / dict ที่มี name / ObjectId (ไม่มีชื่อให้ค้น)"""
+    if isinstance(value, dict):
+        return value.get("name") or ""
+    if not value or isinstance(value, ObjectId) or ObjectId.is_valid(str(value)):
+        return ""
+    return str(value)
+
+
+def _field_text(doc: dict, field: str) -> str:
+    if field == "type":
+        return _type_text(doc.get("type"))
+    value = doc.get(field)
+    return str(value) if value is not None else ""
+
+
+def document(doc: dict) -> dict:
+    """ค่า goods.search ของเอกสารสินค้า (เรียกก่อน insert / ตอน reindex)"""
+    grams = set()
+    for field in ("name", "type", "supplier"):
+        for _, word in _words(_fold(_field_text(doc, field))[0]):
+            grams |= _word_grams(word)
+    return {"v": VERSION, "grams": sorted(grams)}
+
+
+def _query_grams(terms):
+    """gram ของคำค้น: คำยาว 1 ตัว -> ต้องเป็นตัวแรกของคำ นอกนั้นเฉพาะคู่ตัวอักษร (ตรงกลางคำก็เจอ)"""
+    grams = set()
+    for word in terms:
+        grams |= {"^" + word} if len(word) == 1 else {word[i:i + 2] for i in range(len(word) - 1)}
+    return sorted(grams)
+
+
+# ===============================
+# 🏅 ให้คะแนน + highlight
+# ===============================
+def _match(term: str, folded: str, words):
+    """
+    ความตรงของคำค้น 1 คำกับข้อความ 1 ฟิลด์ คืน (คะแนน, [(เริ่ม, จบ) ในข้อความที่ fold])
+    """
+    if not folded:
+        return 0.0, []
+    at = folded.find(term)
+    if at >= 0:
+        spans = [(at, at + len(term))]
+        if folded == term:
+            return EXACT, spans
+        if at == 0:
+            return PREFIX, spans
+        for start, word in words:
+            if word.startswith(term):
+                return WORD_PREFIX, [(start, start + len(term))]
+        return INFIX, spans
+    if len(term) < 2:
+        return 0.0, []
+    wanted = {term[i:i + 2] for i in range(len(term) - 1)}
+    spans, found = [], set()
+    for i in range(len(folded) - 1):
+        gram = folded[i:i + 2]
+        if gram in wanted:
+            found.add(gram)
+            spans.append((i, i + 2))
+    ratio = len(found) / len(wanted)
+    if ratio < MIN_MATCH:
+        return 0.0, []
+    return FUZZY * ratio, spans
+
+
+def _merge(spans):
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _to_original(spans, where, original: str):
+    """ตำแหน่งในข้อความที่ fold -> ในข้อความเดิม (รวมวรรณยุกต์ / สระบนล่างที่ตามมาด้วย)"""
+    out = []
+    for start, end in _merge(spans):
+        a, b = where[start], where[end - 1] + 1
+        while b < len(original) and (original[b] in _SILENT or unicodedata.category(original[b]).startswith("M")):
+            b += 1
+        if out and a <= out[-1][1]:
+            out[-1][1] = max(out[-1][1], b)
+        else:
+            out.append([a, b])
+    return out
+
+
+def rank(doc: dict, terms) -> tuple:
+    """คะแนนรวมของสินค้ากับคำค้น (ทุกคำต้องเจอในฟิลด์ใดฟิลด์หนึ่ง) และ highlight ต่อฟิลด์"""
+    total, highlight = 0.0, {}
+    fields = {}
+    for field in FIELDS:
+        original = unicodedata.normalize("NFC", _field_text(doc, field))
+        folded, where = _fold(original)
+        fields[field] = (original, folded, where, _words(folded))
+
+    for term in terms:
+        best, best_field, best_spans = 0.0, None, []
+        for field, (original, folded, where, words) in fields.items():
+            score, spans = _match(term, folded, words)
+            score *= WEIGHTS[field]
+            if score > best:
+                best, best_field, best_spans = score, field, spans
+        if best_field is None:
+            return 0.0, {}
+        total += best
+        original, _, where, _ = fields[best_field]
+        highlight.setdefault(best_field, []).extend(_to_original(best_spans, where, original))
+
+    for field, spans in highlight.items():
+        highlight[field] = [list(s) for s in _merge(spans)]
+    return total / len(terms), highlight
+
+
+# ===============================
+# 🔍 ค้นหา
+# ===============================
+async def search(q: str, limit: int = 20, projection: dict = None) -> list:
+    """
+    สินค้าที่ตรงกับ q เรียงตามคะแนน คืน [(doc, score, highlight)] ไม่เกิน limit
+    projection: ฟิลด์ที่ไม่ต้องการ (เช่น {"imageBase64": 0}) ฟิลด์ที่ใช้ให้คะแนนดึงเสมอ
+    """
+    folded, _ = _fold(q)
+    terms = [word for _, word in _words(folded)]
+    if not terms:
+        return []
+    grams = _query_grams(terms)
+    need = max(1, math.ceil(len(grams) * MIN_MATCH))
+
+    hidden = {k: 0 for k, v in (projection or {}).items() if not v and k not in FIELDS}
+    hidden["search"] = 0
+    unset = [*hidden, "_hits", "_len"]
+    found = {}
+
+    async def collect(query):
+        cursor = db.goods.find(query, hidden).limit(CANDIDATES)
+        for doc in await cursor.to_list(length=CANDIDATES):
+            found.setdefault(doc["_id"], doc)
+
+    # ✅ 1) ขึ้นต้นด้วยคำค้น: barcode / ชื่อ (regex ยึดต้น ใช้ index barcode / name ได้)
+    raw = q.strip()
+    if " " not in raw:
+        await collect({"barcode": {"$regex": "^" + re.escape(raw)}})
+    await collect({"name": {"$regex": "^" + re.escape(raw)}})
+    # ✅ 2) มี gram ของคำค้นครบทุกตัว (ตรงทั้งคำ ไม่สนวรรณยุกต์ / ตัวพิมพ์) หยุดเมื่อครบ CANDIDATES
+    await collect({"search.grams": {"$all": grams}})
+
+    # ✅ 3) ยังได้ไม่พอ -> คล้าย (พิมพ์ผิด): นับ gram ที่ตรงบน server เรียงมาก -> น้อย (ชื่อสั้นก่อนเมื่อเท่ากัน)
+    #    คำค้นสั้น (gram ไม่ถึง 3) ข้าม: ตรงแค่ gram เดียวก็ผ่าน = เกือบทั้งร้าน
+    if len(found) < limit and len(grams) >= 3:
+        pipeline = [
+            {"$match": {"search.grams": {"$in": grams}}},
+            {"$addFields": {
+                "_hits": {"$size": {"$setIntersection": ["$search.grams", grams]}},
+                "_len": {"$strLenCP": {"$ifNull": ["$name", ""]}},
+            }},
+            {"$match": {"_hits": {"$gte": need}}},
+            {"$sort": {"_hits": -1, "_len": 1, "_id": 1}},
+            {"$limit": CANDIDATES},
+            {"$unset": unset},
+        ]
+        async for doc in db.goods.aggregate(pipeline):
+            found.setdefault(doc["_id"], doc)
+
+    results = []
+    for doc in found.values():
+        score, highlight = rank(doc, terms)
+        if score > 0:
+            results.append((doc, round(score, 4), highlight))
+    results.sort(key=lambda r: (-r[1], len(str(r[0].get("name") or "")), str(r[0]["_id"])))
+    return results[:limit]
+
+
+# ===============================
+# 🔁 ทำ index ของสินค้าที่ยังไม่มี / รุ่นเก่า
+# ===============================
+def _stale():
+    return {"search.v": {"$ne": VERSION}}
+
+
+async def reindex(batch: int = None, full: bool = False) -> dict:
+    """
+    ทำ goods.search ทีละ batch รายการ (เรียกซ้ำจนกว่า remaining = 0)
+    full=True ทำใหม่ทุกตัว (เช่น แก้ชื่อสินค้าตรงใน DB) โดยไล่ตาม _id ไม่วนซ้ำตัวเดิม
+    """
+    batch = batch or REINDEX_BATCH
+    query, after, updated = ({} if full else _stale()), None, 0
+    while True:
+        page = dict(query)
+        if after is not None:
+            page["_id"] = {"$gt": after}
+        cursor = db.goods.find(page, {"name": 1, "type": 1, "supplier": 1}).sort("_id", 1).limit(batch)
+        docs = await cursor.to_list(length=batch)
+        if docs:
+            await db.goods.bulk_write(
+                [UpdateOne({"_id": d["_id"]}, {"$set": {"search": document(d)}}) for d in docs], ordered=False
+            )
+            updated += len(docs)
+            after = docs[-1]["_id"]
+        if not full or len(docs) < batch:
+            break
+    remaining = await db.goods.count_documents(_stale())
+    return {"updated": updated, "remaining": remaining}
+
+
+async def _backfill_loop():
+    global _last
+    try:
+        while True:
+            _last = await reindex()
+            if _last["remaining"] == 0 or _last["updated"] == 0:
+                break
+            await asyncio.sleep(0)
+        if _last["updated"]:
+            print(f"🔎 ทำ index ค้นหาสินค้า {_last['updated']} รายการ")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"⚠️ ทำ index ค้นหาสินค้าไม่สำเร็จ: {e}")
+
+
+def start():
+    """ไล่ทำ index ของสินค้าที่ยังไม่มีเบื้องหลัง (ค้นหาได้ทันที ตัวที่ยังไม่ถึงคิวค้นเจอด้วย barcode เท่านั้น)"""
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_backfill_loop())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+def status():
+    return {"version": VERSION, "running": _task is not None and not _task.done(), "last": _last}
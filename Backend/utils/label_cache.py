@@ -0,0 +1,150 @@
+import hashlib
+import io
+import json
+import os
+import re
+import zlib
+from collections import OrderedDict
+
+from utils import print_assets, render_pool
+from utils.receipt_layout import Raster, to_image
+from utils.receipt_render import RECEIPT_W, render_goods_label
+
+# ===============================
+# 🏷️ Cache ภาพ Label สำเร็จรูป (content-addressed)
+# ===============================
+# Label ขึ้นกับ barcode / ชื่อประเภท / ชื่อสินค้า / ราคา (และฟอนต์ / ความกว้างเครื่องพิมพ์) เท่านั้น
+# key = sha1 ของค่าพวกนี้ -> พิมพ์ซ้ำไม่ต้องสร้าง QR / resize / วาดตัวอักษรใหม่
+# - ชั้นแรก: memory (LRU ไม่เกิน LABEL_CACHE_SIZE ใบ)
+# - ชั้นสอง (ไม่บังคับ): ไฟล์ใน LABEL_CACHE_DIR อยู่รอดข้ามการรีสตาร์ต
+# ข้อมูลสินค้าเปลี่ยน key ก็เปลี่ยนเอง invalidate(barcode) มีไว้คืนพื้นที่ของใบเก่า
+
+CACHE_SIZE = int(os.getenv("LABEL_CACHE_SIZE", "256"))
+CACHE_DIR = os.getenv("LABEL_CACHE_DIR", "")
+
+_memory = OrderedDict()     # key -> (barcode, Raster)
+_keys_by_barcode = {}       # barcode -> {key}
+_stats = {"hits": 0, "disk_hits": 0, "misses": 0, "invalidated": 0}
+
+
+def _safe(barcode):
+    return re.sub(r"[^0-9A-Za-z_.-]", "", str(barcode))[:64] or "-"
+
+
+def label_key(item: dict, type_name: str = "", width: int = RECEIPT_W) -> str:
+    fields = [
+        str(item.get("barcode", "")),
+        type_name or "",
+        item.get("name", "") or "",
+        float(item.get("price", 0) or 0),
+        print_assets.font_path(),
+    ]
+    if width != RECEIPT_W:
+        # ✅ เครื่องกว้างเริ่มต้นใช้ key เดิม (ไฟล์บนดิสก์ที่มีอยู่ยังใช้ได้)
+        fields.append(int(width))
+    return hashlib.sha1(json.dumps(fields, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+# ===== memory =====
+def _remember(barcode, key, raster):
+    _memory[key] = (barcode, raster)
+    _memory.move_to_end(key)
+    _keys_by_barcode.setdefault(barcode, set()).add(key)
+    while len(_memory) > CACHE_SIZE:
+        old_key, (old_barcode, _) = _memory.popitem(last=False)
+        keys = _keys_by_barcode.get(old_barcode)
+        if keys is not None:
+            keys.discard(old_key)
+            if not keys:
+                del _keys_by_barcode[old_barcode]
+
+
+# ===== disk =====
+def _disk_path(barcode, key):
+    return os.path.join(CACHE_DIR, f"{_safe(barcode)}_{key}.bin")
+
+
+def _read_disk(barcode, key):
+    try:
+        with open(_disk_path(barcode, key), "rb") as f:
+            blob = f.read()
+    except FileNotFoundError:
+        return None
+    width, height = int.from_bytes(blob[:2], "little"), int.from_bytes(blob[2:4], "little")
+    return Raster(width, height, zlib.decompress(blob[4:]))
+
+
+def _write_disk(barcode, key, raster):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _disk_path(barcode, key)
+    blob = raster.width.to_bytes(2, "little") + raster.height.to_bytes(2, "little") + zlib.compress(raster.data)
+    with open(path + ".tmp", "wb") as f:
+        f.write(blob)
+    os.replace(path + ".tmp", path)
+
+
+def _remove_disk(barcode):
+    prefix = f"{_safe(barcode)}_"
+    try:
+        names = os.listdir(CACHE_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.startswith(prefix):
+            os.remove(os.path.join(CACHE_DIR, name))
+
+
+# ===== API =====
+async def get_label(item: dict, type_name: str = "", width: int = RECEIPT_W) -> Raster:
+    """คืนภาพ Label กว้าง width (dot) จาก cache ถ้าไม่มีจึงวาดใน render_pool แล้วเก็บไว้"""
+    barcode = str(item.get("barcode", ""))
+    key = label_key(item, type_name, width)
+
+    entry = _memory.get(key)
+    if entry is not None:
+        _memory.move_to_end(key)
+        _stats["hits"] += 1
+        return entry[1]
+
+    if CACHE_DIR:
+        raster = await render_pool.run_io(_read_disk, barcode, key)
+        if raster is not None:
+            _stats["disk_hits"] += 1
+            _remember(barcode, key, raster)
+            return raster
+
+    _stats["misses"] += 1
+    raster = await render_pool.run_cpu(render_goods_label, item, type_name, width)
+    _remember(barcode, key, raster)
+    if CACHE_DIR:
+        try:
+            await render_pool.run_io(_write_disk, barcode, key, raster)
+        except OSError as e:
+            print(f"⚠️ เก็บ Label ลงดิสก์ไม่สำเร็จ: {e}")
+    return raster
+
+
+async def invalidate(barcode: str):
+    """ลบ Label ของสินค้านี้ทุกเวอร์ชัน (เรียกเมื่อแก้ไข / เติมสต็อกสินค้า)"""
+    barcode = str(barcode)
+    for key in _keys_by_barcode.pop(barcode, set()):
+        _memory.pop(key, None)
+    if CACHE_DIR:
+        await render_pool.run_io(_remove_disk, barcode)
+    _stats["invalidated"] += 1
+
+
+def _png(raster):
+    buf = io.BytesIO()
+    to_image(raster).save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+async def get_label_png(item: dict, type_name: str = "", width: int = RECEIPT_W):
+    """คืน (png bytes, key) สำหรับแสดงตัวอย่าง Label ในแอป"""
+    raster = await get_label(item, type_name, width)
+    return await render_pool.run_io(_png, raster), label_key(item, type_name, width)
+
+
+def stats():
+    return {**_stats, "size": len(_memory), "max_size": CACHE_SIZE, "disk_dir": CACHE_DIR or None}
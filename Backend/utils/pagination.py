@@ -0,0 +1,81 @@
+import base64
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# ===============================
+# 📄 แบ่งหน้าแบบ keyset (cursor) + เลือกฟิลด์
+# ===============================
+# หน้าถัดไปต่อจาก (ค่าของฟิลด์ที่เรียง, _id) ของรายการสุดท้าย ไม่ใช้ skip -> หน้าลึกแค่ไหนก็เร็วเท่าหน้าแรก
+# (ต้องมี index (ฟิลด์, _id) ดู db_indexes) และไม่มีรายการซ้ำ / หายเมื่อมีการเพิ่มข้อมูลระหว่างเลื่อนหน้า
+# token ที่ส่งให้ client = base64 ของ {"s": ฟิลด์, "d": ทิศ, "v": ค่า, "id": _id} (client ไม่ต้องรู้ข้างใน)
+# ส่ง token หน้าถัดไปใน header X-Next-Cursor (body ยังเป็น list เหมือนเดิม หน้าเว็บเดิมใช้ได้ทันที)
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort: str, direction: int, value, last_id) -> str:
+    if sort == "_id":
+        value = None            # ✅ ค่าที่เรียงคือ _id อยู่แล้ว
+    raw = json.dumps({"s": sort, "d": direction, "v": value, "id": str(last_id)}, ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, sort: str, direction: int):
+    """คืน (ค่า, ObjectId) ของรายการสุดท้ายหน้าก่อน ValueError ถ้า token เสีย / ไม่ตรงกับการเรียงที่ขอ"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        last_id = ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError("cursor ไม่ถูกต้อง")
+    if data.get("s") != sort or data.get("d") != direction:
+        raise ValueError("cursor ไม่ตรงกับการเรียงที่ขอ (sort / order)")
+    return data.get("v"), last_id
+
+
+def after(sort: str, direction: int, value, last_id) -> dict:
+    """
+    เงื่อนไข "อยู่หลังรายการ (value, last_id)" ตามลำดับ [(sort, direction), ("_id", direction)]
+    Mongo เรียง null / ไม่มีฟิลด์ไว้ก่อนสุดเมื่อเรียงน้อยไปมาก ($gt / $lt เทียบ null ไม่ได้ -> แยกกรณี)
+    """
+    if sort == "_id":
+        return {"_id": {"$gt" if direction > 0 else "$lt": last_id}}
+    op = "$gt" if direction > 0 else "$lt"
+    same = {sort: value, "_id": {op: last_id}}
+    if value is None:
+        return {"$or": [same, {sort: {"$ne": None}}]} if direction > 0 else same
+    branches = [{sort: {op: value}}, same]
+    if direction < 0:
+        branches.append({sort: None})
+    return {"$or": branches}
+
+
+def sort_spec(sort: str, direction: int) -> list:
+    return [("_id", direction)] if sort == "_id" else [(sort, direction), ("_id", direction)]
+
+
+def projection(fields: str, allowed, lean: dict, always=(), hidden=()) -> dict:
+    """
+    fields=None -> ค่าเริ่มต้นแบบเบา (lean) / "all" -> ทุกฟิลด์ยกเว้น hidden / "a,b,c" -> เฉพาะที่ขอ (+ always)
+    hidden = ฟิลด์ภายในที่ไม่ส่งให้ client เลย (เช่น search ของ goods_search)
+    ฟิลด์ที่ไม่รู้จัก -> ValueError
+    """
+    if not fields:
+        return dict(lean) or None
+    if fields == "all":
+        return {f: 0 for f in hidden} or None
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in allowed]
+    if unknown:
+        raise ValueError(f"ไม่รู้จักฟิลด์: {', '.join(unknown)}")
+    return {f: 1 for f in (*wanted, *always)}
+
+
+def query_with_cursor(query: dict, cursor_filter: dict) -> dict:
+    if not cursor_filter:
+        return query
+    if not query:
+        return cursor_filter
+    return {"$and": [query, cursor_filter]}
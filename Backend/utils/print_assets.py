@@ -0,0 +1,113 @@
+import os
+from functools import lru_cache
+from PIL import Image, ImageFont
+
+# ===============================
+# 🗂️ ฟอนต์ / รูป / ข้อมูลร้าน ที่ใช้ร่วมกันทุกตัววาด
+# ===============================
+# โหลดครั้งเดียวต่อ process แล้วเก็บไว้ใน cache (process pool แต่ละตัวมี cache ของตัวเอง
+# และถูก warm() ตอนสร้าง ดู utils/render_pool.py)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FONT_CANDIDATES = [
+    os.path.join(BASE_DIR, "utils", "THSarabunNew.ttf"),
+    os.path.join(BASE_DIR, "utils", "THSarabunNew Bold.ttf"),
+    "/System/Library/Fonts/Supplemental/TH Sarabun New Bold.ttf",
+    "C:/Windows/Fonts/THSarabunNew.ttf",
+    "/usr/share/fonts/truetype/thai/THSarabunNew.ttf",
+]
+FONT_CACHE_SIZE = int(os.getenv("FONT_CACHE_SIZE", "32"))
+
+LOGO_PATH = os.path.join(BASE_DIR, "assets", "logo.png")
+EMOJI_PATH = os.path.join(BASE_DIR, "assets", "thankyou.png")
+
+# ✅ ข้อมูลร้านที่พิมพ์บนหัวใบเสร็จ
+SHOP_NAME = os.getenv("SHOP_NAME", "ถูกใจการค้า")
+SHOP_ADDRESS = os.getenv("SHOP_ADDRESS", "526 ม.11 ต.บางตาเถร อ.สองพี่น้อง จ.สุพรรณบุรี")
+
+# ✅ ขนาดที่ตัววาดใช้อยู่ (warm ไว้ล่วงหน้า)
+RECEIPT_FONT_SIZES = (60, 42, 34)
+LABEL_FONT_SIZES = (48, 36, 56)
+LOGO_MAX_W = 576 - 48
+EMOJI_SIZE = 48
+
+
+@lru_cache(maxsize=1)
+def font_path() -> str:
+    for p in FONT_CANDIDATES:
+        if os.path.exists(p):
+            return p
+    raise RuntimeError("ไม่พบฟอนต์ภาษาไทย")
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _font(path, size):
+    return ImageFont.truetype(path, size)
+
+
+def font(size: int):
+    """FreeType face ของฟอนต์ไทยขนาด size (ใช้ซ้ำได้ ห้ามแก้ไข)"""
+    return _font(font_path(), size)
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+@lru_cache(maxsize=8)
+def _scaled_image(path, mtime, max_w, size):
+    if mtime is None:
+        return None
+    img = Image.open(path).convert("RGBA")
+    if size:
+        return img.resize(size)
+    ratio = min(1.0, (max_w / img.width))
+    return img.resize((int(img.width * ratio), int(img.height * ratio)))
+
+
+def logo(max_w: int = LOGO_MAX_W):
+    """โลโก้ร้าน (RGBA) ย่อให้กว้างไม่เกิน max_w — None ถ้าไม่มีไฟล์"""
+    return _scaled_image(LOGO_PATH, _mtime(LOGO_PATH), max_w, None)
+
+
+def emoji(size: int = EMOJI_SIZE):
+    """รูปไหว้ขอบคุณท้ายใบเสร็จ (RGBA) — None ถ้าไม่มีไฟล์"""
+    return _scaled_image(EMOJI_PATH, _mtime(EMOJI_PATH), None, (size, size))
+
+
+def asset_key() -> tuple:
+    """ค่าที่เปลี่ยนเมื่อฟอนต์ / รูป / ข้อมูลร้านเปลี่ยน (ใช้เป็น key ของ cache ที่วาดจาก asset เหล่านี้)"""
+    return (font_path(), _mtime(LOGO_PATH), _mtime(EMOJI_PATH), SHOP_NAME, SHOP_ADDRESS)
+
+
+def warm():
+    """โหลดทุกอย่างเข้า cache ล่วงหน้า (เรียกตอนแอปเริ่ม และตอนสร้าง process ใน pool)"""
+    try:
+        for size in RECEIPT_FONT_SIZES + LABEL_FONT_SIZES:
+            font(size)
+        logo()
+        emoji()
+    except Exception as e:
+        print(f"⚠️ โหลดฟอนต์/รูปสำหรับพิมพ์ไม่สำเร็จ: {e}")
+
+
+def lru_stats(fn):
+    """สถิติของฟังก์ชันที่ห่อด้วย lru_cache (ใช้รายงาน cache ของตัววาดอื่น ๆ ด้วย)"""
+    info = fn.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hit_rate": round(info.hits / lookups, 4) if lookups else None,
+    }
+
+
+def stats() -> dict:
+    """สถิติ cache ของ process นี้"""
+    return {"pid": os.getpid(), "fonts": lru_stats(_font), "images": lru_stats(_scaled_image)}
@@ -0,0 +1,315 @@
+import io
+from collections import namedtuple
+from functools import lru_cache
+
+from PIL import Image
+
+from utils import print_assets
+from utils.escpos_raster import (
+    ALIGN_CENTER, ALIGN_LEFT, CMD_GS_V0, ESC_INIT, FEED_CUT, FEED_LINES,
+    STORED_GRAPHIC_KEYS, encode_raster, feed_dots, nv_print,
+)
+from utils.receipt_layout import THAI_MARKS, Layout, Raster, clusters, flatten, threshold_lut, to_image, to_raster
+
+# ===============================
+# 📄 เอกสารพิมพ์ (ใบเสร็จ / Label) แยกจากวิธีพิมพ์
+# ===============================
+# สร้างเอกสารครั้งเดียวเป็น block (ข้อความ / 2 คอลัมน์ / รูป / เส้นคั่น / ตัดกระดาษ)
+# แล้วเลือก backend ตามความสามารถของเครื่องพิมพ์
+# - "raster":  วาดทั้งใบเป็นภาพ 1-bit (เครื่องพิมพ์ทุกรุ่นพิมพ์ได้ ตัวอักษรสวยที่สุด)
+# - "text":    ข้อความส่งเป็นตัวอักษร code page ไทย (TIS-620 / CP874) ส่งภาพเฉพาะรูปจริง ๆ
+#              หรือบรรทัดที่มีตัวอักษรนอก code page (เช่น emoji) -> byte น้อยกว่า raster หลายสิบเท่า
+# - "preview": ภาพ PNG ของ raster สำหรับแสดงในแอป
+#
+#     doc = Document()
+#     doc.center("ถูกใจการค้า", 60, gap=6)
+#     doc.row("สินค้า x2", "120.00", 42, advance=36)
+#     data = encode(doc, choose_backend(caps), caps=caps)
+
+BACKEND_RASTER = "raster"
+BACKEND_TEXT = "text"
+BACKEND_PREVIEW = "preview"
+
+# ขนาดฟอนต์ (px) เป็นตัวกำหนดขนาดตัวอักษรใน text mode: GS ! (ขยายกว้าง/สูง)
+TEXT_DOUBLE_BOTH_SIZE = 56
+TEXT_DOUBLE_HEIGHT_SIZE = 48
+TEXT_DOT_WIDTH = 12          # Font A กว้าง 12 dot -> 576 dot = 48 ตัวอักษร
+
+Text = namedtuple("Text", ["text", "size", "align", "advance", "gap"])
+Row = namedtuple("Row", ["left", "right", "size", "advance"])
+Separator = namedtuple("Separator", ["size", "advance"])
+Space = namedtuple("Space", ["height"])
+Picture = namedtuple("Picture", ["image", "name", "advance"])      # name = รูปที่เก็บในเครื่องพิมพ์ได้
+Group = namedtuple("Group", ["key", "blocks"])                      # block ที่ไม่เปลี่ยน วาดครั้งเดียวแล้วใช้ซ้ำ
+Cut = namedtuple("Cut", [])
+
+
+class Document:
+    def __init__(self, width: int = 576, margin: int = 40, threshold: int = 160):
+        self.width = width
+        self.margin = margin
+        self.threshold = threshold
+        self.blocks = []
+
+    def text(self, text: str, size: int, advance: int, gap: int = 0):
+        self.blocks.append(Text(text, size, "left", advance, gap))
+        return self
+
+    def center(self, text: str, size: int, gap: int = 0, advance: int = None):
+        self.blocks.append(Text(text, size, "center", advance, gap))
+        return self
+
+    def row(self, left: str, right: str, size: int, advance: int):
+        self.blocks.append(Row(left, right, size, advance))
+        return self
+
+    def separator(self, size: int, advance: int = 40):
+        self.blocks.append(Separator(size, advance))
+        return self
+
+    def space(self, height: int):
+        self.blocks.append(Space(height))
+        return self
+
+    def picture(self, image: Image.Image, name: str = None, advance: int = None):
+        if image is not None:
+            self.blocks.append(Picture(image, name, advance))
+        return self
+
+    def group(self, key, doc: "Document"):
+        """ใส่เอกสารย่อยที่ไม่เปลี่ยนระหว่างใบ (key ต้องเปลี่ยนเมื่อเนื้อหาเปลี่ยน เช่น asset_key())"""
+        self.blocks.append(Group(key, tuple(doc.blocks)))
+        return self
+
+    def cut(self):
+        self.blocks.append(Cut())
+        return self
+
+
+def _expand(blocks):
+    for block in blocks:
+        if isinstance(block, Group):
+            yield from _expand(block.blocks)
+        else:
+            yield block
+
+
+# ===============================
+# 🖼️ raster backend
+# ===============================
+def layout_block(lay, block, threshold):
+    if isinstance(block, Text):
+        font = print_assets.font(block.size)
+        if block.align == "center":
+            lay.center(block.text, font, gap=block.gap, advance=block.advance)
+        else:
+            lay.text(block.text, font, block.advance).space(block.gap)
+    elif isinstance(block, Row):
+        lay.row(block.left, block.right, print_assets.font(block.size), block.advance)
+    elif isinstance(block, Separator):
+        lay.separator(print_assets.font(block.size), block.advance)
+    elif isinstance(block, Space):
+        lay.space(block.height)
+    elif isinstance(block, Picture):
+        lay.bitmap(block.image, advance=block.advance)
+    elif isinstance(block, Group):
+        lay.bitmap(group_image(block, lay.width, lay.margin, threshold))
+
+
+@lru_cache(maxsize=8)
+def group_image(group, width, margin, threshold):
+    """ภาพ 1-bit ของ Group (cache ตาม key ของ Group + ความกว้าง) ใช้เป็น tile หัว/ท้ายใบเสร็จได้"""
+    lay = Layout(width, margin)
+    for block in group.blocks:
+        layout_block(lay, block, threshold)
+    return lay.render(threshold)
+
+
+def render_parts(doc: Document, stored=()) -> list:
+    """
+    วาดเอกสารเป็นส่วน ๆ ตามลำดับพิมพ์: Raster, ชื่อรูปที่อยู่ในเครื่องพิมพ์ (str)
+    หรือคำสั่งสำเร็จรูป (bytes: เลื่อนกระดาษ / ตัดกระดาษ)
+    stored = ชื่อรูปที่เครื่องพิมพ์มีแล้ว ถ้าว่างและไม่มี Cut จะได้ Raster เดียว
+    """
+    parts = []
+    lay = Layout(doc.width, doc.margin)
+
+    def flush():
+        if not lay.blank:
+            parts.append(to_raster(lay.render(doc.threshold)))
+        elif lay.height:
+            parts.append(feed_dots(lay.height))
+        return Layout(doc.width, doc.margin)
+
+    for block in doc.blocks:
+        if isinstance(block, Picture) and block.name in stored:
+            lay = flush()
+            parts.append(block.name)
+            height = block.image.height
+            lay.space((height if block.advance is None else block.advance) - height)
+        elif isinstance(block, Cut):
+            lay = flush()
+            parts.append(FEED_CUT)
+        else:
+            layout_block(lay, block, doc.threshold)
+    flush()
+    return parts
+
+
+def _join(parts, command=CMD_GS_V0, cut=True):
+    out = [ESC_INIT]
+    for part in parts:
+        if isinstance(part, Raster):
+            out.append(encode_raster(part, command))
+        elif isinstance(part, str):
+            out.append(nv_print(STORED_GRAPHIC_KEYS[part]))
+        else:
+            out.append(part)
+    if cut and not (parts and parts[-1] == FEED_CUT):
+        out.append(FEED_CUT)
+    return b"".join(out)
+
+
+def encode_raster_doc(doc: Document, stored=(), command: str = CMD_GS_V0, cut: bool = True) -> bytes:
+    return _join(render_parts(doc, stored), command, cut)
+
+
+# ===============================
+# 🔤 text backend (code page ไทย)
+# ===============================
+def _cols(text):
+    """จำนวนช่องตัวอักษรที่ใช้จริง: สระบน/ล่าง/วรรณยุกต์ซ้อนบนตัวหน้า ไม่กินช่อง"""
+    return sum(1 for ch in text if ch not in THAI_MARKS)
+
+
+def _wrap_cols(text, width):
+    if _cols(text) <= width:
+        return [text]
+    lines, line = [], ""
+    for word in text.split(" "):
+        candidate = f"{line} {word}" if line else word
+        if _cols(candidate) <= width:
+            line = candidate
+            continue
+        if line:
+            lines.append(line)
+            line = ""
+        for cluster in clusters(word):
+            if line and _cols(line + cluster) > width:
+                lines.append(line)
+                line = ""
+            line += cluster
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _size_mode(size):
+    if size >= TEXT_DOUBLE_BOTH_SIZE:
+        return 0x11
+    if size >= TEXT_DOUBLE_HEIGHT_SIZE:
+        return 0x01
+    return 0x00
+
+
+def _text_lines(block, columns, encoding):
+    """คืน (GS ! mode, bytes ของทุกบรรทัด) หรือ UnicodeEncodeError ถ้ามีตัวอักษรนอก code page"""
+    mode = _size_mode(block.size)
+    cols = columns // (2 if mode & 0x10 else 1)
+    if isinstance(block, Row):
+        right = block.right
+        lines = _wrap_cols(block.left, max(1, cols - _cols(right) - 1))
+        pad = cols - _cols(lines[0]) - _cols(right)
+        lines[0] = lines[0] + " " * max(1, pad) + right
+    elif isinstance(block, Separator):
+        lines = ["-" * cols]
+    else:
+        lines = _wrap_cols(block.text, cols)
+    return mode, "".join(line + "\n" for line in lines).encode(encoding)
+
+
+def _bitmap(doc, block):
+    """บรรทัดที่พิมพ์เป็นตัวอักษรไม่ได้: วาดเฉพาะบรรทัดนั้นเป็นภาพ"""
+    lay = Layout(doc.width, doc.margin)
+    layout_block(lay, block, doc.threshold)
+    return encode_raster(lay.render(doc.threshold))
+
+
+def _picture_bits(doc, block):
+    img = block.image
+    if img.mode != "1":
+        img = flatten(img).point(threshold_lut(doc.threshold), mode="1")
+    return ALIGN_CENTER + encode_raster(img) + ALIGN_LEFT
+
+
+def encode_text_doc(doc: Document, codepage: int, encoding: str = "cp874", stored=(), cut: bool = True,
+                    width: int = None) -> bytes:
+    """
+    codepage = ค่า n ของ ESC t n ที่เครื่องพิมพ์ใช้กับภาษาไทย (แต่ละยี่ห้อไม่เหมือนกัน)
+    width = ความกว้างหัวพิมพ์ (dot) ของเครื่อง ใช้คำนวณจำนวนตัวอักษรต่อบรรทัด
+    ขนาดตัวอักษรใช้ GS ! ตาม size ของ block ส่วน advance / gap ของ raster ไม่ใช้
+    """
+    columns = (width or doc.width) // TEXT_DOT_WIDTH
+    out = [ESC_INIT, b"\x1bt" + bytes([codepage])]
+    for block in _expand(doc.blocks):
+        if isinstance(block, (Text, Row, Separator)):
+            try:
+                mode, data = _text_lines(block, columns, encoding)
+            except UnicodeEncodeError:
+                out.append(_bitmap(doc, block))
+                continue
+            align = ALIGN_CENTER if isinstance(block, Text) and block.align == "center" else ALIGN_LEFT
+            out.append(align + b"\x1d!" + bytes([mode]) + data + b"\x1d!\x00" + ALIGN_LEFT)
+        elif isinstance(block, Space):
+            out.append(feed_dots(block.height))
+        elif isinstance(block, Picture):
+            if block.name in stored:
+                out.append(nv_print(STORED_GRAPHIC_KEYS[block.name]))
+            else:
+                out.append(_picture_bits(doc, block))
+        elif isinstance(block, Cut):
+            out.append(FEED_LINES + FEED_CUT)
+    if cut and not isinstance(doc.blocks[-1] if doc.blocks else None, Cut):
+        out.append(FEED_LINES + FEED_CUT)
+    return b"".join(out)
+
+
+# ===============================
+# 👀 preview backend
+# ===============================
+def render_png(doc: Document) -> bytes:
+    """ภาพทั้งเอกสารแบบ raster (PNG) ถ้ามี Cut จะเว้นช่องคั่นแต่ละส่วน"""
+    images = [to_image(p) for p in render_parts(doc) if isinstance(p, Raster)]
+    gap = 24
+    height = sum(img.height for img in images) + gap * max(0, len(images) - 1)
+    sheet = Image.new("1", (doc.width, max(1, height)), 1)
+    y = 0
+    for img in images:
+        sheet.paste(img, (0, y))
+        y += img.height + gap
+    buf = io.BytesIO()
+    sheet.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+# ===============================
+# 🎛️ เลือก backend
+# ===============================
+def choose_backend(caps: dict) -> str:
+    """backend ที่ส่ง byte น้อยที่สุดที่เครื่องพิมพ์รองรับ: text ถ้ามี code page ไทย ไม่งั้น raster"""
+    return BACKEND_TEXT if (caps or {}).get("thai_codepage") is not None else BACKEND_RASTER
+
+
+def encode(doc: Document, backend: str = None, caps: dict = None, stored=(), cut: bool = True) -> bytes:
+    """แปลงเอกสารเป็น byte สำหรับส่งเครื่องพิมพ์ (หรือ PNG ถ้า backend = preview)"""
+    caps = caps or {}
+    backend = backend or choose_backend(caps)
+    if backend == BACKEND_TEXT:
+        return encode_text_doc(doc, caps["thai_codepage"], caps.get("encoding", "cp874"), stored, cut, caps.get("width"))
+    if backend == BACKEND_PREVIEW:
+        return render_png(doc)
+    return encode_raster_doc(doc, stored, caps.get("raster_command", CMD_GS_V0), cut)
+
+
+def cache_info():
+    return print_assets.lru_stats(group_image)
@@ -0,0 +1,219 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from database import db
+from utils.printer_transport import PartialWriteError
+
+# ===============================
+# 🖨️ คิวงานพิมพ์ (Print Spooler)
+# ===============================
+# งานพิมพ์ทุกชิ้นถูกบันทึกลง collection "print_jobs" ก่อน แล้วให้ worker
+# เบื้องหลังทยอยพิมพ์ทีละงาน ใบเสร็จได้คิวก่อน Label เสมอ
+# ถ้าเซิร์ฟเวอร์ดับกลางคัน งานที่ค้างจะถูกหยิบมาพิมพ์ต่อตอนเปิดใหม่
+
+PRIORITY_RECEIPT = 0
+PRIORITY_LABEL = 10
+
+MAX_ATTEMPTS = int(os.getenv("PRINT_MAX_ATTEMPTS", "3"))
+RETRY_DELAY_SEC = float(os.getenv("PRINT_RETRY_DELAY", "5"))
+POLL_INTERVAL_SEC = float(os.getenv("PRINT_POLL_INTERVAL", "5"))
+DRAIN_TIMEOUT_SEC = float(os.getenv("PRINT_DRAIN_TIMEOUT", "30"))
+
+STATUS_QUEUED = "queued"
+STATUS_PRINTING = "printing"
+STATUS_DONE = "done"
+STATUS_SPOOLED = "spooled"      # เครื่องพิมพ์ออฟไลน์ งานถูกเก็บใน spool ของเครื่อง (utils/printer_health) ยังไม่ได้พิมพ์
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+jobs = db.print_jobs
+
+_handlers = {}
+_wakeup = None
+_worker_task = None
+_stopping = False
+
+
+def register_handler(kind: str, handler, priority: int = PRIORITY_LABEL):
+    """ผูกชนิดงาน (เช่น "receipt") กับฟังก์ชันพิมพ์แบบ async"""
+    _handlers[kind] = (handler, priority)
+
+
+async def enqueue(kind: str, payload: dict, ref: str = None, priority: int = None) -> str:
+    """บันทึกงานพิมพ์ลงคิว แล้วคืน job id ทันที (ไม่รอเครื่องพิมพ์)"""
+    if kind not in _handlers:
+        raise ValueError(f"ไม่รู้จักงานพิมพ์ชนิด '{kind}'")
+    if priority is None:
+        priority = _handlers[kind][1]
+
+    now = datetime.now()
+    job = {
+        "kind": kind,
+        "ref": ref,
+        "payload": payload,
+        "priority": priority,
+        "status": STATUS_QUEUED,
+        "attempts": 0,
+        "error": None,
+        "createdAt": now,
+        "updatedAt": now,
+        "notBefore": now,
+    }
+    result = await jobs.insert_one(job)
+    _notify()
+    return str(result.inserted_id)
+
+
+def _notify():
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+# ===============================
+# ⚙️ Worker
+# ===============================
+
+async def _claim_next():
+    now = datetime.now()
+    return await jobs.find_one_and_update(
+        {"status": STATUS_QUEUED, "notBefore": {"$lte": now}},
+        {"$set": {"status": STATUS_PRINTING, "updatedAt": now}, "$inc": {"attempts": 1}},
+        sort=[("priority", 1), ("_id", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _run_job(job):
+    entry = _handlers.get(job["kind"])
+    try:
+        if entry is None:
+            raise RuntimeError(f"ไม่มีตัวพิมพ์สำหรับงานชนิด '{job['kind']}'")
+        result = await entry[0](job["payload"])
+    except Exception as e:
+        now = datetime.now()
+        update = {"error": str(e), "updatedAt": now}
+        # ✅ เครื่องพิมพ์ได้รับไปแล้วบางส่วน: ลองใหม่เอง = พิมพ์ซ้ำ ให้คนดูกระดาษแล้วกด retry เอง
+        if entry is not None and job["attempts"] < MAX_ATTEMPTS and not isinstance(e, PartialWriteError):
+            update["status"] = STATUS_QUEUED
+            update["notBefore"] = now + timedelta(seconds=RETRY_DELAY_SEC * job["attempts"])
+        else:
+            update["status"] = STATUS_FAILED
+        await jobs.update_one({"_id": job["_id"]}, {"$set": update})
+        print(f"⚠️ งานพิมพ์ {job['_id']} ({job['kind']}) ล้มเหลว: {e}")
+        return
+
+    # ✅ เก็บผลลัพธ์ของตัวพิมพ์ไว้ดูทีหลัง (เช่น Label ที่ไม่พบสินค้า)
+    #    ตัวพิมพ์ตอบว่า spooled / partial (บางเครื่องออฟไลน์) -> ยังไม่ได้พิมพ์จริง ไม่ใช่ done
+    result = result if isinstance(result, dict) else None
+    spooled = result is not None and result.get("status") in ("spooled", "partial")
+    await jobs.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status": STATUS_SPOOLED if spooled else STATUS_DONE, "error": None,
+                  "updatedAt": datetime.now(), "result": result}},
+    )
+
+
+async def _worker():
+    while True:
+        _wakeup.clear()
+        try:
+            job = await _claim_next()
+        except Exception as e:
+            print(f"⚠️ อ่านคิวงานพิมพ์ไม่ได้: {e}")
+            job = None
+
+        if job is not None:
+            # ✅ Mongo ล้มตอนบันทึกผล (timeout / failover) ต้องไม่ทำให้ worker ตัวเดียวตาย
+            #    งานที่ค้าง printing จะถูกคืนเข้าคิวตอนเปิดใหม่ (start)
+            try:
+                await _run_job(job)
+            except Exception as e:
+                print(f"⚠️ บันทึกผลงานพิมพ์ {job['_id']} ({job['kind']}) ไม่สำเร็จ: {e}")
+            continue
+
+        # ✅ ตอนปิดระบบ: พิมพ์จนคิวว่างแล้วค่อยออก
+        if _stopping:
+            return
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=POLL_INTERVAL_SEC)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def start():
+    """เรียกตอนแอปเริ่ม (lifespan): กู้งานที่ค้างสถานะ printing แล้วเริ่ม worker"""
+    global _wakeup, _worker_task, _stopping
+    _stopping = False
+    _wakeup = asyncio.Event()
+    try:
+        await jobs.update_many(
+            {"status": STATUS_PRINTING},
+            {"$set": {"status": STATUS_QUEUED, "updatedAt": datetime.now()}},
+        )
+    except Exception as e:
+        print(f"⚠️ เตรียมคิวงานพิมพ์ไม่สำเร็จ: {e}")
+    _worker_task = asyncio.create_task(_worker())
+
+
+async def stop():
+    """เรียกตอนแอปปิด: รอให้คิวว่างภายใน DRAIN_TIMEOUT_SEC ที่เหลือเก็บไว้พิมพ์รอบหน้า"""
+    global _stopping, _worker_task
+    if _worker_task is None:
+        return
+    _stopping = True
+    _notify()
+    try:
+        await asyncio.wait_for(_worker_task, timeout=DRAIN_TIMEOUT_SEC)
+    except asyncio.TimeoutError:
+        print("⚠️ ปิดระบบก่อนพิมพ์คิวหมด งานที่เหลือจะพิมพ์ต่อเมื่อเปิดใหม่")
+    _worker_task = None
+
+
+# ===============================
+# 🔎 สถานะ / สั่งงานซ้ำ / ยกเลิก
+# ===============================
+
+def _public(job):
+    if not job:
+        return None
+    job = {k: v for k, v in job.items() if k != "payload"}
+    job["_id"] = str(job["_id"])
+    return job
+
+
+async def get_job(job_id: str):
+    return _public(await jobs.find_one({"_id": ObjectId(job_id)}))
+
+
+async def list_jobs(status: str = None, limit: int = 50):
+    query = {"status": status} if status else {}
+    cursor = jobs.find(query, {"payload": 0}).sort("_id", -1)
+    return [_public(j) for j in await cursor.to_list(length=limit)]
+
+
+async def retry_job(job_id: str):
+    """ส่งงานที่ล้มเหลว/ถูกยกเลิกกลับเข้าคิว"""
+    now = datetime.now()
+    job = await jobs.find_one_and_update(
+        {"_id": ObjectId(job_id), "status": {"$in": [STATUS_FAILED, STATUS_CANCELLED]}},
+        {"$set": {"status": STATUS_QUEUED, "attempts": 0, "error": None,
+                  "updatedAt": now, "notBefore": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if job:
+        _notify()
+    return _public(job)
+
+
+async def cancel_job(job_id: str):
+    """ยกเลิกงานที่ยังไม่ได้พิมพ์"""
+    job = await jobs.find_one_and_update(
+        {"_id": ObjectId(job_id), "status": {"$in": [STATUS_QUEUED, STATUS_FAILED]}},
+        {"$set": {"status": STATUS_CANCELLED, "updatedAt": datetime.now()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    return _public(job)
@@ -0,0 +1,259 @@
+import asyncio
+import os
+import re
+import time
+from datetime import datetime
+
+from utils import printer_transport, render_pool
+
+# ===============================
+# 🩺 สุขภาพเครื่องพิมพ์ (circuit breaker + spool บนดิสก์)
+# ===============================
+# - พิมพ์ไม่ผ่านติดกัน BREAKER_FAILURES ครั้ง -> breaker "open": ไม่ลองต่อเครื่องพิมพ์อีก (ไม่ต้องรอ timeout)
+# - ระหว่าง open: งานพิมพ์ถูกเก็บลง PRINT_SPOOL_DIR/<host>/ เป็นไฟล์ ESC/POS พร้อมส่ง
+#   ชื่อไฟล์ = <ลำดับเวลา>_<order id / barcode> เรียงตามลำดับที่สั่งพิมพ์
+# - มี task คอยเช็กเครื่องพิมพ์ทุก PROBE_INTERVAL_SEC พอกลับมาได้ก็ปิด breaker แล้วพิมพ์งานใน spool ตามลำดับ
+# - รายชื่อไฟล์ใน spool จำไว้ใน memory (อ่านโฟลเดอร์ครั้งเดียวตอนเริ่ม) spool_depth() ถูกเรียกทุกครั้งที่เลือกเครื่อง
+
+BREAKER_FAILURES = int(os.getenv("PRINTER_BREAKER_FAILURES", "2"))
+PROBE_INTERVAL_SEC = float(os.getenv("PRINTER_PROBE_INTERVAL", "10"))
+SPOOL_DIR = os.getenv("PRINT_SPOOL_DIR", "./print_spool")
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+
+# DLE EOT 1: ขอสถานะเครื่องพิมพ์ (ไม่พิมพ์อะไรออกมา) ใช้เป็นตัวเช็กว่าเครื่องกลับมาแล้ว
+STATUS_REQUEST = b"\x10\x04\x01"
+
+_printers = {}
+
+
+def _safe_ref(ref):
+    return re.sub(r"[^0-9A-Za-z_.-]", "", str(ref or "-"))[:64] or "-"
+
+
+class PrinterHealth:
+    def __init__(self, host: str, port: int = 9100):
+        self.host = host
+        self.port = port
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.last_error = None
+        self.opened_at = None
+        # ✅ พอร์ตอื่นที่ไม่ใช่ 9100 (print server หลายพอร์ต) แยก spool ตามพอร์ตด้วย
+        self.spool_dir = os.path.join(SPOOL_DIR, _safe_ref(host if port == 9100 else f"{host}_{port}"))
+        self._spooled = None       # ชื่อไฟล์ใน spool เรียงตามลำดับพิมพ์ (None = ยังไม่ได้อ่านโฟลเดอร์)
+        self._probe_task = None
+        self._replay_task = None
+        self._replay_lock = asyncio.Lock()
+
+    # ===== breaker =====
+    def _record_success(self):
+        self.failures = 0
+        self.last_error = None
+        if self.state != STATE_CLOSED:
+            print(f"✅ เครื่องพิมพ์ {self.host} กลับมาออนไลน์")
+        self.state = STATE_CLOSED
+        self.opened_at = None
+
+    def _record_failure(self, e):
+        self.failures += 1
+        self.last_error = str(e) or type(e).__name__
+        if self.state == STATE_CLOSED and self.failures >= BREAKER_FAILURES:
+            self.state = STATE_OPEN
+            self.opened_at = datetime.now()
+            print(f"⚠️ เครื่องพิมพ์ {self.host} ออฟไลน์ เก็บงานลง spool: {self.last_error}")
+        if self.state == STATE_OPEN and (self._probe_task is None or self._probe_task.done()):
+            self._probe_task = asyncio.create_task(self._probe())
+
+    # ===== spool =====
+    def _scan_spool(self):
+        try:
+            return sorted(f for f in os.listdir(self.spool_dir) if f.endswith(".bin"))
+        except FileNotFoundError:
+            return []
+
+    def _queue(self):
+        # ✅ อ่านโฟลเดอร์ครั้งแรกครั้งเดียว (งานค้างจากรอบก่อน) หลังจากนั้นอัปเดตตอน spool / พิมพ์งานค้างเสร็จ
+        if self._spooled is None:
+            self._spooled = self._scan_spool()
+        return self._spooled
+
+    def spooled_files(self):
+        return list(self._queue())
+
+    def spool_depth(self):
+        return len(self._queue())
+
+    def find_spooled(self, ref):
+        suffix = f"_{_safe_ref(ref)}.bin"
+        return [f for f in self.spooled_files() if f.endswith(suffix)]
+
+    def _write_spool(self, data, ref):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        name = f"{time.time_ns():020d}_{_safe_ref(ref)}.bin"
+        tmp = os.path.join(self.spool_dir, name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(self.spool_dir, name))
+        return name
+
+    def _read_spool(self, name):
+        with open(os.path.join(self.spool_dir, name), "rb") as f:
+            return f.read()
+
+    async def _spool(self, data, ref):
+        name = await render_pool.run_io(self._write_spool, data, ref)
+        self._queue().append(name)
+        print(f"🗂️ เก็บงานพิมพ์ {ref} ลง spool ({name})")
+        return "spooled"
+
+    def _drop_spooled(self, name):
+        try:
+            os.remove(os.path.join(self.spool_dir, name))
+        except FileNotFoundError:
+            pass
+        if name in self._queue():
+            self._queue().remove(name)
+
+    def kick_replay(self):
+        if self._replay_task is None or self._replay_task.done():
+            self._replay_task = asyncio.create_task(self.replay())
+
+    async def replay(self):
+        """พิมพ์งานที่ค้างใน spool ตามลำดับ หยุดทันทีถ้าเครื่องพิมพ์ล้มอีก"""
+        async with self._replay_lock:
+            while self.state == STATE_CLOSED:
+                files = self._queue()
+                if not files:
+                    return
+                name = files[0]
+                data = await render_pool.run_io(self._read_spool, name)
+                try:
+                    await printer_transport.send(self.host, data, port=self.port)
+                except printer_transport.PartialWriteError as e:
+                    # ✅ งานนี้พิมพ์ไปแล้วบางส่วน: เอาออกจาก spool (ส่งซ้ำ = กระดาษซ้ำ) แล้วหยุดรอเครื่อง
+                    self._record_failure(e)
+                    self._drop_spooled(name)
+                    print(f"⚠️ งานค้าง {name} พิมพ์ไม่ครบ ({e}) เอาออกจาก spool ไม่พิมพ์ซ้ำ")
+                    return
+                except Exception as e:
+                    self._record_failure(e)
+                    return
+                self._record_success()
+                self._drop_spooled(name)
+                print(f"🖨️ พิมพ์งานค้าง {name} แล้ว")
+
+    # ===== ส่งงาน =====
+    async def submit(self, data: bytes, ref=None) -> str:
+        """
+        ส่งงานพิมพ์ คืนค่า "printed" หรือ "spooled"
+        ถ้ายังมีงานค้างใน spool งานใหม่ต้องต่อคิวท้าย spool เพื่อให้พิมพ์ออกตามลำดับ
+        ล้มกลางงาน (PartialWriteError) -> ไม่ spool โยน error ต่อ
+        """
+        if self.state == STATE_OPEN:
+            return await self._spool(data, ref)
+        if self.spool_depth():
+            status = await self._spool(data, ref)
+            self.kick_replay()
+            return status
+
+        try:
+            await printer_transport.send(self.host, data, port=self.port)
+        except Exception as e:
+            self._record_failure(e)
+            # ✅ เครื่องพิมพ์ได้รับไปแล้วบางส่วน: ไม่เก็บลง spool (พิมพ์ซ้ำทั้งงาน) ส่ง error ให้คิวงานพิมพ์
+            if isinstance(e, printer_transport.PartialWriteError):
+                raise
+            status = await self._spool(data, ref)
+            # ✅ ยังไม่ถึงเกณฑ์ตัด breaker: ลองพิมพ์จาก spool อีกรอบ (ล้มอีกครั้งจะ open แล้วรอ probe)
+            if self.state == STATE_CLOSED:
+                self.kick_replay()
+            return status
+        self._record_success()
+        return "printed"
+
+    @property
+    def available(self):
+        """พร้อมรับงานใหม่ทันที (breaker ปิด และไม่มีงานค้างใน spool)"""
+        return self.state == STATE_CLOSED and not self.spool_depth()
+
+    async def send_now(self, data: bytes):
+        """
+        ส่งทันทีโดยไม่ spool ใช้ตอนมีเครื่องอื่นให้สลับไปพิมพ์ได้
+        ล้มก่อนเครื่องพิมพ์ได้รับอะไร -> ConnectionError (สลับเครื่องได้)
+        ล้มกลางงาน -> PartialWriteError (พิมพ์ไปแล้วบางส่วน ห้ามส่งซ้ำ)
+        """
+        if not self.available:
+            raise ConnectionError(f"เครื่องพิมพ์ {self.host} ไม่พร้อม ({self.state})")
+        try:
+            await printer_transport.send(self.host, data, port=self.port)
+        except printer_transport.PartialWriteError as e:
+            self._record_failure(e)
+            raise
+        except Exception as e:
+            self._record_failure(e)
+            raise ConnectionError(f"พิมพ์ที่ {self.host} ไม่สำเร็จ: {self.last_error}") from e
+        self._record_success()
+
+    async def _probe(self):
+        while self.state == STATE_OPEN:
+            await asyncio.sleep(PROBE_INTERVAL_SEC)
+            try:
+                await printer_transport.send(self.host, STATUS_REQUEST, port=self.port)
+            except Exception as e:
+                self.last_error = str(e) or type(e).__name__
+                continue
+            self._record_success()
+        self.kick_replay()
+
+    async def stop(self):
+        for task in (self._probe_task, self._replay_task):
+            if task is not None:
+                task.cancel()
+        self._probe_task = self._replay_task = None
+
+    def info(self):
+        return {
+            "host": self.host,
+            "port": self.port,
+            "state": self.state,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "opened_at": self.opened_at,
+            "spool_depth": self.spool_depth(),
+        }
+
+
+def get_printer(host: str, port: int = 9100) -> PrinterHealth:
+    printer = _printers.get((host, port))
+    if printer is None:
+        printer = _printers[(host, port)] = PrinterHealth(host, port)
+    return printer
+
+
+async def submit(host: str, data: bytes, ref=None, port: int = 9100) -> str:
+    return await get_printer(host, port).submit(data, ref)
+
+
+async def start():
+    """เรียกตอนแอปเริ่ม: ถ้ามีงานค้างใน spool จากรอบก่อน ให้พิมพ์ต่อ"""
+    if not os.path.isdir(SPOOL_DIR):
+        return
+    for entry in os.listdir(SPOOL_DIR):
+        if not os.path.isdir(os.path.join(SPOOL_DIR, entry)):
+            continue
+        host, _, port = entry.rpartition("_")
+        printer = get_printer(host, int(port)) if host and port.isdigit() else get_printer(entry)
+        printer._spooled = await render_pool.run_io(printer._scan_spool)
+        if printer.spool_depth():
+            printer.kick_replay()
+
+
+async def stop():
+    for printer in _printers.values():
+        await printer.stop()
+
+
+def stats():
+    return [printer.info() for printer in _printers.values()]
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+
+from utils import printer_health, render_pool
+from utils.printer_transport import PartialWriteError
+
+# ===============================
+# 🗂️ ทะเบียนเครื่องพิมพ์ (หลายเครื่อง / หลายหน้าที่)
+# ===============================
+# อ่านจาก PRINTERS_CONFIG (JSON) แก้ผ่าน /api/print/printers ได้ แล้วบันทึกกลับไฟล์เดิม
+#
+#     [
+#       {"name": "till-1", "host": "192.168.1.250", "roles": ["receipt"], "thai_codepage": 21,
+#        "stored_graphics": ["logo"]},
+#       {"name": "label-1", "host": "192.168.1.251", "roles": ["label"]}
+#     ]
+#
+# ไม่มีไฟล์ -> ใช้เครื่องเดียวจาก env PRINTER_IP (ทำทั้งใบเสร็จและ Label) แบบที่ร้านใช้อยู่เดิม
+# - งานใหม่ไปเครื่องของ role นั้นที่ "ว่างที่สุด" ในบรรดาเครื่องที่พร้อม (breaker ปิด / ไม่มีงานค้าง)
+# - ส่งไม่ผ่าน -> สลับไปเครื่องถัดไปทันที ถ้าไม่เหลือเครื่องไหนเลยค่อยเก็บลง spool ของเครื่องแรก
+#   ยกเว้นหลุดกลางงาน (PartialWriteError): เครื่องนั้นพิมพ์ไปแล้วบางส่วน ไม่สลับ / ไม่ spool ส่ง error ให้คิวงานพิมพ์
+
+ROLE_RECEIPT = "receipt"
+ROLE_LABEL = "label"
+ROLES = (ROLE_RECEIPT, ROLE_LABEL)
+
+CONFIG_PATH = os.getenv("PRINTERS_CONFIG", "./printers.json")
+
+_printers = {}          # name -> Printer
+_loaded = False
+
+
+class Printer:
+    def __init__(self, name: str, host: str, port: int = 9100, roles=ROLES, width: int = 576,
+                 thai_codepage: int = None, stored_graphics=(), enabled: bool = True):
+        unknown = set(roles) - set(ROLES)
+        if unknown:
+            raise ValueError(f"ไม่รู้จัก role: {', '.join(sorted(unknown))}")
+        self.name = name
+        self.host = host
+        self.port = int(port)
+        self.roles = list(roles)
+        self.width = int(width)
+        self.thai_codepage = None if thai_codepage in (None, "") else int(thai_codepage)
+        self.stored_graphics = list(stored_graphics or [])
+        self.enabled = bool(enabled)
+        self.in_flight = 0
+        self.jobs_sent = 0
+
+    @property
+    def health(self) -> printer_health.PrinterHealth:
+        return printer_health.get_printer(self.host, self.port)
+
+    @property
+    def caps(self) -> dict:
+        """ความสามารถของเครื่อง (ส่งให้ print_document.choose_backend / encode)"""
+        return {"width": self.width, "thai_codepage": self.thai_codepage, "stored_graphics": self.stored_graphics}
+
+    def load(self) -> int:
+        """ยิ่งน้อยยิ่งว่าง: งานที่กำลังส่ง + งานค้างใน spool"""
+        return self.in_flight + self.health.spool_depth()
+
+    def config(self) -> dict:
+        return {
+            "name": self.name,
+            "host": self.host,
+            "port": self.port,
+            "roles": self.roles,
+            "width": self.width,
+            "thai_codepage": self.thai_codepage,
+            "stored_graphics": self.stored_graphics,
+            "enabled": self.enabled,
+        }
+
+    def info(self) -> dict:
+        return {**self.config(), "in_flight": self.in_flight, "jobs_sent": self.jobs_sent, "health": self.health.info()}
+
+
+def _default_printers():
+    codepage = os.getenv("PRINTER_THAI_CODEPAGE", "")
+    stored = [n.strip() for n in os.getenv("PRINTER_STORED_GRAPHICS", "").split(",") if n.strip()]
+    return [Printer(
+        "default",
+        os.getenv("PRINTER_IP", "192.168.1.250"),
+        int(os.getenv("PRINTER_PORT", "9100")),
+        ROLES,
+        int(os.getenv("PRINTER_WIDTH", "576")),
+        int(codepage) if codepage else None,
+        stored,
+    )]
+
+
+def _read_config():
+    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+        return [Printer(**entry) for entry in json.load(f)]
+
+
+def _write_config(entries):
+    tmp = CONFIG_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, CONFIG_PATH)
+
+
+def load():
+    """อ่านทะเบียนเครื่องพิมพ์ (เรียกตอนแอปเริ่ม และเรียกซ้ำได้เมื่อแก้ไฟล์เอง)"""
+    global _loaded
+    try:
+        printers = _read_config()
+    except FileNotFoundError:
+        printers = _default_printers()
+    except (ValueError, TypeError) as e:
+        print(f"⚠️ อ่าน {CONFIG_PATH} ไม่ได้ ใช้เครื่องพิมพ์เริ่มต้นแทน: {e}")
+        printers = _default_printers()
+
+    old = dict(_printers)
+    _printers.clear()
+    for printer in printers:
+        # ✅ โหลดใหม่ไม่ให้ตัวนับงานที่กำลังส่งหาย
+        if printer.name in old:
+            printer.in_flight = old[printer.name].in_flight
+            printer.jobs_sent = old[printer.name].jobs_sent
+        _printers[printer.name] = printer
+    _loaded = True
+    return list(_printers.values())
+
+
+def _ensure_loaded():
+    if not _loaded:
+        load()
+
+
+def printers(role: str = None, enabled_only: bool = True) -> list:
+    _ensure_loaded()
+    return [
+        p for p in _printers.values()
+        if (role is None or role in p.roles) and (p.enabled or not enabled_only)
+    ]
+
+
+def get(name: str) -> Printer:
+    _ensure_loaded()
+    return _printers.get(name)
+
+
+def candidates(role: str) -> list:
+    """เครื่องของ role นี้เรียงตามลำดับที่ควรลอง: เครื่องที่พร้อมและว่างก่อน"""
+    pool = printers(role)
+    if not pool:
+        raise LookupError(f"ไม่มีเครื่องพิมพ์สำหรับงาน '{role}'")
+    return sorted(pool, key=lambda p: (not p.health.available, p.load(), p.jobs_sent))
+
+
+def primary(role: str) -> Printer:
+    return candidates(role)[0]
+
+
+@asynccontextmanager
+async def _busy(printer):
+    printer.in_flight += 1
+    try:
+        yield printer
+    finally:
+        printer.in_flight -= 1
+
+
+async def dispatch(role: str, build, ref=None, prefer: Printer = None) -> dict:
+    """
+    ส่งงานไปเครื่องที่เหมาะที่สุดของ role (หรือ prefer ก่อนถ้าระบุ)
+    build(printer) -> bytes (async) สร้างคำสั่งพิมพ์ตามความสามารถของเครื่องนั้น (ความกว้าง / code page / โลโก้)
+    คืน {"printer": ชื่อเครื่อง, "status": "printed" | "spooled"}
+    หลุดกลางงาน -> PartialWriteError (ไม่ลองเครื่องอื่น ใบเดียวกันจะออกสองเครื่อง)
+    """
+    order = candidates(role)
+    if prefer is not None and prefer in order:
+        order.remove(prefer)
+        order.insert(0, prefer)
+
+    for printer in order:
+        if not printer.health.available:
+            continue
+        async with _busy(printer):
+            data = await build(printer)
+            try:
+                await printer.health.send_now(data)
+            except PartialWriteError:
+                raise
+            except ConnectionError as e:
+                # ✅ ล้มก่อนเครื่องพิมพ์ได้รับอะไร สลับเครื่องได้ไม่ซ้ำ
+                print(f"⚠️ {e} -> ลองเครื่องถัดไป")
+                continue
+            printer.jobs_sent += 1
+            return {"printer": printer.name, "status": "printed"}
+
+    # ✅ ไม่มีเครื่องไหนพิมพ์ได้: เก็บลง spool ของเครื่องแรก (พิมพ์ให้เองเมื่อเครื่องกลับมา)
+    printer = order[0]
+    async with _busy(printer):
+        data = await build(printer)
+        status = await printer.health.submit(data, ref)
+    printer.jobs_sent += 1
+    return {"printer": printer.name, "status": status}
+
+
+async def dispatch_spread(role: str, items: list, build, ref=None) -> list:
+    """
+    แบ่ง items (เช่น Label ทั้งชุด) ให้เครื่องของ role ที่พร้อมทุกเครื่องพิมพ์พร้อมกัน
+    build(printer, chunk) -> bytes  คืนผลของแต่ละเครื่อง [{"printer", "status", "count"}]
+    """
+    ready = [p for p in candidates(role) if p.health.available] or candidates(role)[:1]
+    ready = ready[:max(1, len(items))]
+    size = -(-len(items) // len(ready))
+    chunks = [items[i:i + size] for i in range(0, len(items), size)] or [[]]
+
+    async def run(printer, chunk):
+        async def build_chunk(target):
+            return await build(target, chunk)
+        # ✅ เครื่องนี้ล้ม -> dispatch ส่งส่วนของมันต่อให้เครื่องอื่นเอง
+        result = await dispatch(role, build_chunk, ref=f"{ref}-{printer.name}" if ref else None, prefer=printer)
+        return {**result, "count": len(chunk)}
+
+    # ✅ รอทุกเครื่องจบก่อน (เครื่องหนึ่งหลุดกลางงาน เครื่องอื่นยังพิมพ์ส่วนของตัวเองจนเสร็จ) แล้วค่อยส่ง error ต่อ
+    results = await asyncio.gather(*(run(p, c) for p, c in zip(ready, chunks)), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+# ===============================
+# ✏️ แก้ไขทะเบียน (admin endpoint)
+# ===============================
+async def upsert(entry: dict) -> Printer:
+    _ensure_loaded()
+    printer = Printer(**entry)
+    if printer.name in _printers:
+        printer.in_flight = _printers[printer.name].in_flight
+        printer.jobs_sent = _printers[printer.name].jobs_sent
+    _printers[printer.name] = printer
+    await render_pool.run_io(_write_config, [p.config() for p in _printers.values()])
+    return printer
+
+
+async def remove(name: str) -> bool:
+    _ensure_loaded()
+    if _printers.pop(name, None) is None:
+        return False
+    await render_pool.run_io(_write_config, [p.config() for p in _printers.values()])
+    return True
+
+
+def stats():
+    return [p.info() for p in printers(enabled_only=False)]
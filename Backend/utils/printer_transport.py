@@ -0,0 +1,180 @@
+import asyncio
+import os
+import socket
+import time
+from contextlib import asynccontextmanager
+
+# ===============================
+# 🔌 การเชื่อมต่อเครื่องพิมพ์แบบ asyncio (ESC/POS ผ่าน TCP 9100)
+# ===============================
+# เปิด connection ค้างไว้ 1 เส้นต่อเครื่องพิมพ์ ใช้ซ้ำทุกใบเสร็จ / Label
+# - lock ต่อเครื่อง: งานพิมพ์ไม่ปนกัน
+# - drain() ทุก chunk: ไม่ดันข้อมูลเกิน buffer ของเครื่องพิมพ์
+# - keepalive + ต่อใหม่อัตโนมัติเมื่อ connection หลุด
+#   ส่งซ้ำเฉพาะเมื่อเครื่องพิมพ์ยังไม่ได้รับอะไรเลย ล้มกลางงาน -> PartialWriteError ให้ spooler ตัดสิน
+#   (ส่งทั้งงานซ้ำ = ส่วนที่พิมพ์ไปแล้วออกมาอีกรอบ ใบเสร็จ / Label ซ้ำ)
+# - ปิดเองเมื่อว่างนาน (เครื่องพิมพ์ส่วนใหญ่รับได้ทีละ 1 connection เครื่องอื่นจะได้ใช้ได้)
+
+CONNECT_TIMEOUT_SEC = float(os.getenv("PRINTER_CONNECT_TIMEOUT", "5"))
+WRITE_TIMEOUT_SEC = float(os.getenv("PRINTER_WRITE_TIMEOUT", "30"))
+IDLE_CLOSE_SEC = float(os.getenv("PRINTER_IDLE_CLOSE", "60"))
+CHUNK_SIZE = int(os.getenv("PRINTER_CHUNK_SIZE", "16384"))
+
+_connections = {}
+
+
+class PartialWriteError(OSError):
+    """connection หลุดหลังส่งไปแล้วบางส่วน (เครื่องพิมพ์อาจพิมพ์ส่วนนั้นไปแล้ว ห้ามส่งซ้ำเอง)"""
+
+    def __init__(self, sent: int, total: int, cause: BaseException):
+        super().__init__(f"ส่งงานพิมพ์ได้ {sent}/{total} byte แล้วหลุด: {cause!r}")
+        self.sent = sent
+        self.total = total
+
+
+def _enable_keepalive(sock):
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+        if hasattr(socket, name):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+
+
+class PrinterConnection:
+    def __init__(self, host: str, port: int = 9100):
+        self.host = host
+        self.port = port
+        self.lock = asyncio.Lock()
+        self.connects = 0
+        self.bytes_sent = 0
+        self._reader = None
+        self._writer = None
+        self._last_used = 0.0
+        self._idle_task = None
+
+    @property
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=CONNECT_TIMEOUT_SEC
+        )
+        sock = self._writer.get_extra_info("socket")
+        if sock is not None:
+            _enable_keepalive(sock)
+        self.connects += 1
+        if self._idle_task is None or self._idle_task.done():
+            self._idle_task = asyncio.create_task(self._close_when_idle())
+
+    async def _write(self, data):
+        """ส่งทีละ chunk ล้มหลังจาก drain ผ่านไปแล้วอย่างน้อย 1 chunk -> PartialWriteError"""
+        view = memoryview(data)
+        sent = 0
+        try:
+            for i in range(0, len(view), CHUNK_SIZE):
+                chunk = view[i:i + CHUNK_SIZE]
+                self._writer.write(chunk)
+                await asyncio.wait_for(self._writer.drain(), timeout=WRITE_TIMEOUT_SEC)
+                sent += len(chunk)
+        except (OSError, asyncio.TimeoutError) as e:
+            self.bytes_sent += sent
+            if sent:
+                raise PartialWriteError(sent, len(data), e) from e
+            raise
+        self.bytes_sent += len(data)
+        self._last_used = time.monotonic()
+
+    async def _send_locked(self, data: bytes):
+        # ✅ connection เก่าอาจถูกเครื่องพิมพ์ตัดไปแล้ว (ปิดเครื่อง / timeout)
+        # ถ้าเขียน chunk แรกไม่ผ่าน (เครื่องพิมพ์ยังไม่ได้อะไร) ให้ต่อใหม่แล้วส่งซ้ำ 1 ครั้ง
+        # ส่งไปแล้วบางส่วน (PartialWriteError) -> ไม่ส่งซ้ำ ปล่อย error ขึ้นไป
+        reused = self.connected and not self._reader.at_eof()
+        if not reused:
+            await self._close()
+            await self._connect()
+        try:
+            await self._write(data)
+        except (OSError, asyncio.TimeoutError) as e:
+            await self._close()
+            if not reused or isinstance(e, PartialWriteError):
+                raise
+            await self._connect()
+            await self._write(data)
+
+    async def send(self, data: bytes):
+        """ส่งงานพิมพ์ 1 ชิ้น"""
+        async with self.lock:
+            try:
+                await self._send_locked(data)
+            except Exception:
+                await self._close()
+                raise
+
+    @asynccontextmanager
+    async def job(self):
+        """
+        ถือ connection ไว้ตลอดงานพิมพ์หลายชิ้น (เช่น Label ทั้งชุด)
+            async with conn.job() as send:
+                await send(part1)
+                await send(part2)
+        """
+        async with self.lock:
+            try:
+                yield self._send_locked
+            except Exception:
+                await self._close()
+                raise
+
+    async def _close_when_idle(self):
+        while self.connected:
+            await asyncio.sleep(IDLE_CLOSE_SEC / 2)
+            if self.lock.locked():
+                continue
+            if time.monotonic() - self._last_used >= IDLE_CLOSE_SEC:
+                async with self.lock:
+                    await self._close()
+
+    async def _close(self):
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), timeout=2)
+            except Exception:
+                pass
+
+    async def close(self):
+        async with self.lock:
+            await self._close()
+        if self._idle_task is not None:
+            self._idle_task.cancel()
+
+    def info(self):
+        return {
+            "host": self.host,
+            "port": self.port,
+            "connected": self.connected,
+            "connects": self.connects,
+            "bytes_sent": self.bytes_sent,
+        }
+
+
+def get_connection(host: str, port: int = 9100) -> PrinterConnection:
+    conn = _connections.get((host, port))
+    if conn is None:
+        conn = _connections[(host, port)] = PrinterConnection(host, port)
+    return conn
+
+
+async def send(host: str, data: bytes, port: int = 9100):
+    await get_connection(host, port).send(data)
+
+
+async def close_all():
+    for conn in list(_connections.values()):
+        await conn.close()
+    _connections.clear()
+
+
+def stats():
+    return [conn.info() for conn in _connections.values()]
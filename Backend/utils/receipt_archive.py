@@ -0,0 +1,211 @@
+import asyncio
+import io
+import json
+import os
+import re
+import shutil
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from utils import render_pool
+from utils.receipt_layout import Raster, to_image
+from utils.receipt_render import RECEIPT_W, render_receipt
+
+# ===============================
+# 🗄️ คลังใบเสร็จ (ภาพที่พิมพ์จริง แช่แข็งตอนขาย)
+# ===============================
+# ใบเสร็จแต่ละใบเก็บเป็นไฟล์เดียวใน RECEIPT_ARCHIVE_DIR/<วันที่ของ order id>/<order id>.rcpt
+# (เครื่องที่หัวพิมพ์ไม่ใช่ RECEIPT_W: <order id>-<width>.rcpt ภาพกว้างไม่เท่ากันใช้แทนกันไม่ได้)
+#     "RCP1" + ความยาว meta (4 byte) + meta JSON (ข้อมูลที่ใช้วาด: order / แต้ม / เวลา)
+#     + ภาพ 1-bit บีบด้วย zlib
+# - แต้มก่อน/หลัง และเวลาพิมพ์ถูกคำนวณตอนสร้าง order ไม่ใช่ตอนพิมพ์ -> พิมพ์ซ้ำได้ใบเดิมทุกตัวเลข
+# - พิมพ์ซ้ำ: อ่านไฟล์แล้วส่ง raster ไปเครื่องพิมพ์ตรง ๆ ไม่ต้องวาดใหม่ / ไม่ต้องอ่าน DB
+# - เก็บไว้ RECEIPT_ARCHIVE_DAYS วัน (ลบทั้งโฟลเดอร์ของวันที่เก่ากว่า) ตรวจทุก RECEIPT_ARCHIVE_PRUNE_HOURS ชม.
+
+ARCHIVE_DIR = os.getenv("RECEIPT_ARCHIVE_DIR", "./receipt_archive")
+RETENTION_DAYS = int(os.getenv("RECEIPT_ARCHIVE_DAYS", "90"))
+PRUNE_INTERVAL_SEC = float(os.getenv("RECEIPT_ARCHIVE_PRUNE_HOURS", "6")) * 3600
+
+MAGIC = b"RCP1"
+_DAY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+_prune_task = None
+
+
+def _path(order_id: str, width: int = RECEIPT_W) -> str:
+    """โฟลเดอร์ตามวันที่ใน ObjectId (UTC) -> หาไฟล์ได้จาก order id อย่างเดียว และลบตามอายุได้ทั้งโฟลเดอร์"""
+    try:
+        day = ObjectId(order_id).generation_time.strftime("%Y-%m-%d")
+    except (InvalidId, TypeError):
+        raise ValueError(f"order id ไม่ถูกต้อง: {order_id}")
+    name = f"{order_id}.rcpt" if width == RECEIPT_W else f"{order_id}-{int(width)}.rcpt"
+    return os.path.join(ARCHIVE_DIR, day, name)
+
+
+def _paths(order_id, width):
+    """ไฟล์ที่ต้องลองอ่าน: width ที่ระบุ หรือทุกความกว้างที่เก็บไว้ (None = ใบไหนก็ได้ ใบกว้างเริ่มต้นก่อน)"""
+    if width is not None:
+        return [_path(order_id, width)]
+    path = _path(order_id)
+    try:
+        names = os.listdir(os.path.dirname(path))
+    except FileNotFoundError:
+        return []
+    prefix = f"{order_id}-"
+    return [path] + [os.path.join(os.path.dirname(path), n) for n in sorted(names)
+                     if n.startswith(prefix) and n.endswith(".rcpt")]
+
+
+def _write(order_id, meta, raster):
+    path = _path(order_id, raster.width)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    head = json.dumps({**meta, "width": raster.width, "height": raster.height},
+                      ensure_ascii=False, default=str).encode("utf-8")
+    with open(path + ".tmp", "wb") as f:
+        f.write(MAGIC + len(head).to_bytes(4, "little") + head + zlib.compress(raster.data))
+    os.replace(path + ".tmp", path)
+    return os.path.getsize(path)
+
+
+def _read(order_id, width=None):
+    for path in _paths(order_id, width):
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+            break
+        except FileNotFoundError:
+            continue
+    else:
+        return None
+    if blob[:4] != MAGIC:
+        raise ValueError(f"ไฟล์ใบเสร็จ {order_id} เสีย")
+    size = int.from_bytes(blob[4:8], "little")
+    meta = json.loads(blob[8:8 + size])
+    return meta, Raster(meta["width"], meta["height"], zlib.decompress(blob[8 + size:]))
+
+
+async def save(order_id: str, order: dict, points: dict = None, printed_at: str = None,
+               width: int = RECEIPT_W) -> Raster:
+    """วาดใบเสร็จกว้าง width จากข้อมูลที่แช่แข็งไว้ แล้วเก็บลงคลัง (เขียนไม่ได้ก็ยังคืนภาพให้พิมพ์ต่อ)"""
+    raster = await render_pool.run_cpu(render_receipt, order, points, printed_at, width)
+    meta = {"order": order, "points": points, "printedAt": printed_at, "archivedAt": datetime.now().isoformat()}
+    try:
+        await render_pool.run_io(_write, order_id, meta, raster)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ เก็บใบเสร็จ {order_id} ลงคลังไม่สำเร็จ: {e}")
+    return raster
+
+
+async def load(order_id: str, width: int = None):
+    """
+    คืน (meta, Raster) ของใบเสร็จที่เก็บไว้ หรือ None ถ้าไม่มี (เกินอายุ / order เก่าก่อนมีคลัง)
+    width = เอาเฉพาะภาพกว้างเท่านี้ (None = ใบไหนก็ได้ที่เก็บไว้)
+    """
+    try:
+        return await render_pool.run_io(_read, order_id, width)
+    except ValueError as e:
+        print(f"⚠️ {e}")
+        return None
+
+
+def _png(order_id):
+    archived = _read(order_id)
+    if archived is None:
+        return None
+    buf = io.BytesIO()
+    to_image(archived[1]).save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+async def load_png(order_id: str):
+    """ภาพใบเสร็จที่เก็บไว้เป็น PNG (แสดงในแอป) หรือ None"""
+    try:
+        return await render_pool.run_io(_png, order_id)
+    except ValueError:
+        return None
+
+
+async def ensure(order_id: str, order: dict, points: dict = None, printed_at: str = None,
+                 width: int = RECEIPT_W) -> Raster:
+    """ภาพใบเสร็จกว้าง width จากคลัง ถ้ายังไม่มีจึงวาดแล้วเก็บ (งานพิมพ์ที่ลองใหม่ไม่ต้องวาดซ้ำ)"""
+    archived = await load(order_id, width)
+    if archived is not None:
+        return archived[1]
+    return await save(order_id, order, points, printed_at, width)
+
+
+# ===============================
+# 🧹 ลบใบเสร็จที่เกินอายุ
+# ===============================
+def _prune(days):
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+    removed = 0
+    try:
+        entries = os.listdir(ARCHIVE_DIR)
+    except FileNotFoundError:
+        return 0
+    for day in entries:
+        if _DAY.match(day) and day < cutoff:
+            path = os.path.join(ARCHIVE_DIR, day)
+            removed += len(os.listdir(path))
+            shutil.rmtree(path, ignore_errors=True)
+    return removed
+
+
+async def prune(days: int = None) -> int:
+    """ลบใบเสร็จที่เก่ากว่า days วัน (ค่าเริ่มต้น RECEIPT_ARCHIVE_DAYS) คืนจำนวนไฟล์ที่ลบ"""
+    removed = await render_pool.run_io(_prune, RETENTION_DAYS if days is None else days)
+    if removed:
+        print(f"🧹 ลบใบเสร็จเก่า {removed} ใบ")
+    return removed
+
+
+async def _prune_loop():
+    while True:
+        try:
+            await prune()
+        except Exception as e:
+            print(f"⚠️ ลบใบเสร็จเก่าไม่สำเร็จ: {e}")
+        await asyncio.sleep(PRUNE_INTERVAL_SEC)
+
+
+def start():
+    global _prune_task
+    if RETENTION_DAYS > 0 and _prune_task is None:
+        _prune_task = asyncio.create_task(_prune_loop())
+
+
+async def stop():
+    global _prune_task
+    if _prune_task is not None:
+        _prune_task.cancel()
+        try:
+            await _prune_task
+        except asyncio.CancelledError:
+            pass
+        _prune_task = None
+
+
+def _stats():
+    days, files, size = 0, 0, 0
+    try:
+        entries = os.listdir(ARCHIVE_DIR)
+    except FileNotFoundError:
+        entries = []
+    for day in entries:
+        path = os.path.join(ARCHIVE_DIR, day)
+        if not (_DAY.match(day) and os.path.isdir(path)):
+            continue
+        days += 1
+        for name in os.listdir(path):
+            if name.endswith(".rcpt"):
+                files += 1
+                size += os.path.getsize(os.path.join(path, name))
+    return {"dir": ARCHIVE_DIR, "retention_days": RETENTION_DAYS, "days": days, "receipts": files, "bytes": size}
+
+
+async def stats():
+    return await render_pool.run_io(_stats)
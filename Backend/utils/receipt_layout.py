@@ -0,0 +1,190 @@
+import os
+from collections import namedtuple
+from PIL import Image, ImageDraw
+from utils.glyph_atlas import advance as text_length, bbox as text_bbox, get_atlas
+
+# ===============================
+# 📐 จัดหน้าใบเสร็จ / Label แบบ 2 รอบ
+# ===============================
+# รอบแรก (วัด): เรียก text()/row()/center()/bitmap() เพื่อคำนวณตำแหน่งและตัดบรรทัด
+# รอบสอง (วาด): render() สร้าง canvas ขนาดพอดีแล้ววาดทีเดียว ไม่ต้อง crop / แปลงภาพซ้ำ
+#
+#     lay = Layout(576)
+#     lay.center("ถูกใจการค้า", font_title, gap=6)
+#     lay.row("สินค้า x2", "120.00", font_normal, advance=36)
+#     bw = lay.render(threshold=160)        # ได้ภาพ mode "1"
+
+# ✅ วิธีวาดตัวอักษรตอน render(): "atlas" (แปะ tile จาก utils/glyph_atlas), "L" หรือ "1" (FreeType ทุกครั้ง)
+TEXT_RENDER_MODE = os.getenv("TEXT_RENDER_MODE", "atlas")
+
+# ✅ สระ/วรรณยุกต์ไทยที่ต้องติดกับพยัญชนะตัวหน้า ห้ามตัดบรรทัดคั่น
+THAI_MARKS = set(chr(c) for c in [0x0E31, *range(0x0E34, 0x0E3B), *range(0x0E47, 0x0E4F)])
+
+_LUTS = {}
+
+# ✅ ผลลัพธ์การวาด: ภาพ mode "1" แบบ packed bits (Image.tobytes())
+Raster = namedtuple("Raster", ["width", "height", "data"])
+
+
+def to_raster(img: Image.Image) -> Raster:
+    return Raster(img.width, img.height, img.tobytes())
+
+
+def to_image(raster: Raster) -> Image.Image:
+    return Image.frombytes("1", (raster.width, raster.height), raster.data)
+
+
+
+def threshold_lut(level: int):
+    """ตาราง 256 ค่าสำหรับ Image.point(): ต่ำกว่า level = ดำ"""
+    lut = _LUTS.get(level)
+    if lut is None:
+        lut = _LUTS[level] = [0] * level + [255] * (256 - level)
+    return lut
+
+
+def clusters(text):
+    """แยกข้อความเป็นกลุ่มตัวอักษร (พยัญชนะ + สระบน/ล่าง/วรรณยุกต์)"""
+    out = []
+    for ch in text:
+        if out and ch in THAI_MARKS:
+            out[-1] += ch
+        else:
+            out.append(ch)
+    return out
+
+
+def wrap_text(text: str, font, max_w: float):
+    """ตัดบรรทัดให้กว้างไม่เกิน max_w: ตัดที่ช่องว่างก่อน ถ้าคำยาวเกิน (ภาษาไทยไม่มีช่องว่าง) ตัดตามกลุ่มตัวอักษร"""
+    if text_length(font, text) <= max_w:
+        return [text]
+
+    lines, line = [], ""
+    for word in text.split(" "):
+        candidate = f"{line} {word}" if line else word
+        if text_length(font, candidate) <= max_w:
+            line = candidate
+            continue
+        if line:
+            lines.append(line)
+            line = ""
+        if text_length(font, word) <= max_w:
+            line = word
+            continue
+        for cluster in clusters(word):
+            if line and text_length(font, line + cluster) > max_w:
+                lines.append(line)
+                line = ""
+            line += cluster
+    if line:
+        lines.append(line)
+    return lines
+
+
+class Layout:
+    def __init__(self, width: int, margin: int = 40):
+        self.width = width
+        self.margin = margin
+        self.y = 0
+        self._texts = []      # (x, y, text, font)
+        self._grays = []      # (x, y, image L/RGBA) วาดก่อนแปลงเป็น 1-bit
+        self._bitmaps = []    # (x, y, image "1") แปะหลังแปลง
+
+    @property
+    def height(self):
+        return self.y
+
+    @property
+    def blank(self):
+        """ยังไม่มีอะไรให้วาด (มีแค่ระยะว่าง)"""
+        return not (self._texts or self._grays or self._bitmaps)
+
+    def space(self, n: int):
+        self.y += n
+        return self
+
+    def text(self, text: str, font, advance: int, x: int = None):
+        """ข้อความชิดซ้าย ตัดบรรทัดอัตโนมัติ แต่ละบรรทัดเลื่อนลง advance"""
+        x = self.margin if x is None else x
+        for line in wrap_text(text, font, self.width - self.margin - x):
+            self._texts.append((x, self.y, line, font))
+            self.y += advance
+        return self
+
+    def row(self, left: str, right: str, font, advance: int, gap: int = 16):
+        """2 คอลัมน์: ซ้ายตัดบรรทัดไม่ให้ทับคอลัมน์ขวา ขวาชิดขอบขวาบนบรรทัดแรก"""
+        right_w = text_length(font, right)
+        right_x = self.width - self.margin - right_w
+        self._texts.append((int(right_x), self.y, right, font))
+        for line in wrap_text(left, font, right_x - self.margin - gap):
+            self._texts.append((self.margin, self.y, line, font))
+            self.y += advance
+        return self
+
+    def center(self, text: str, font, gap: int = 0, advance: int = None):
+        """ข้อความกึ่งกลาง ถ้าไม่กำหนด advance จะเลื่อนลงถึงขอบล่างของตัวอักษร + gap"""
+        for line in wrap_text(text, font, self.width - self.margin * 2):
+            x = int((self.width - text_length(font, line)) / 2)
+            self._texts.append((x, self.y, line, font))
+            self.y += (text_bbox(font, line)[3] if advance is None else advance) + gap
+        return self
+
+    def separator(self, font, advance: int = 40, char: str = "-", count: int = 42):
+        self._texts.append((self.margin, self.y, char * count, font))
+        self.y += advance
+        return self
+
+    def bitmap(self, img, advance: int = None, x: int = None):
+        """วางรูป (กึ่งกลางถ้าไม่กำหนด x) รูป mode "1" แปะตรง ๆ รูปอื่นผ่าน threshold พร้อมตัวอักษร"""
+        x = int((self.width - img.width) / 2) if x is None else x
+        target = self._bitmaps if img.mode == "1" else self._grays
+        target.append((x, self.y, img))
+        self.y += img.height if advance is None else advance
+        return self
+
+    def render(self, threshold: int = 160, mode: str = None) -> Image.Image:
+        """
+        วาดลง canvas ขนาดพอดี คืนภาพ mode "1" (ค่าเริ่มต้น mode = TEXT_RENDER_MODE)
+        mode="atlas": แปะ tile ตัวอักษรที่ threshold แล้วจาก glyph atlas (เร็วสุด วาดด้วย FreeType เฉพาะคำที่ไม่เคยเห็น)
+        mode="L": วาดตัวอักษรแบบ anti-alias แล้ว threshold ด้วย LUT (ผลเหมือนของเดิม)
+        mode="1": วาดตัวอักษรลง canvas 1-bit ตรง ๆ (ขอบตัวอักษรหยาบกว่าเล็กน้อย)
+        """
+        size = (self.width, max(1, self.y))
+        lut = threshold_lut(threshold)
+        mode = mode or TEXT_RENDER_MODE
+
+        if mode == "atlas":
+            canvas = Image.new("1", size, 1)
+            for x, y, img in self._grays:
+                canvas.paste(flatten(img).point(lut, mode="1"), (x, y))
+            atlas = get_atlas(threshold)
+            for x, y, text, font in self._texts:
+                atlas.draw(canvas, (x, y), text, font)
+        elif mode == "1":
+            canvas = Image.new("1", size, 1)
+            draw = ImageDraw.Draw(canvas)
+            for x, y, text, font in self._texts:
+                draw.text((x, y), text, font=font, fill=0)
+            for x, y, img in self._grays:
+                canvas.paste(flatten(img).point(lut, mode="1"), (x, y))
+        else:
+            canvas = Image.new("L", size, 255)
+            draw = ImageDraw.Draw(canvas)
+            for x, y, img in self._grays:
+                canvas.paste(flatten(img), (x, y))
+            for x, y, text, font in self._texts:
+                draw.text((x, y), text, font=font, fill=0)
+            canvas = canvas.point(lut, mode="1")
+
+        for x, y, img in self._bitmaps:
+            canvas.paste(img, (x, y))
+        return canvas
+
+
+def flatten(img):
+    """รูปโปร่งใส -> พื้นขาว แล้วแปลงเป็นเทา"""
+    if img.mode == "RGBA":
+        flat = Image.new("RGBA", img.size, "white")
+        flat.alpha_composite(img)
+        img = flat
+    return img if img.mode == "L" else img.convert("L")
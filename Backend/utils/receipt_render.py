@@ -0,0 +1,252 @@
+from datetime import datetime
+from functools import lru_cache
+from PIL import Image
+from utils import glyph_atlas, print_assets
+from utils.print_document import Document, encode, group_image, render_parts
+from utils.receipt_layout import Raster, flatten, threshold_lut, to_raster
+import qrcode
+
+# ===============================
+# 🧾 วาดใบเสร็จ / Label เป็นภาพ 1-bit
+# ===============================
+# ฟังก์ชันในไฟล์นี้เป็นงาน CPU ล้วน ๆ (ไม่แตะ DB / เครื่องพิมพ์)
+# จึงส่งไปรันใน process pool ได้ (ดู utils/render_pool.py)
+# เนื้อหาสร้างเป็น Document (utils/print_document.py) แล้วเลือก backend ตอนพิมพ์
+
+RECEIPT_W = 576     # ความกว้างหัวพิมพ์เริ่มต้น (dot) เครื่องที่แคบกว่า/กว้างกว่าส่ง width มาเอง (Printer.width)
+
+# ✅ ก่อน dither โลโก้: เทาเข้ม -> ดำ, เทาอ่อน -> ขาว (กระดาษความร้อนพิมพ์เทาอ่อนไม่สวย)
+# เหลือแค่ขอบภาพที่ถูก dither ให้ดูเนียน
+_LOGO_LEVELS = [0 if v < 100 else 255 if v >= 200 else int((v - 100) * 2.55) for v in range(256)]
+
+RECEIPT_THRESHOLD = 160
+LABEL_THRESHOLD = 170
+
+
+def _dither(img):
+    flat = Image.new("RGBA", img.size, "white")
+    flat.alpha_composite(img)
+    return flat.convert("L").point(_LOGO_LEVELS).convert("1")
+
+
+# ===============================
+# 🧱 หัว / ท้ายใบเสร็จ (วาดครั้งเดียวแล้วใช้ซ้ำ)
+# ===============================
+# ข้อความหัว/ท้ายเป็น Group ที่ key = (print_assets.asset_key(), width)
+# raster backend วาดใหม่เฉพาะเมื่อ key เปลี่ยน (โลโก้/อีโมจิ/ฟอนต์/ข้อมูลร้าน/ความกว้างเครื่อง)
+
+def _header_doc(width=RECEIPT_W):
+    return (
+        Document(width)
+        .center(print_assets.SHOP_NAME, 60, gap=6)
+        .center(print_assets.SHOP_ADDRESS, 34, gap=10)
+        .separator(34)
+    )
+
+
+def _footer_doc(width=RECEIPT_W):
+    return Document(width).center("ขอบคุณที่อุดหนุน", 42)
+
+
+def _tile_key(doc_fn, width):
+    return ("tile", doc_fn.__name__, print_assets.asset_key(), width)
+
+
+def _tile(doc_fn, width, threshold=None):
+    doc = Document(width).group(_tile_key(doc_fn, width), doc_fn(width))
+    return group_image(doc.blocks[0], width, doc.margin, threshold or RECEIPT_THRESHOLD)
+
+
+def header_tile(width: int = RECEIPT_W) -> Image.Image:
+    return _tile(_header_doc, width)
+
+
+def footer_tile(width: int = RECEIPT_W) -> Image.Image:
+    return _tile(_footer_doc, width)
+
+
+# ✅ คำที่อยู่บนใบเสร็จ / Label ทุกใบ วาดเข้า glyph atlas ไว้ก่อน
+_ATLAS_RUNS = {
+    (34, RECEIPT_THRESHOLD): [
+        "0123456789 . , : / -", "ใช้แต้มแลกส่วนลด: บาท", "ชำระโดย: เงินสด โอน", "รับเงิน:", "เงินทอน:",
+        "ไม่มีสมาชิก", "เบอร์สมาชิก:", "แต้มก่อนใช้:", "ใช้แต้ม:", "ได้รับใหม่:", "แต้มคงเหลือ:",
+    ],
+    (42, RECEIPT_THRESHOLD): ["0123456789 . , x", "รวมทั้งหมด: บาท", "ยอดสุทธิ:"],
+    (36, LABEL_THRESHOLD): ["0123456789", "รหัส:"],
+    (56, LABEL_THRESHOLD): ["0123456789 , ฿"],
+}
+
+
+def warm_tiles():
+    header_tile()
+    footer_tile()
+    for (size, threshold), runs in _ATLAS_RUNS.items():
+        glyph_atlas.get_atlas(threshold).warm(print_assets.font(size), runs)
+
+
+# ===============================
+# 💾 รูปที่เก็บในหน่วยความจำเครื่องพิมพ์ (NV graphics)
+# ===============================
+@lru_cache(maxsize=8)
+def _stored_image(key, name, width):
+    if name == "logo":
+        logo = print_assets.logo(min(print_assets.LOGO_MAX_W, width - 48))
+        return _dither(logo) if logo is not None else None
+    if name == "emoji":
+        emoji = print_assets.emoji()
+        if emoji is None:
+            return None
+        return flatten(emoji).point(threshold_lut(RECEIPT_THRESHOLD), mode="1")
+    raise ValueError(f"ไม่รู้จักรูป '{name}'")
+
+
+def stored_image(name: str, width: int = RECEIPT_W) -> Image.Image:
+    """ภาพ 1-bit ของโลโก้ / อีโมจิ แบบเดียวกับที่อยู่บนใบเสร็จกว้าง width (None ถ้าไม่มีไฟล์)"""
+    return _stored_image(print_assets.asset_key(), name, width)
+
+
+def stored_graphic(name: str, width: int = RECEIPT_W) -> Raster:
+    """เหมือน stored_image แต่เป็น Raster (ใช้อัปโหลดเข้าเครื่องพิมพ์)"""
+    img = stored_image(name, width)
+    return to_raster(img) if img is not None else None
+
+
+def cache_stats() -> dict:
+    """สถิติ cache ฟอนต์/รูป/tile ของ process นี้"""
+    stats = print_assets.stats()
+    stats["tiles"] = {
+        "groups": print_assets.lru_stats(group_image),
+        "stored_graphics": print_assets.lru_stats(_stored_image),
+    }
+    stats["glyph_atlas"] = glyph_atlas.stats()
+    return stats
+
+
+# ===============================
+# 🧾 ใบเสร็จ
+# ===============================
+def receipt_body(doc, order_dict, points):
+    """ส่วนที่เปลี่ยนทุกใบ (สินค้า / ยอดรวม / ชำระเงิน / แต้ม)"""
+    # ===== สินค้า (ชื่อยาวตัดขึ้นบรรทัดใหม่ ไม่ทับช่องราคา) =====
+    for item in order_dict["items"]:
+        doc.row(f"{item['name']} x{item['qty']}", f"{item['total']:,.2f}", 42, advance=36)
+    doc.separator(34)
+
+    # ===== รวมทั้งหมด =====
+    total = float(order_dict.get("total", 0))
+    redeem = float(order_dict.get("redeem", 0))
+    net_total = total - redeem
+    payment_type = order_dict.get("paymentType", "cash")
+    cash = float(order_dict.get("cash", 0))
+    change = float(order_dict.get("change", 0))
+
+    doc.text(f"รวมทั้งหมด: {total:,.2f} บาท", 42, advance=36)
+    if redeem > 0:
+        doc.text(f"ใช้แต้มแลกส่วนลด: {redeem:,.2f} บาท", 34, advance=30)
+    doc.text(f"ยอดสุทธิ: {net_total:,.2f} บาท", 42, advance=40)
+
+    # ===== วิธีชำระเงิน =====
+    pay_label = "เงินสด" if payment_type == "cash" else "โอน"
+    doc.text(f"ชำระโดย: {pay_label}", 34, advance=30)
+    if payment_type == "cash":
+        doc.text(f"รับเงิน: {cash:,.2f}", 34, advance=30)
+        doc.text(f"เงินทอน: {change:,.2f}", 34, advance=40)
+    doc.separator(34)
+
+    # ===== แต้มสะสม =====
+    # ✅ ถ้าไม่มีสมาชิกหรือ phone == "-" ให้ข้ามส่วนแต้ม
+    phone = (order_dict.get("member") or {}).get("phone", "")
+    if points is None or not phone or phone == "-":
+        doc.text("ไม่มีสมาชิก", 34, advance=35)
+    else:
+        doc.text(f"เบอร์สมาชิก: {phone}", 34, advance=30)
+        doc.text(f"แต้มก่อนใช้: {points['before']}", 34, advance=28)
+        doc.text(f"ใช้แต้ม: {points['redeem']}", 34, advance=28)
+        doc.text(f"ได้รับใหม่: {points['earned']}", 34, advance=28)
+        doc.text(f"แต้มคงเหลือ: {points['after']}", 34, advance=40)
+        doc.separator(34, advance=36)
+
+
+def receipt_document(order_dict: dict, points: dict = None, printed_at: str = None,
+                     width: int = RECEIPT_W) -> Document:
+    """
+    order_dict = ข้อมูลคำสั่งซื้อ
+    points = {"before", "redeem", "earned", "after"} ของสมาชิก (None = ไม่มีสมาชิก)
+    width = ความกว้างหัวพิมพ์ (dot) ของเครื่องที่จะพิมพ์
+    """
+    doc = Document(width, threshold=RECEIPT_THRESHOLD).space(6)
+
+    # ===== โลโก้ (dither ไว้ล่วงหน้าที่ความกว้างจริง) =====
+    logo = stored_image("logo", width)
+    if logo is not None:
+        doc.picture(logo, name="logo", advance=logo.height + 10)
+    doc.group(_tile_key(_header_doc, width), _header_doc(width))
+
+    receipt_body(doc, order_dict, points)
+
+    doc.group(_tile_key(_footer_doc, width), _footer_doc(width))
+    emoji = stored_image("emoji", width)
+    if emoji is not None:
+        doc.picture(emoji, name="emoji", advance=emoji.height + 6)
+    doc.space(8)
+
+    # ===== วันเวลา =====
+    printed_at = printed_at or datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    doc.center(printed_at, 34, gap=20)
+    return doc
+
+
+def render_receipt_parts(order_dict: dict, points: dict = None, printed_at: str = None, stored=(),
+                         width: int = RECEIPT_W) -> list:
+    """
+    ใบเสร็จแบบ raster ที่ข้ามรูปที่อยู่ในหน่วยความจำเครื่องพิมพ์แล้ว
+    stored = ชื่อรูปที่เครื่องพิมพ์มีแล้ว ("logo", "emoji")
+    คืนส่วนต่าง ๆ ตามลำดับพิมพ์ (ดู print_document.render_parts)
+    """
+    return render_parts(receipt_document(order_dict, points, printed_at, width), stored)
+
+
+def render_receipt(order_dict: dict, points: dict = None, printed_at: str = None, width: int = RECEIPT_W) -> Raster:
+    return render_receipt_parts(order_dict, points, printed_at, width=width)[0]
+
+
+def encode_receipt(order_dict: dict, points: dict = None, printed_at: str = None,
+                   backend: str = None, caps: dict = None, stored=()) -> bytes:
+    """ใบเสร็จเป็น byte พร้อมส่งเครื่องพิมพ์ ด้วย backend ที่เลือก (ใช้ใน render_pool) กว้างตาม caps["width"]"""
+    width = (caps or {}).get("width") or RECEIPT_W
+    return encode(receipt_document(order_dict, points, printed_at, width), backend, caps, stored)
+
+
+# ===============================
+# 🏷️ QR Label สินค้า 1 ชิ้น
+# ===============================
+def _qr_image(barcode: str, width: int = RECEIPT_W):
+    MARGIN = 20
+    qr = qrcode.QRCode(box_size=8, border=2)
+    qr.add_data(barcode)
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white").get_image().convert("L")
+
+    qr_w, qr_h = qr_img.size
+    scale = min((width - MARGIN * 2) / qr_w, 1.2)
+    return qr_img.resize((int(qr_w * scale), int(qr_h * scale)), Image.LANCZOS)
+
+
+def label_document(item: dict, type_name: str = "", width: int = RECEIPT_W) -> Document:
+    doc = Document(width, margin=20, threshold=LABEL_THRESHOLD).space(20)
+
+    # ✅ QR
+    qr_img = _qr_image(item.get("barcode", "UNKNOWN"), width)
+    doc.picture(qr_img, advance=qr_img.height + 25)
+
+    # ✅ ชื่อสินค้า / รหัสสินค้า / ราคา
+    name_text = f"{type_name} {item.get('name', '')}".strip()
+    doc.center(name_text, 48, advance=55)
+    doc.center(f"รหัส: {item.get('barcode', '-')}", 36, advance=45)
+    doc.center(f"฿{item.get('price', 0):,.0f}", 56, advance=65)
+    doc.space(20)
+    return doc
+
+
+def render_goods_label(item: dict, type_name: str = "", width: int = RECEIPT_W) -> Raster:
+    return render_parts(label_document(item, type_name, width))[0]
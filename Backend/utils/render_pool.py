@@ -0,0 +1,85 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from utils import print_assets, receipt_render
+
+# ===============================
+# ⚙️ Worker pool สำหรับงานพิมพ์
+# ===============================
+# - process pool: วาดภาพด้วย PIL (กิน CPU) ไม่ให้บล็อก event loop
+# - thread pool: งาน I/O แบบ blocking (เช่น เขียนไฟล์ภาพ)
+# RENDER_PROCESSES=0 จะวาดใน thread pool แทน (เหมาะกับเครื่องที่มี CPU น้อย)
+
+RENDER_PROCESSES = int(os.getenv("RENDER_PROCESSES", "2"))
+PRINT_IO_THREADS = int(os.getenv("PRINT_IO_THREADS", "4"))
+
+_cpu_pool = None
+_io_pool = None
+
+
+def _get_io_pool():
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(max_workers=PRINT_IO_THREADS, thread_name_prefix="print-io")
+    return _io_pool
+
+
+def _warm_worker():
+    print_assets.warm()
+    receipt_render.warm_tiles()
+
+
+def _get_cpu_pool():
+    global _cpu_pool
+    if RENDER_PROCESSES <= 0:
+        return _get_io_pool()
+    if _cpu_pool is None:
+        # ✅ ใช้ spawn เพื่อไม่ fork thread ของ motor/uvicorn ติดไปด้วย
+        #    และให้แต่ละ process โหลดฟอนต์/รูปเข้า cache ตั้งแต่เกิด
+        _cpu_pool = ProcessPoolExecutor(
+            max_workers=RENDER_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+        )
+    return _cpu_pool
+
+
+async def run_cpu(fn, *args):
+    """รันฟังก์ชันวาดภาพ (ต้องเป็นฟังก์ชันระดับ module เพื่อ pickle ได้) ใน process pool"""
+    global _cpu_pool
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_cpu_pool(), fn, *args)
+    except BrokenProcessPool:
+        # ✅ process ลูกตาย (เช่น โดน OOM kill) สร้าง pool ใหม่แล้วลองอีกครั้ง
+        print("⚠️ Render pool พัง กำลังสร้างใหม่")
+        _cpu_pool = None
+        return await loop.run_in_executor(_get_cpu_pool(), fn, *args)
+
+
+async def run_io(fn, *args):
+    """รันงาน I/O แบบ blocking (เช่น เขียนไฟล์) ใน thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_io_pool(), fn, *args)
+
+
+def start():
+    """สร้าง pool ล่วงหน้าตอนแอปเริ่ม ไม่ให้ใบเสร็จใบแรกต้องรอ spawn process"""
+    _warm_worker()
+    pool = _get_cpu_pool()
+    _get_io_pool()
+    if isinstance(pool, ProcessPoolExecutor):
+        for _ in range(RENDER_PROCESSES):
+            pool.submit(os.getpid)
+
+
+def stop():
+    global _cpu_pool, _io_pool
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(wait=True, cancel_futures=True)
+        _cpu_pool = None
+    if _io_pool is not None:
+        _io_pool.shutdown(wait=True)
+        _io_pool = None
@@ -0,0 +1,243 @@
+import asyncio
+import os
+from collections import OrderedDict
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from database import db
+from utils import db_indexes, goods_cache, stock_ledger
+
+# ===============================
+# 📦 หักสต๊อกตอนขาย (commit order + stock)
+# ===============================
+# เดิม: find_one + update_one($set) ทีละรายการ = 2 round trip ต่อบรรทัด และสองเครื่องขายของชิ้นเดียวกัน
+# พร้อมกันจะเขียนทับกัน (lost update) ตอนนี้:
+# 1. ดึงสินค้าทุกบรรทัดด้วย $in ครั้งเดียว
+# 2. หักสต๊อกด้วย bulk_write unordered ครั้งเดียว
+#    - พอ:      {"barcode", "stock" >= qty} + $inc -qty   (สองเครื่องหักพร้อมกันไม่ทับกัน)
+#               ไม่ match เพราะเครื่องอื่นหักไปก่อน -> หักแบบ clamp แทน (เฉพาะตัวนั้น) + แจ้ง conflicts
+#    - ไม่พอ:   ตั้งเป็น max(0, stock - qty) (เหมือนเดิม: ขายได้ สต๊อกไม่ติดลบ)
+#               นอก transaction: มีเงื่อนไข stock == ยอดที่ดึงมา ยอดเปลี่ยนระหว่างทาง -> clamp ทีละตัวแทน
+#    - STOCK_OVERSELL=1: $inc -qty ทุกบรรทัด ยอมให้ติดลบ (เห็นยอดที่ขายเกินจริง)
+# 3. ลงสมุดบัญชีสต๊อก (utils/stock_ledger) ต่อท้ายทันที
+# 4. มี replica set -> insert order + หักสต๊อก + สมุดบัญชีใน transaction เดียว (ล้มกลางทาง = ไม่มีอะไรถูกบันทึก)
+#    STOCK_TRANSACTIONS=auto (ค่าเริ่มต้น) / 1 / 0
+
+OVERSELL = os.getenv("STOCK_OVERSELL", "0") == "1"
+TRANSACTIONS = os.getenv("STOCK_TRANSACTIONS", "auto")
+
+_supports_transactions = None
+
+
+async def supports_transactions() -> bool:
+    """replica set / mongos เท่านั้นที่ทำ transaction ได้ (ถามครั้งเดียวแล้วจำไว้)"""
+    global _supports_transactions
+    if TRANSACTIONS in ("0", "1"):
+        return TRANSACTIONS == "1"
+    if _supports_transactions is None:
+        try:
+            hello = await db.client.admin.command("hello")
+            _supports_transactions = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        except Exception:
+            _supports_transactions = False
+    return _supports_transactions
+
+
+class StockCommit:
+    """ผลการหักสต๊อก: payload เดียวกับที่ create_order เคยตอบ"""
+
+    def __init__(self):
+        self.order_id = None
+        self.updated = []           # [{"name", "old_qty", "sold", "new_qty"}]
+        self.not_found = []
+        self.low_stock = []
+        self.conflicts = []         # สินค้าที่หักได้ไม่ตรงกับที่คำนวณเพราะเครื่องอื่นหักพร้อมกัน (เฉพาะแบบไม่มี transaction)
+        self.deltas = OrderedDict() # {barcode: ยอดที่หักจริง} ไว้ลงสมุดบัญชีสต๊อก
+
+
+def _lines(order_dict):
+    for item in order_dict.get("items", []):
+        barcode = item.get("id") or item.get("barcode")
+        qty = int(item.get("qty", 0))
+        if barcode and qty > 0:
+            yield item, barcode, qty
+
+
+def _clamp(qty):
+    # ✅ max(0, stock - qty) ในคำสั่งเดียว (อ่าน-คำนวณ-เขียน บน server ไม่มี lost update)
+    return [{"$set": {"stock": {"$max": [0, {"$subtract": [{"$ifNull": ["$stock", 0]}, qty]}]}}}]
+
+
+def _update(barcode, qty, mode, stock=None):
+    """
+    (filter, update) ของการหัก 1 สินค้า mode: oversell / guarded / clamp
+    clamp + stock = ยอดที่ดึงมา: หักเฉพาะเมื่อยอดยังเท่าเดิม (match แล้วหักตรงตามที่คำนวณไว้แน่นอน)
+    """
+    if mode == "oversell":
+        return {"barcode": barcode}, {"$inc": {"stock": -qty}}
+    if mode == "guarded":
+        return {"barcode": barcode, "stock": {"$gte": qty}}, {"$inc": {"stock": -qty}}
+    if stock is not None:
+        return {"barcode": barcode, "stock": stock}, {"$set": {"stock": max(0, stock - qty)}}
+    return {"barcode": barcode}, _clamp(qty)
+
+
+def plan(order_dict, products, oversell=None):
+    """
+    คำนวณผลทีละบรรทัดจากสต๊อกที่ดึงมา (บรรทัดซ้ำ barcode หักต่อจากบรรทัดก่อน) แล้วรวมเป็นคำสั่งละ 1 สินค้า
+    คืน (StockCommit, [(barcode, จำนวนที่ขาย, mode)])
+    """
+    oversell = OVERSELL if oversell is None else oversell
+    result = StockCommit()
+    running = {}
+    sold = OrderedDict()
+
+    for item, barcode, qty in _lines(order_dict):
+        product = products.get(barcode)
+        if not product:
+            result.not_found.append(item.get("name", f"Unknown({barcode})"))
+            continue
+        current = running.get(barcode, int(product.get("stock", 0) or 0))
+        new_qty = current - qty if oversell else max(0, current - qty)
+        if new_qty < qty:
+            result.low_stock.append(f"{product['name']} (คงเหลือ {current}, ขาย {qty})")
+        result.updated.append({"name": product["name"], "old_qty": current, "sold": qty, "new_qty": new_qty})
+        running[barcode] = new_qty
+        result.deltas[barcode] = result.deltas.get(barcode, 0) + new_qty - current
+        sold[barcode] = sold.get(barcode, 0) + qty
+
+    steps = []
+    for barcode, qty in sold.items():
+        stock = int(products[barcode].get("stock", 0) or 0)
+        mode = "oversell" if oversell else "guarded" if stock >= qty else "clamp"
+        steps.append((barcode, qty, mode))
+    return result, steps
+
+
+async def _apply_bulk(steps, session):
+    """ใน transaction: หักทั้งหมดด้วย bulk_write ครั้งเดียว มีตัวไหนไม่ตรง -> ให้ with_transaction ลองใหม่ทั้งชุด"""
+    ops = [UpdateOne(*_update(barcode, qty, mode)) for barcode, qty, mode in steps]
+    written = await db.goods.bulk_write(ops, ordered=False, session=session)
+    if written.matched_count < len(ops):
+        # ✅ เครื่องอื่นหักสินค้าเดียวกันระหว่างดึงกับเขียนจนเหลือไม่พอ
+        raise OperationFailure("stock changed during commit", code=112,
+                               details={"errorLabels": ["TransientTransactionError"]})
+
+
+async def _clamp_one(barcode, qty):
+    """หัก max(0, stock - qty) 1 สินค้า คืนยอดที่หักจริง (อ่านยอดก่อนหักกลับมาในคำสั่งเดียว)"""
+    before = await db.goods.find_one_and_update(
+        {"barcode": barcode}, _clamp(qty), projection={"_id": 0, "stock": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is None:
+        return 0
+    stock = int(before.get("stock", 0) or 0)
+    return max(0, stock - qty) - stock
+
+
+def _settle(result, retried, applied, products):
+    """ลงยอดที่หักจริงของสินค้าที่หักแบบ clamp ซ้ำ (ไม่ตรงกับที่คำนวณ -> result.conflicts)"""
+    for (barcode, qty), delta in zip(retried, applied):
+        if delta != result.deltas.get(barcode):
+            result.conflicts.append(products[barcode]["name"])
+        if delta:
+            result.deltas[barcode] = delta
+        else:
+            result.deltas.pop(barcode, None)
+
+
+async def _apply_unordered(result, steps, products):
+    """
+    ไม่มี transaction: bulk_write unordered ครั้งเดียว ทุกคำสั่งมีเงื่อนไข + upsert
+    คำสั่งที่ไม่ match (เครื่องอื่นหักไปก่อน) จะ insert barcode ซ้ำ -> ชน unique index ของ goods.barcode
+    -> BulkWriteError บอก index ของคำสั่งที่ไม่ได้หักได้ตรงตัว (ไม่มีเอกสารใหม่ถูกสร้าง)
+    คำสั่งที่ผ่าน = หักตรงตามที่คำนวณ / ที่ไม่ผ่านค่อยหักแบบ clamp ทีละตัว
+    """
+    ops = []
+    for barcode, qty, mode in steps:
+        stock = int(products[barcode].get("stock", 0) or 0) if mode == "clamp" else None
+        ops.append(UpdateOne(*_update(barcode, qty, mode, stock), upsert=True))
+    try:
+        written = await db.goods.bulk_write(ops, ordered=False)
+        details = {"writeErrors": [], "upserted": [{"index": i, "_id": _id}
+                                                  for i, _id in (written.upserted_ids or {}).items()]}
+    except BulkWriteError as e:
+        details = e.details
+        if any(err.get("code") != 11000 for err in details.get("writeErrors", [])):
+            raise
+    # ✅ สินค้าถูกลบระหว่างดึงกับเขียน -> upsert สร้างเอกสารใหม่ได้ ลบทิ้งแล้วถือว่าไม่ได้หัก
+    upserted = details.get("upserted") or []
+    if upserted:
+        await db.goods.delete_many({"_id": {"$in": [u["_id"] for u in upserted]}})
+        for u in upserted:
+            result.deltas.pop(steps[u["index"]][0], None)
+
+    failed = [steps[err["index"]][:2] for err in details.get("writeErrors", [])]
+    if failed:
+        _settle(result, failed, await asyncio.gather(*(_clamp_one(b, q) for b, q in failed)), products)
+
+
+async def _apply_each(result, steps, products):
+    """
+    ไม่มี transaction และยังไม่มี unique index ของ goods.barcode (upsert จะสร้างสินค้าซ้ำได้)
+    -> ส่งคำสั่งของแต่ละสินค้าพร้อมกัน (รอ ~1 round trip) เพื่อรู้ผลรายตัว
+    """
+    async def guarded(barcode, qty):
+        return (await db.goods.update_one(*_update(barcode, qty, "guarded"))).matched_count == 1
+
+    tries = [(b, q) for b, q, m in steps if m == "guarded"]
+    clamps = [(b, q) for b, q, m in steps if m == "clamp"]
+    outcome = await asyncio.gather(*(guarded(b, q) for b, q in tries), *(_clamp_one(b, q) for b, q in clamps))
+    failed = [(b, q) for (b, q), ok in zip(tries, outcome) if not ok]
+    applied = list(outcome[len(tries):])
+    if failed:
+        applied += await asyncio.gather(*(_clamp_one(b, q) for b, q in failed))
+    _settle(result, clamps + failed, applied, products)
+
+
+async def _commit(order_dict, session=None, oversell=None):
+    codes = list({barcode for _, barcode, _ in _lines(order_dict)})
+    products = {}
+    if codes:
+        cursor = db.goods.find({"barcode": {"$in": codes}}, {"barcode": 1, "name": 1, "stock": 1}, session=session)
+        products = {p["barcode"]: p async for p in cursor}
+
+    result, steps = plan(order_dict, products, oversell)
+    inserted = await db.orders.insert_one(order_dict, session=session)
+    result.order_id = inserted.inserted_id
+
+    if steps:
+        if session is not None:
+            await _apply_bulk(steps, session)
+        elif all(mode == "oversell" for _, _, mode in steps):
+            await _apply_bulk(steps, None)      # ✅ $inc ไม่มีเงื่อนไข หักครบเสมอ
+        elif db_indexes.unique_ready("goods", "barcode"):
+            await _apply_unordered(result, steps, products)
+        else:
+            await _apply_each(result, steps, products)
+
+    # ✅ ลงสมุดบัญชีในชุดเดียวกัน (transaction เดียวกันถ้ามี) เฉพาะยอดที่หักจริง
+    ref = str(result.order_id)
+    await stock_ledger.record(
+        [stock_ledger.movement(code, delta, stock_ledger.KIND_SALE, ref) for code, delta in result.deltas.items()],
+        session=session,
+    )
+    return result
+
+
+async def commit_order(order_dict: dict, oversell: bool = None) -> StockCommit:
+    """insert order + หักสต๊อก คืน StockCommit (order_dict ได้ _id จาก insert_one)"""
+    if not await supports_transactions():
+        result = await _commit(order_dict, oversell=oversell)
+    else:
+        async with await db.client.start_session() as session:
+            async def run(s):
+                order_dict.pop("_id", None)     # ✅ transaction ถูกลองใหม่ -> ให้ insert ได้ _id ใหม่
+                return await _commit(order_dict, s, oversell)
+            result = await session.with_transaction(run)
+
+    # ✅ สต๊อกเปลี่ยนแล้ว: การสแกนครั้งถัดไปต้องเห็นยอดใหม่ (prefetch ด้านบนอ่าน DB ตรงเสมอ ไม่ผ่าน cache)
+    goods_cache.invalidate(*result.deltas)
+    return result
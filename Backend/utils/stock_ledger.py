@@ -0,0 +1,259 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from database import db
+
+# ===============================
+# 📒 สมุดบัญชีสต๊อก (stock_movements) + snapshot
+# ===============================
+# ทุกการเปลี่ยนสต๊อกบันทึกเป็นรายการต่อท้าย (ไม่แก้ ไม่ลบ) ในคำสั่งชุดเดียวกับที่แก้ goods.stock
+#     {"barcode", "delta", "kind", "ref", "at"}
+#     kind: open (เพิ่มสินค้าใหม่) / sale (ขาย, ref = order id) / restock (เติม) / adjust (ปรับยอดจากการนับ)
+# snapshot (stock_snapshots) เก็บยอดของสินค้าที่มีการเคลื่อนไหว ทุก STOCK_SNAPSHOT_HOURS ชม.
+#     ยอด ณ เวลาใดก็ได้ = snapshot ล่าสุดก่อนเวลานั้น + ผลรวม delta หลัง snapshot (หางสั้น ๆ ไม่ต้องไล่ทั้งหมด)
+# - snapshot ครั้งแรกตั้งต้นจาก goods.stock (ของที่มีอยู่ก่อนเริ่มบันทึก)
+# - ตัดรอบ snapshot ย้อนหลัง STOCK_LEDGER_LAG_SEC วินาที ให้รายการที่กำลังเขียนอยู่ลงครบก่อน
+# - ตรวจความตรงกัน (ledger vs goods.stock) ทีละส่วน: สินค้าที่เคลื่อนไหวตั้งแต่รอบก่อน
+#   + ไล่ตามลำดับ barcode ครั้งละ STOCK_CHECK_BATCH ตัว (วนครบทุกตัวในหลายรอบ)
+
+SNAPSHOT_INTERVAL_SEC = float(os.getenv("STOCK_SNAPSHOT_HOURS", "24")) * 3600
+LAG_SEC = float(os.getenv("STOCK_LEDGER_LAG_SEC", "60"))
+CHECK_BATCH = int(os.getenv("STOCK_CHECK_BATCH", "500"))
+
+KIND_OPEN = "open"
+KIND_SALE = "sale"
+KIND_RESTOCK = "restock"
+KIND_ADJUST = "adjust"
+
+_task = None
+_check_state = {"since": None, "after": "", "last": None}
+
+
+def _now(lag: float = 0):
+    # ✅ Mongo เก็บเวลาละเอียดแค่มิลลิวินาที -> ตัดให้ตรงกันตั้งแต่แรก (รายการไม่หลุดขอบ snapshot)
+    at = datetime.now(timezone.utc) - timedelta(seconds=lag)
+    return at.replace(microsecond=at.microsecond // 1000 * 1000)
+
+
+def _naive(at):
+    """เวลาที่อ่านจาก Mongo เป็น UTC แบบไม่มี tzinfo -> แปลงให้เทียบกันได้"""
+    if at is None or at.tzinfo is None:
+        return at
+    return at.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def movement(barcode: str, delta: int, kind: str, ref: str = None, at=None) -> dict:
+    return {"barcode": barcode, "delta": int(delta), "kind": kind, "ref": ref, "at": at or _now()}
+
+
+async def record(movements: list, session=None):
+    """
+    บันทึกรายการเคลื่อนไหว (ข้าม delta 0 ยกเว้น KIND_OPEN: สินค้าที่เปิดด้วยสต๊อก 0 ก็ต้องเริ่มนับในสมุด)
+    ใน transaction: ล้ม = ทั้งชุดล้ม / นอก transaction: สต๊อกถูกแก้ไปแล้ว -> แจ้งเตือน ให้ตัวตรวจจับความต่างเอง
+    """
+    docs = [m for m in movements if m["delta"] or m["kind"] == KIND_OPEN]
+    if not docs:
+        return
+    if session is not None:
+        await db.stock_movements.insert_many(docs, ordered=False, session=session)
+        return
+    try:
+        await db.stock_movements.insert_many(docs, ordered=False)
+    except Exception as e:
+        print(f"⚠️ บันทึกการเคลื่อนไหวสต๊อกไม่สำเร็จ: {e}")
+
+
+# ===============================
+# 🔢 คำนวณยอดจาก snapshot + หาง
+# ===============================
+async def ledger_stocks(barcodes, at=None) -> dict:
+    """
+    ยอดตามสมุดบัญชี ณ เวลา at (None = ตอนนี้) คืน {barcode: {"stock", "snapshot_at", "tail"}}
+    stock เป็น None ถ้าไม่มีข้อมูลตั้งต้น (ก่อนเริ่มบันทึก / ก่อน snapshot แรก)
+    """
+    barcodes = list(barcodes)
+    if not barcodes:
+        return {}
+    at = _naive(at)
+
+    match = {"barcode": {"$in": barcodes}}
+    if at is not None:
+        match["at"] = {"$lte": at}
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"barcode": 1, "at": -1}},
+        {"$group": {"_id": "$barcode", "stock": {"$first": "$stock"}, "at": {"$first": "$at"}}},
+    ]
+    snaps = {s["_id"]: s async for s in db.stock_snapshots.aggregate(pipeline)}
+
+    # ✅ สินค้าที่มี snapshot อ่านเฉพาะหางหลัง snapshot / สินค้าที่ยังไม่มี (เพิ่มใหม่) อ่านทั้งหมด
+    unsnapped = [code for code in barcodes if code not in snaps]
+    branches = []
+    if snaps:
+        branches.append({"barcode": {"$in": list(snaps)}, "at": {"$gt": min(s["at"] for s in snaps.values())}})
+    if unsnapped:
+        branches.append({"barcode": {"$in": unsnapped}})
+    tail_match = branches[0] if len(branches) == 1 else {"$or": branches}
+    if at is not None:
+        tail_match = {"$and": [tail_match, {"at": {"$lte": at}}]}
+
+    totals = {code: {"delta": 0, "count": 0, "opened": False} for code in barcodes}
+    cursor = db.stock_movements.find(tail_match, {"_id": 0, "barcode": 1, "delta": 1, "kind": 1, "at": 1})
+    async for m in cursor:
+        snap = snaps.get(m["barcode"])
+        if snap is not None and m["at"] <= snap["at"]:
+            continue
+        total = totals[m["barcode"]]
+        total["delta"] += m["delta"]
+        total["count"] += 1
+        total["opened"] = total["opened"] or m["kind"] == KIND_OPEN
+
+    result = {}
+    for code in barcodes:
+        snap, total = snaps.get(code), totals[code]
+        if snap is None and not total["opened"]:
+            stock = None
+        else:
+            stock = (snap["stock"] if snap else 0) + total["delta"]
+        result[code] = {"stock": stock, "snapshot_at": snap["at"] if snap else None, "tail": total["count"]}
+    return result
+
+
+async def stock_at(barcode: str, at=None) -> dict:
+    return {"barcode": barcode, **(await ledger_stocks([barcode], at))[barcode]}
+
+
+async def history(barcode: str, limit: int = 50, before: str = None) -> dict:
+    """รายการเคลื่อนไหวของสินค้า ใหม่ -> เก่า (ต่อหน้าถัดไปด้วย next = _id ของรายการสุดท้าย)"""
+    query = {"barcode": barcode}
+    if before:
+        try:
+            query["_id"] = {"$lt": ObjectId(before)}
+        except (InvalidId, TypeError):
+            raise ValueError("before ไม่ถูกต้อง")
+    cursor = db.stock_movements.find(query).sort("_id", -1).limit(limit)
+    items = [{**m, "_id": str(m["_id"])} async for m in cursor]
+    return {
+        "barcode": barcode,
+        "movements": items,
+        "next": items[-1]["_id"] if len(items) == limit else None,
+    }
+
+
+# ===============================
+# 📸 Snapshot
+# ===============================
+async def _baseline(at):
+    """snapshot แรก: ตั้งต้นจาก goods.stock ของทุกสินค้า"""
+    count, docs = 0, []
+    cursor = db.goods.find({"barcode": {"$type": "string"}}, {"_id": 0, "barcode": 1, "stock": 1})
+    async for g in cursor:
+        docs.append({"barcode": g["barcode"], "stock": int(g.get("stock", 0) or 0), "at": at})
+        if len(docs) >= 1000:
+            await db.stock_snapshots.insert_many(docs)
+            count, docs = count + len(docs), []
+    if docs:
+        await db.stock_snapshots.insert_many(docs)
+        count += len(docs)
+    return count
+
+
+async def snapshot() -> dict:
+    """เก็บยอดของสินค้าที่เคลื่อนไหวตั้งแต่รอบก่อน คืน {"at", "products", "baseline"}"""
+    last = await db.stock_snapshots.find_one({}, {"at": 1}, sort=[("at", -1)])
+    if last is None:
+        at = _now()
+        return {"at": at, "products": await _baseline(at), "baseline": True}
+
+    at = _now(LAG_SEC)
+    if _naive(at) <= last["at"]:
+        return {"at": at, "products": 0, "baseline": False}
+    touched = await db.stock_movements.distinct("barcode", {"at": {"$gt": last["at"], "$lte": at}})
+    stocks = await ledger_stocks(touched, at)
+    docs = [{"barcode": code, "stock": s["stock"], "at": at} for code, s in stocks.items() if s["stock"] is not None]
+    if docs:
+        await db.stock_snapshots.insert_many(docs)
+    return {"at": at, "products": len(docs), "baseline": False}
+
+
+# ===============================
+# 🔍 ตรวจ ledger เทียบ goods.stock (ทีละส่วน)
+# ===============================
+async def check(batch: int = None) -> dict:
+    """
+    ตรวจหนึ่งรอบ: สินค้าที่เคลื่อนไหวตั้งแต่รอบก่อน + สินค้าถัดไปตามลำดับ barcode อีก batch ตัว
+    คืน {"checked", "mismatches": [{"barcode", "stock", "ledger"}], "untracked", "cursor"}
+    """
+    batch = CHECK_BATCH if batch is None else batch
+    started = _now()
+
+    codes = set()
+    if _check_state["since"] is not None:
+        codes.update(await db.stock_movements.distinct("barcode", {"at": {"$gt": _check_state["since"]}}))
+
+    rolling = db.goods.find({"barcode": {"$type": "string", "$gt": _check_state["after"]}},
+                            {"_id": 0, "barcode": 1}).sort("barcode", 1).limit(batch)
+    window = [g["barcode"] async for g in rolling]
+    codes.update(window)
+
+    ledger = await ledger_stocks(codes)
+    goods = {g["barcode"]: int(g.get("stock", 0) or 0)
+             async for g in db.goods.find({"barcode": {"$in": list(codes)}}, {"_id": 0, "barcode": 1, "stock": 1})}
+
+    mismatches, untracked = [], []
+    for code in sorted(codes):
+        expected = ledger[code]["stock"]
+        if expected is None:
+            untracked.append(code)
+        elif code in goods and goods[code] != expected:
+            mismatches.append({"barcode": code, "stock": goods[code], "ledger": expected,
+                               "diff": goods[code] - expected})
+
+    _check_state["since"] = started
+    _check_state["after"] = window[-1] if len(window) == batch else ""    # ✅ ครบรอบแล้วเริ่มจากต้นใหม่
+    report = {"at": started, "checked": len(codes), "mismatches": mismatches, "untracked": untracked,
+              "cursor": _check_state["after"]}
+    _check_state["last"] = report
+    for m in mismatches:
+        print(f"⚠️ สต๊อก {m['barcode']} ไม่ตรงสมุดบัญชี: มี {m['stock']} บัญชี {m['ledger']}")
+    return report
+
+
+def last_check():
+    return _check_state["last"]
+
+
+# ===============================
+# ⏱️ รอบอัตโนมัติ
+# ===============================
+async def _loop():
+    while True:
+        try:
+            result = await snapshot()
+            if result["products"]:
+                print(f"📸 snapshot สต๊อก {result['products']} รายการ")
+            await check()
+        except Exception as e:
+            print(f"⚠️ snapshot / ตรวจสต๊อกไม่สำเร็จ: {e}")
+        await asyncio.sleep(SNAPSHOT_INTERVAL_SEC)
+
+
+def start():
+    global _task
+    if SNAPSHOT_INTERVAL_SEC > 0 and _task is None:
+        _task = asyncio.create_task(_loop())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
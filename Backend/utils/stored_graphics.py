@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+import json
+import os
+
+from utils import printer_health, printer_transport, render_pool
+from utils.escpos_raster import ESC_INIT, STORED_GRAPHIC_KEYS, nv_define
+from utils.receipt_render import RECEIPT_W, stored_graphic
+
+# ===============================
+# 💾 โลโก้ / อีโมจิ ในหน่วยความจำเครื่องพิมพ์ (NV graphics)
+# ===============================
+# โลโก้เป็นส่วนที่ใหญ่ที่สุดของใบเสร็จ อัปโหลดเข้าเครื่องพิมพ์ครั้งเดียวด้วย GS ( L fn=67
+# แล้วแต่ละใบเสร็จสั่งพิมพ์ด้วย key (GS ( L fn=69) แทนการส่งภาพทั้งรูป
+# - version = hash ของภาพ 1-bit: เปลี่ยน assets/logo.png -> อัปโหลดใหม่อัตโนมัติ
+# - จำว่าเครื่องไหนมีเวอร์ชันไหนไว้ใน STATE_PATH (หน่วยความจำ NV ไม่หายตอนปิดเครื่อง)
+# - อัปโหลดไม่สำเร็จ / เครื่องออฟไลน์ -> ใบเสร็จใบนั้นวาดโลโก้ลงภาพตามเดิม
+#
+# เปิดใช้ด้วย PRINTER_STORED_GRAPHICS=logo หรือ logo,emoji (ค่าเริ่มต้นปิด: เครื่องพิมพ์บางรุ่นไม่รองรับ)
+
+ENABLED = [n.strip() for n in os.getenv("PRINTER_STORED_GRAPHICS", "").split(",") if n.strip()]
+STATE_PATH = os.getenv("PRINTER_STORED_GRAPHICS_STATE", os.path.join(printer_health.SPOOL_DIR, "stored_graphics.json"))
+
+KEYS = STORED_GRAPHIC_KEYS
+
+_state = None               # {"host:port": {name: version}}
+_locks = {}
+
+
+def _version(raster) -> str:
+    h = hashlib.sha1(f"{raster.width}x{raster.height}".encode())
+    h.update(raster.data)
+    return h.hexdigest()[:16]
+
+
+def _printer_key(host, port):
+    # ✅ print server หลายพอร์ตบน IP เดียว = คนละเครื่อง หน่วยความจำ NV แยกกัน
+    return f"{host}:{int(port)}"
+
+
+def _load_state():
+    try:
+        with open(STATE_PATH, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    # ✅ ไฟล์รุ่นเก่า key เป็น host อย่างเดียว (ตอนนั้นใช้พอร์ต 9100 อย่างเดียว)
+    return {(key if ":" in key else _printer_key(key, 9100)): versions for key, versions in state.items()}
+
+
+def _save_state(state):
+    os.makedirs(os.path.dirname(STATE_PATH) or ".", exist_ok=True)
+    tmp = STATE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, STATE_PATH)
+
+
+async def _get_state():
+    global _state
+    if _state is None:
+        _state = await render_pool.run_io(_load_state)
+    return _state
+
+
+async def ensure(host: str, port: int = 9100, names=None, force: bool = False, width: int = RECEIPT_W) -> frozenset:
+    """
+    ตรวจว่าเครื่องพิมพ์มีรูปเวอร์ชันล่าสุดครบไหม ขาดตัวไหนอัปโหลดให้ (ภาพตามความกว้างหัวพิมพ์ width)
+    คืนชื่อรูปที่ใบเสร็จเรียกใช้จากเครื่องพิมพ์ได้ (ที่เหลือต้องวาดลงภาพเอง)
+    """
+    names = ENABLED if names is None else names
+    if not names:
+        return frozenset()
+
+    state = await _get_state()
+    ready = set()
+    lock = _locks.setdefault((host, port), asyncio.Lock())
+    async with lock:
+        printed = state.setdefault(_printer_key(host, port), {})
+        for name in names:
+            raster = stored_graphic(name, width)
+            if raster is None:
+                continue
+            version = _version(raster)
+            if printed.get(name) == version and not force:
+                ready.add(name)
+                continue
+            if printer_health.get_printer(host, port).state != printer_health.STATE_CLOSED:
+                continue
+            try:
+                await printer_transport.send(host, ESC_INIT + nv_define(KEYS[name], raster), port=port)
+            except Exception as e:
+                print(f"⚠️ อัปโหลด{name}เข้าเครื่องพิมพ์ {host}:{port} ไม่สำเร็จ: {e}")
+                continue
+            printed[name] = version
+            await render_pool.run_io(_save_state, state)
+            print(f"💾 อัปโหลด {name} เข้าเครื่องพิมพ์ {host}:{port} แล้ว ({version})")
+            ready.add(name)
+    return frozenset(ready)
+
+
+async def stats():
+    state = await _get_state()
+    return {"enabled": ENABLED, "keys": {n: k.decode() for n, k in KEYS.items()}, "printers": state}
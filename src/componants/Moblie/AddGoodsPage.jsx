@@ -455,9 +455,9 @@ const AddGoodsPage = () => {
                   {goods.map((g, i) => (
                     <tr key={i}>
                       <td>
-                        {g.imageBase64 ? (
+                        {g.imageUrl || g.imageBase64 ? (
                           <img
-                            src={g.imageBase64}
+                            src={g.imageUrl ? `${API_BASE}${g.imageUrl}&size=128` : g.imageBase64}
                             alt="img"
                             width="50"
                             height="50"